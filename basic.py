@@ -1,7 +1,11 @@
 #######################################
 # IMPORTS
 #######################################
+import re
 import string
+import time
+from array import array
+from collections import OrderedDict, deque
 from strings_with_arrows import *
 
 #######################################
@@ -24,9 +28,11 @@ class Error:
 		self.details = details
 	
 	def as_string(self):
+		# Errors only hold offsets; line numbers and the source excerpt are
+		# looked up through the shared LineIndex when the error is rendered
 		result  = f'{self.error_name}: {self.details}\n'
 		result += f'File {self.pos_start.fn}, line {self.pos_start.ln + 1}'
-		result += '\n\n' + string_with_arrows(self.pos_start.ftxt, self.pos_start, self.pos_end)
+		result += '\n\n' + string_with_arrows(self.pos_start.ftxt, self.pos_start, self.pos_end, self.pos_start.lines)
 		return result
 
 
@@ -45,25 +51,32 @@ class InvalidSyntaxError(Error):
 
 
 class Position:
-		def __init__(self, idx, ln, col, fn, ftxt):
+		"""
+		A plain offset into a source text. Line and column are derived from the
+		LineIndex shared by every position in the same text, only when asked for.
+		"""
+		__slots__ = ('idx', 'fn', 'ftxt', 'lines')
+
+		def __init__(self, idx, fn, ftxt, lines=None):
 				self.idx = idx
-				self.ln = ln
-				self.col = col
 				self.fn = fn
 				self.ftxt = ftxt
+				self.lines = lines if lines is not None else LineIndex(ftxt)
 
-		def advance(self, current_char=None):
-				self.idx += 1
-				self.col += 1
+		@property
+		def ln(self):
+				return self.lines.line_col(self.idx)[0]
 
-				if current_char == '\n':
-						self.ln += 1
-						self.col = 0
+		@property
+		def col(self):
+				return self.lines.line_col(self.idx)[1]
 
+		def advance(self, current_char=None):
+				self.idx += 1
 				return self
 
 		def copy(self):
-				return Position(self.idx, self.ln, self.col, self.fn, self.ftxt)
+				return Position(self.idx, self.fn, self.ftxt, self.lines)
 
 #######################################
 # TOKENS
@@ -80,6 +93,12 @@ TT_RPAREN   = 'RPAREN'
 TT_SCOLON   = ':'
 TT_EOF		= 'EOF'
 TT_EQ       = 'EQ'
+TT_EE       = 'EE'
+TT_NE       = 'NE'
+TT_LT       = 'LT'
+TT_GT       = 'GT'
+TT_LTE      = 'LTE'
+TT_GTE      = 'GTE'
 TT_NEWLINE  = 'NEWLINE'
 TT_DEDENT   = 'DEDENT'
 
@@ -87,6 +106,14 @@ TT_KEYWORD = 'KEYWORD'
 TT_IDENTIFIER = 'IDENTIFIER'
 TT_STRING = 'STRING'
 
+# Token for each comparison character alone and followed by '='
+COMPARISON_TOKENS = {
+	'=': (TT_EQ, TT_EE),
+	'<': (TT_LT, TT_LTE),
+	'>': (TT_GT, TT_GTE),
+	'!': (None, TT_NE),
+}
+
 KEYWORDS = {
 	'var': 'var',
 	'int': "int",
@@ -96,14 +123,21 @@ KEYWORDS = {
 }
 
 class Token:
+		__slots__ = ('type', 'value', 'pos_start', 'pos_end')
+
 		def __init__(self, type_, value=None, pos_start=None, pos_end=None):
 				self.type = type_
 				self.value = value
 
 				if pos_start:
-					self.pos_start = pos_start.copy()
-					self.pos_end = pos_start.copy()
-					self.pos_end.advance()
+					# A single position is usually the lexer's live cursor, so it is
+					# copied; explicit start/end pairs are already owned by the caller
+					if pos_end:
+						self.pos_start = pos_start
+					else:
+						self.pos_start = pos_start.copy()
+						self.pos_end = pos_start.copy()
+						self.pos_end.advance()
 
 				if pos_end:
 					self.pos_end = pos_end
@@ -115,16 +149,86 @@ class Token:
 				if self.value: return f'{self.type}:{self.value}'
 				return f'{self.type}'
 
+#######################################
+# TOKEN BUFFER
+#######################################
+
+TOKEN_TYPES = (
+	TT_INT, TT_FLOAT, TT_PLUS, TT_MINUS, TT_MUL, TT_DIV, TT_LPAREN, TT_RPAREN,
+	TT_SCOLON, TT_EOF, TT_EQ, TT_NEWLINE, TT_DEDENT,
+	TT_KEYWORD, TT_IDENTIFIER, TT_STRING,
+	TT_EE, TT_NE, TT_LT, TT_GT, TT_LTE, TT_GTE,
+)
+TOKEN_TYPE_CODES = {type_: code for code, type_ in enumerate(TOKEN_TYPES)}
+
+
+class TokenBuffer:
+	"""
+	Struct-of-arrays token storage: one byte of type code and two offsets per
+	token, with token values kept in a parallel side table. Token and
+	Position objects are only built when a token is indexed or iterated.
+	"""
+	def __init__(self, fn, text, symbols=None):
+		self.fn = fn
+		self.text = text
+		# symbols.SymbolTable the lexer interned identifiers into, if any
+		self.symbols = symbols
+		self.types = array('B')
+		self.starts = array('I')
+		self.ends = array('I')
+		self.values = []
+		self.lines = LineIndex(text)
+
+	def append(self, type_, value, start, end):
+		self.types.append(TOKEN_TYPE_CODES[type_])
+		self.values.append(value)
+		self.starts.append(start)
+		self.ends.append(end)
+
+	def type_at(self, i):
+		return TOKEN_TYPES[self.types[i]]
+
+	def position(self, idx):
+		return Position(idx, self.fn, self.text, self.lines)
+
+	def __len__(self):
+		return len(self.types)
+
+	def __getitem__(self, i):
+		if i < 0: i += len(self.types)
+		return Token(
+			TOKEN_TYPES[self.types[i]], self.values[i],
+			self.position(self.starts[i]), self.position(self.ends[i])
+		)
+
+	def __iter__(self):
+		# Same as indexing each token, minus the per-token method calls
+		fn, text, lines = self.fn, self.text, self.lines
+		for type_code, value, start, end in zip(self.types, self.values, self.starts, self.ends):
+			yield Token(
+				TOKEN_TYPES[type_code], value,
+				Position(start, fn, text, lines), Position(end, fn, text, lines)
+			)
+
+	def __repr__(self):
+		return f'{list(self)}'
+
 #######################################
 # LEXER
 #######################################
 
 class Lexer:
-		def __init__(self, fn, text):
+		def __init__(self, fn, text, recover=False):
 				self.fn = fn
 				self.text = text
-				self.pos = Position(-1, 0, -1, fn, text)
+				self.lines = LineIndex(text)
+				self.pos = Position(-1, fn, text, self.lines)
 				self.current_char = None
+				self.error = None
+				# With recover, illegal characters are collected here and skipped
+				# instead of ending the tokens; self.error is the first of them
+				self.recover = recover
+				self.errors = []
 				self.advance()
 		
 		def advance(self):
@@ -132,50 +236,83 @@ class Lexer:
 				self.current_char = self.text[self.pos.idx] if self.pos.idx < len(self.text) else None
 
 		def make_tokens(self):
-				tokens = []
-
+				tokens = list(self.iter_tokens())
+				if self.error and not self.recover: return [], self.error
+				return tokens, self.error
+
+		def make_token_buffer(self, symbols=None):
+				buffer = TokenBuffer(self.fn, self.text, symbols)
+				for tok in self.iter_tokens():
+					if symbols is not None and tok.type == TT_IDENTIFIER:
+						symbols.intern(tok.value)
+					buffer.append(tok.type, tok.value, tok.pos_start.idx, tok.pos_end.idx)
+				if self.error and not self.recover: return TokenBuffer(self.fn, self.text, symbols), self.error
+				return buffer, self.error
+
+		def iter_tokens(self):
+				"""
+				Yield tokens one at a time as they are recognised. On an illegal
+				character the stream ends with an EOF token at that point and the
+				error is left in self.error, unless recovering.
+				"""
 				while self.current_char != None:
 					if self.current_char in ' \t':
 						self.advance()
 					elif self.current_char in DIGITS:
-						tokens.append(self.make_number())
+						yield self.make_number()
 					elif self.current_char == '+':
-						tokens.append(Token(TT_PLUS, pos_start=self.pos))
+						yield Token(TT_PLUS, pos_start=self.pos)
 						self.advance()
 					elif self.current_char == '-':
-						tokens.append(Token(TT_MINUS, pos_start=self.pos))
+						yield Token(TT_MINUS, pos_start=self.pos)
 						self.advance()
 					elif self.current_char == '*':
-						tokens.append(Token(TT_MUL, pos_start=self.pos))
+						yield Token(TT_MUL, pos_start=self.pos)
 						self.advance()
 					elif self.current_char == '/':
-						tokens.append(Token(TT_DIV, pos_start=self.pos))
+						yield Token(TT_DIV, pos_start=self.pos)
 						self.advance()
 					elif self.current_char == '(':
-						tokens.append(Token(TT_LPAREN, pos_start=self.pos))
+						yield Token(TT_LPAREN, pos_start=self.pos)
 						self.advance()
 					elif self.current_char == ')':
-						tokens.append(Token(TT_RPAREN, pos_start=self.pos))
+						yield Token(TT_RPAREN, pos_start=self.pos)
 						self.advance()
 					elif self.current_char == ':':
-						tokens.append(Token(TT_SCOLON, pos_start=self.pos))
-						self.advance()
-					elif self.current_char == '=':
-						tokens.append(Token(TT_EQ, pos_start=self.pos))
+						yield Token(TT_SCOLON, pos_start=self.pos)
 						self.advance()
+					elif self.current_char in '=<>' or (self.current_char == '!' and self.text[self.pos.idx + 1:self.pos.idx + 2] == '='):
+						yield self.make_comparison()
 					elif self.current_char == '"':
-						tokens.append(self.make_string())
+						yield self.make_string()
 					elif self.current_char.isalpha():
-						tokens.append(self.make_identifier())
+						yield self.make_identifier()
 						
 					else:
 						pos_start = self.pos.copy()
 						char = self.current_char
 						self.advance()
-						return [], IllegalCharError(pos_start, self.pos, "'" + char + "'")
-
-				tokens.append(Token(TT_EOF, pos_start=self.pos))
-				return tokens, None
+						error = IllegalCharError(pos_start, self.pos.copy(), "'" + char + "'")
+						if self.error is None:
+							self.error = error
+						if self.recover:
+							self.errors.append(error)
+							continue
+						yield Token(TT_EOF, pos_start=pos_start)
+						return
+
+				yield Token(TT_EOF, pos_start=self.pos)
+
+		def make_comparison(self):
+				# '=', '<' and '>' on their own or followed by '='; '!' only
+				# reaches here when it is followed by '='
+				pos_start = self.pos.copy()
+				single, double = COMPARISON_TOKENS[self.current_char]
+				self.advance()
+				if self.current_char == '=':
+						self.advance()
+						return Token(double, pos_start=pos_start, pos_end=self.pos.copy())
+				return Token(single, pos_start=pos_start, pos_end=self.pos.copy())
 
 		def make_identifier(self):
 				identifier_str = ''
@@ -185,7 +322,7 @@ class Lexer:
 						identifier_str += self.current_char
 						self.advance()
 				tok_type = TT_KEYWORD if identifier_str in KEYWORDS else TT_IDENTIFIER
-				return Token(tok_type, identifier_str, pos_start, self.pos)
+				return Token(tok_type, identifier_str, pos_start, self.pos.copy())
             
             
 		def make_number(self):
@@ -203,9 +340,9 @@ class Lexer:
 						self.advance()
 
 				if dot_count == 0:
-						return Token(TT_INT, int(num_str), pos_start, self.pos)
+						return Token(TT_INT, int(num_str), pos_start, self.pos.copy())
 				else:
-						return Token(TT_FLOAT, float(num_str), pos_start, self.pos)
+						return Token(TT_FLOAT, float(num_str), pos_start, self.pos.copy())
 
 		def make_string(self):
 			str_value = ''
@@ -230,7 +367,144 @@ class Lexer:
 				escape_character = False
 
 			self.advance()
-			return Token(TT_STRING, '"' + str_value + '"', pos_start, self.pos)
+			return Token(TT_STRING, '"' + str_value + '"', pos_start, self.pos.copy())
+
+#######################################
+# REGEX LEXER
+#######################################
+
+OPERATOR_TOKENS = {
+	'+': TT_PLUS,
+	'-': TT_MINUS,
+	'*': TT_MUL,
+	'/': TT_DIV,
+	'(': TT_LPAREN,
+	')': TT_RPAREN,
+	':': TT_SCOLON,
+	'=': TT_EQ,
+	'<': TT_LT,
+	'>': TT_GT,
+	'==': TT_EE,
+	'!=': TT_NE,
+	'<=': TT_LTE,
+	'>=': TT_GTE,
+}
+
+# One alternative per token class, tried in the same order as the branches of
+# Lexer.make_tokens. The trailing catch-all turns any other character into an
+# 'illegal' match so finditer never skips input.
+TOKEN_REGEX = re.compile(r"""
+	(?P<WS>[ \t]+)
+	|(?P<NUMBER>[0-9]+(?:\.[0-9]*)?)
+	|(?P<OP>[=!<>]=|[-+*/():=<>])
+	|(?P<STRING>"[^"]*"?)
+	|(?P<IDENTIFIER>[^\W\d_]\w*)
+	|(?P<ILLEGAL>.)
+""", re.VERBOSE | re.DOTALL)
+
+
+class RegexLexer(Lexer):
+	"""
+	Drop-in replacement for Lexer that scans the whole text with a single
+	compiled pattern instead of stepping through it one character at a time.
+	It produces the same tokens, positions and errors as Lexer.
+	"""
+	def __init__(self, fn, text, recover=False):
+		self.fn = fn
+		self.text = text
+		self.lines = LineIndex(text)
+		self.error = None
+		self.recover = recover
+		self.errors = []
+
+	def scan(self):
+		"""
+		Yield (type, value, start, end) for each token, ending with EOF. On an
+		illegal character the EOF is placed there and self.error is set;
+		when recovering the character is added to self.errors and skipped.
+		"""
+		text = self.text
+		eof = len(text)
+
+		pos = 0
+		while True:
+			for match in TOKEN_REGEX.finditer(text, pos):
+				kind = match.lastgroup
+				if kind == 'WS':
+					continue
+
+				start, end = match.span()
+				value = match.group()
+
+				if kind == 'OP':
+					yield OPERATOR_TOKENS[value], None, start, end
+				elif kind == 'NUMBER':
+					if '.' in value:
+						yield TT_FLOAT, float(value), start, end
+					else:
+						yield TT_INT, int(value), start, end
+				elif kind == 'IDENTIFIER' and value[0].isalpha():
+					yield TT_KEYWORD if value in KEYWORDS else TT_IDENTIFIER, value, start, end
+				elif kind == 'STRING':
+					if len(value) > 1 and value[-1] == '"':
+						yield TT_STRING, '"' + value[1:-1].replace('\\', '') + '"', start, end
+					else:
+						# Lexer steps one past the end of an unterminated string
+						eof += 1
+						yield TT_STRING, '"' + value[1:].replace('\\', '') + '"', start, eof
+				else:
+					error = IllegalCharError(
+						self.position(start), self.position(start + 1), "'" + value[0] + "'"
+					)
+					if self.error is None:
+						self.error = error
+					if self.recover:
+						self.errors.append(error)
+						if end > start + 1:
+							# A word starting with a non-letter such as '²': only
+							# that character is illegal, so scan again after it
+							pos = start + 1
+							break
+						continue
+					yield TT_EOF, None, start, start + 1
+					return
+			else:
+				break
+
+		yield TT_EOF, None, eof, eof + 1
+
+	def position(self, idx):
+		return Position(idx, self.fn, self.text, self.lines)
+
+	def iter_tokens(self):
+		fn, text, lines = self.fn, self.text, self.lines
+
+		for type_, value, start, end in self.scan():
+			if type_ == TT_EOF:
+				yield Token(TT_EOF, pos_start=Position(start, fn, text, lines))
+				return
+			yield Token(type_, value, Position(start, fn, text, lines), Position(end, fn, text, lines))
+
+	def make_token_buffer(self, symbols=None):
+		"""
+		Lex into a TokenBuffer. Given a symbols.SymbolTable, every
+		identifier is interned into it as it is scanned.
+		"""
+		buffer = TokenBuffer(self.fn, self.text, symbols)
+		types, starts, ends, values = buffer.types, buffer.starts, buffer.ends, buffer.values
+		codes = TOKEN_TYPE_CODES
+		intern = symbols.intern if symbols is not None else None
+
+		for type_, value, start, end in self.scan():
+			if intern is not None and type_ == TT_IDENTIFIER:
+				intern(value)
+			types.append(codes[type_])
+			values.append(value)
+			starts.append(start)
+			ends.append(end)
+
+		if self.error and not self.recover: return TokenBuffer(self.fn, self.text, symbols), self.error
+		return buffer, self.error
 
 #######################################
 # AST NODES
@@ -238,6 +512,8 @@ class Lexer:
 
 
 class NumberNode:
+	__slots__ = ('tok',)
+
 	def __init__(self, tok):
 		self.tok = tok
 
@@ -246,34 +522,51 @@ class NumberNode:
 
 
 class BinOpNode:
+	__slots__ = ('left_node', 'op_tok', 'right_node')
+
 	def __init__(self, left_node, op_tok, right_node):
 		self.left_node = left_node
 		self.op_tok = op_tok
 		self.right_node = right_node
 
+	def repr_parts(self):
+		return ['(', self.left_node, f', {self.op_tok}, ', self.right_node, ')']
+
 	def __repr__(self):
-		return f'({self.left_node}, {self.op_tok}, {self.right_node})'
+		return node_repr(self)
 
 
 class UnaryOpNode:
+	__slots__ = ('op_tok', 'node')
+
 	def __init__(self, op_tok, node):
 		self.op_tok = op_tok
 		self.node = node
 
+	def repr_parts(self):
+		return [f'({self.op_tok}, ', self.node, ')']
+
 	def __repr__(self):
-		return f'({self.op_tok}, {self.node})'
+		return node_repr(self)
 
 
 class VarAssignNode:
+	__slots__ = ('var_name', 'value_node')
+
 	def __init__(self, var_name, value_node):
 		self.var_name = var_name
 		self.value_node = value_node
 
+	def repr_parts(self):
+		return [f'(VAR_ASSIGN: {self.var_name}, ', self.value_node, ')']
+
 	def __repr__(self):
-		return f'(VAR_ASSIGN: {self.var_name}, {self.value_node})'
+		return node_repr(self)
 
 
 class VarAccessNode:
+	__slots__ = ('var_name',)
+
 	def __init__(self, var_name):
 		self.var_name = var_name
 
@@ -282,6 +575,8 @@ class VarAccessNode:
 
 
 class StringNode:
+	__slots__ = ('tok',)
+
 	def __init__(self, tok):
 		self.tok = tok
 
@@ -290,27 +585,132 @@ class StringNode:
 
 
 class WhileNode:
+	__slots__ = ('condition_node', 'body_node')
+
 	def __init__(self, condition_node, body_node):
 		self.condition_node = condition_node
 		self.body_node = body_node
 
+	def repr_parts(self):
+		return ['(WHILE ', self.condition_node, ' : ', self.body_node, ')']
+
 	def __repr__(self):
-		return f'(WHILE {self.condition_node} : {self.body_node})'
+		return node_repr(self)
 
 
 class PrintNode:
+	__slots__ = ('value_node',)
+
 	def __init__(self, value_node):
 		self.value_node = value_node
 
+	def repr_parts(self):
+		return ['(PRINT: ', self.value_node, ')']
+
 	def __repr__(self):
-		return f'(PRINT: {self.value_node})'
+		return node_repr(self)
 
 
 class EmptyNode:
+	__slots__ = ()
+
 	def __repr__(self):
 		return '(EMPTY)'
 
 
+class NodeArena:
+	"""
+	Hash-conses constant and variable subtrees. Leaves with the same token
+	type and value, and operator nodes whose operands are themselves shared,
+	are built once and handed out again, so identical subexpressions are the
+	same object and can be recognised with 'is'. A shared node keeps the
+	tokens of its first occurrence. Assignments, prints and loops are never
+	shared. Pass one arena to every parse whose nodes should be pooled.
+	"""
+	def __init__(self):
+		self.nodes = {}
+		# ids of the nodes in self.nodes, which keeps them alive
+		self.shared = set()
+		self.hits = 0
+
+	def intern(self, key, make, *args):
+		node = self.nodes.get(key)
+		if node is not None:
+			self.hits += 1
+			return node
+		node = self.nodes[key] = make(*args)
+		self.shared.add(id(node))
+		return node
+
+	def number(self, tok):
+		return self.intern((NumberNode, tok.type, repr(tok.value)), NumberNode, tok)
+
+	def string(self, tok):
+		return self.intern((StringNode, tok.value), StringNode, tok)
+
+	def var_access(self, tok):
+		return self.intern((VarAccessNode, tok.value), VarAccessNode, tok)
+
+	def unary(self, op_tok, node):
+		if id(node) not in self.shared:
+			return UnaryOpNode(op_tok, node)
+		return self.intern((UnaryOpNode, op_tok.type, id(node)), UnaryOpNode, op_tok, node)
+
+	def binop(self, left, op_tok, right):
+		if id(left) not in self.shared or id(right) not in self.shared:
+			return BinOpNode(left, op_tok, right)
+		return self.intern((BinOpNode, op_tok.type, id(left), id(right)), BinOpNode, left, op_tok, right)
+
+	def __len__(self):
+		return len(self.nodes)
+
+
+# Attributes holding child nodes, per node class
+CHILD_FIELDS = {
+	BinOpNode: ('left_node', 'right_node'),
+	UnaryOpNode: ('node',),
+	VarAssignNode: ('value_node',),
+	WhileNode: ('condition_node', 'body_node'),
+	PrintNode: ('value_node',),
+}
+
+def node_repr(node):
+	# Nodes with children list their text and children in repr_parts();
+	# they are joined here with an explicit stack rather than by nested
+	# reprs, so a tree of any depth can be printed
+	parts = []
+	stack = [node]
+	while stack:
+		item = stack.pop()
+		if isinstance(item, list):
+			pieces = ['[']
+			for i, sub_node in enumerate(item):
+				if i: pieces.append(', ')
+				pieces.append(sub_node)
+			pieces.append(']')
+		elif hasattr(item, 'repr_parts'):
+			pieces = item.repr_parts()
+		else:
+			parts.append(item if isinstance(item, str) else str(item))
+			continue
+		stack.extend(reversed(pieces))
+	return ''.join(parts)
+
+def count_nodes(node):
+	# Iterative, so it works on trees too deep to recurse over
+	count = 0
+	stack = [node]
+	while stack:
+		node = stack.pop()
+		if isinstance(node, list):
+			stack.extend(node)
+			continue
+		count += 1
+		for field in CHILD_FIELDS.get(type(node), ()):
+			stack.append(getattr(node, field))
+	return count
+
+
 #######################################
 # PARSE RESULT
 #######################################
@@ -344,17 +744,103 @@ class ParseResult:
 # PARSER
 #######################################
 
+# Binding power of each infix operator; higher binds tighter. Operators
+# are left-associative unless listed in RIGHT_ASSOCIATIVE.
+INFIX_PRECEDENCE = {
+	TT_EE: 5,
+	TT_NE: 5,
+	TT_LT: 5,
+	TT_GT: 5,
+	TT_LTE: 5,
+	TT_GTE: 5,
+	TT_PLUS: 10,
+	TT_MINUS: 10,
+	TT_MUL: 20,
+	TT_DIV: 20,
+}
+RIGHT_ASSOCIATIVE = set()
+PREFIX_OPERATORS = {TT_PLUS, TT_MINUS}
+# Prefix operators apply to the operand right after them, before any infix
+PREFIX_PRECEDENCE = 100
+
+GROUP, PREFIX, INFIX = range(3)
 
-class Parser:
+# Keywords that begin a statement; after a syntax error the recovering
+# parser skips ahead to one of these or past the next ':'
+SYNC_KEYWORDS = ('let', 'var', 'print', 'while')
+
+
+class TokenStream:
+	"""
+	Pulls tokens on demand from a list or a generator such as
+	Lexer.iter_tokens(), holding only the tokens that have been peeked at.
+	"""
 	def __init__(self, tokens):
-		self.tokens = tokens
+		self.source = iter(tokens)
+		self.lookahead = deque()
+
+	def peek(self, offset=0):
+		while len(self.lookahead) <= offset:
+			tok = next(self.source, None)
+			if tok is None: return None
+			self.lookahead.append(tok)
+		return self.lookahead[offset]
+
+	def next(self):
+		if self.lookahead:
+			return self.lookahead.popleft()
+		return next(self.source, None)
+
+	def __iter__(self):
+		while self.lookahead:
+			yield self.lookahead.popleft()
+		yield from self.source
+
+
+class Parser:
+	# Operator tables used by expr(); subclasses can extend them
+	infix_precedence = INFIX_PRECEDENCE
+	right_associative = RIGHT_ASSOCIATIVE
+	prefix_operators = PREFIX_OPERATORS
+
+	# Node builders, called as each production is recognised. They build
+	# the AST here; a subclass can override them to produce something else,
+	# as icg.EmittingParser does to generate quadruples directly.
+	build_number = NumberNode
+	build_string = StringNode
+	build_var_access = VarAccessNode
+	build_unary = UnaryOpNode
+	build_binop = BinOpNode
+	build_var_assign = VarAssignNode
+	build_print = PrintNode
+
+	def __init__(self, tokens, arena=None):
+		self.tokens = TokenStream(tokens)
 		self.tok_idx = -1
+		if arena is not None:
+			self.build_number = arena.number
+			self.build_string = arena.string
+			self.build_var_access = arena.var_access
+			self.build_unary = arena.unary
+			self.build_binop = arena.binop
 		self.advance()
 
+	def begin_while(self):
+		# Called after 'while', before the condition is parsed; the value
+		# returned is handed back to while_condition() and build_while()
+		return None
+
+	def while_condition(self, loop, condition):
+		pass
+
+	def build_while(self, loop, condition, body):
+		return WhileNode(condition, body)
+
 	def advance(self):
 		self.tok_idx += 1
-		if self.tok_idx < len(self.tokens):
-			self.current_tok = self.tokens[self.tok_idx]
+		tok = self.tokens.next()
+		if tok is not None:
+			self.current_tok = tok
 		return self.current_tok
 
 	def parse(self):
@@ -366,6 +852,43 @@ class Parser:
 			))
 		return res
 
+	def parse_recovering(self):
+		"""
+		Parse every statement, carrying on after syntax errors instead of
+		stopping at the first. Returns (statements, errors): the statements
+		that parsed, as parse() would give them for a text without errors,
+		and one error per statement that did not.
+		"""
+		statements = []
+		errors = []
+
+		while self.current_tok.type != TT_EOF:
+			start_idx = self.tok_idx
+			res = self.statement()
+			if res.error:
+				errors.append(res.error)
+				self.synchronize(start_idx)
+				continue
+			statements.append(res.node)
+			self.advance()
+
+		return statements, errors
+
+	def synchronize(self, start_idx):
+		# Skip the rest of a failed statement: up to the next statement
+		# keyword, or past the next ':'. At least one token is always
+		# skipped so a statement that failed on its first token moves on.
+		if self.tok_idx == start_idx:
+			self.advance()
+		while self.current_tok.type != TT_EOF:
+			tok = self.current_tok
+			if tok.type == TT_SCOLON:
+				self.advance()
+				return
+			if tok.type == TT_KEYWORD and tok.value in SYNC_KEYWORDS:
+				return
+			self.advance()
+
 	def statements(self):
 		res = ParseResult()
 		statements = []
@@ -409,7 +932,7 @@ class Parser:
 			expr = res.register(self.expr())
 			if res.error:
 				return res
-			return res.success(VarAssignNode(var_name, expr))
+			return res.success(self.build_var_assign(var_name, expr))
 
 		if self.current_tok.matches(TT_KEYWORD, 'var'):
 			res.register_advancement()
@@ -436,7 +959,7 @@ class Parser:
 			expr = res.register(self.expr())
 			if res.error:
 				return res
-			return res.success(VarAssignNode(var_name, expr))
+			return res.success(self.build_var_assign(var_name, expr))
 
 		if self.current_tok.matches(TT_KEYWORD, 'print'):
 			res.register_advancement()
@@ -461,24 +984,19 @@ class Parser:
 
 			res.register_advancement()
 			self.advance()
-			return res.success(PrintNode(expr))
+			return res.success(self.build_print(expr))
 
 		if self.current_tok.matches(TT_KEYWORD, 'while'):
 			res.register_advancement()
 			self.advance()
+			loop = self.begin_while()
 
 			condition = res.register(self.expr())
 			if res.error: return res.failure(InvalidSyntaxError(
 				self.current_tok.pos_start, self.current_tok.pos_end,
 				"Expected condition after 'while'"
 			))
-
-			res.register_advancement()
-			self.advance()
-
-			condition = res.register(self.expr())
-			if res.error:
-				return res
+			self.while_condition(loop, condition)
 
 			if not self.current_tok.type == TT_SCOLON:
 				return res.failure(InvalidSyntaxError(
@@ -504,7 +1022,7 @@ class Parser:
 			else:
 				body = res.register(self.statement())
 				if res.error: return res
-			return res.success(WhileNode(condition, body))
+			return res.success(self.build_while(loop, condition, body))
 
 		expr = res.register(self.expr())
 		if res.error:
@@ -546,7 +1064,7 @@ class Parser:
 		expr = res.register(self.expr())
 		if res.error:
 			return res
-		return res.success(VarAssignNode(var_name, expr))
+		return res.success(self.build_var_assign(var_name, expr))
 
 	def print_statement(self):
 		res = ParseResult()
@@ -578,8 +1096,105 @@ class Parser:
             ))
 		res.register_advancement()
 		self.advance()
-		return res.success(PrintNode(expr))
+		return res.success(self.build_print(expr))
 
+	def expr(self):
+		"""
+		Operator-precedence parse of an expression with explicit operator and
+		operand stacks instead of one call per precedence level, so nesting
+		depth is bounded by memory rather than the Python stack. Builds the
+		same BinOpNode/UnaryOpNode trees as RecursiveDescentParser.
+		"""
+		start_idx = self.tok_idx
+		infix = self.infix_precedence
+		prefix = self.prefix_operators
+		right_associative = self.right_associative
+		operands = []
+		# Entries are (kind, token, precedence): an open '(' group, a prefix
+		# operator or an infix operator waiting for its right operand
+		operators = []
+		groups = 0
+
+		while True:
+			# Operand position: any prefix operators and '(' first
+			tok = self.current_tok
+			tok_type = tok.type
+			if tok_type in prefix:
+				operators.append((PREFIX, tok, PREFIX_PRECEDENCE))
+				self.advance()
+				continue
+			if tok_type == TT_LPAREN:
+				operators.append((GROUP, tok, 0))
+				groups += 1
+				self.advance()
+				continue
+			if tok_type in (TT_INT, TT_FLOAT):
+				operands.append(self.build_number(tok))
+			elif tok_type == TT_IDENTIFIER:
+				operands.append(self.build_var_access(tok))
+			elif tok_type == TT_STRING:
+				operands.append(self.build_string(tok))
+			else:
+				return self.expr_failure(start_idx, InvalidSyntaxError(
+					tok.pos_start, tok.pos_end,
+					"Expected int, float, Identifier, string, '+', '-', or '('"
+				))
+			self.advance()
+
+			# Operator position: close groups until an infix operator follows
+			while True:
+				tok = self.current_tok
+				precedence = infix.get(tok.type)
+				if precedence is not None:
+					right = tok.type in right_associative
+					while operators and operators[-1][0] != GROUP and (
+						operators[-1][2] > precedence or (operators[-1][2] == precedence and not right)
+					):
+						self.reduce(operators, operands)
+					operators.append((INFIX, tok, precedence))
+					self.advance()
+					break
+
+				if groups and tok.type == TT_RPAREN:
+					while operators[-1][0] != GROUP:
+						self.reduce(operators, operands)
+					operators.pop()
+					groups -= 1
+					self.advance()
+					continue
+
+				if groups:
+					return self.expr_failure(start_idx, InvalidSyntaxError(
+						tok.pos_start, tok.pos_end,
+						"Expected ')'"
+					))
+				while operators:
+					self.reduce(operators, operands)
+				res = ParseResult()
+				res.advance_count = self.tok_idx - start_idx
+				return res.success(operands[-1])
+
+	def reduce(self, operators, operands):
+		kind, tok, _ = operators.pop()
+		if kind == PREFIX:
+			operands[-1] = self.build_unary(tok, operands[-1])
+		else:
+			right = operands.pop()
+			operands[-1] = self.build_binop(operands[-1], tok, right)
+
+	def expr_failure(self, start_idx, error):
+		# Report the tokens consumed before the error like the recursive
+		# parser's chain of registered advancements would
+		res = ParseResult()
+		res.advance_count = self.tok_idx - start_idx
+		return res.failure(error)
+
+class RecursiveDescentParser(Parser):
+	"""
+	The original expression grammar, one method and one ParseResult per
+	precedence level. Kept as the reference for Parser.expr in tests and
+	benchmarks; it recurses once per nesting level.
+	"""
 	def factor(self):
 		res = ParseResult()
 		tok = self.current_tok
@@ -631,9 +1246,12 @@ class Parser:
 	def term(self):
 		return self.bin_op(self.factor, (TT_MUL, TT_DIV))
 
-	def expr(self):
+	def arith_expr(self):
 		return self.bin_op(self.term, (TT_PLUS, TT_MINUS))
 
+	def expr(self):
+		return self.bin_op(self.arith_expr, (TT_EE, TT_NE, TT_LT, TT_GT, TT_LTE, TT_GTE))
+
 	###################################
 
 	def bin_op(self, func, ops):
@@ -651,21 +1269,180 @@ class Parser:
 
 		return res.success(left)
 
+#######################################
+# PHASE STATS
+#######################################
+
+PHASES = ('lex', 'parse', 'icg', 'optimize')
+
+class PhaseStats:
+    """
+    Opt-in instrumentation for run() and IntermediateCodeGenerator: wall
+    time per phase plus token, AST node and quadruple counts, accumulated
+    over every call it is passed to. Each hook is called as
+    hook(phase, seconds, count) when a phase finishes, so the numbers can
+    be forwarded elsewhere as they are produced.
+    """
+    def __init__(self, hooks=()):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.tokens = 0
+        self.nodes = 0
+        self.quadruples = 0
+        self.runs = 0
+        self.errors = 0
+        self.hooks = list(hooks)
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def record(self, phase, seconds, count=0):
+        self.seconds[phase] += seconds
+        for hook in self.hooks:
+            hook(phase, seconds, count)
+
+    def merge(self, other):
+        # Fold in stats gathered elsewhere, e.g. by a worker process
+        for phase in PHASES:
+            self.seconds[phase] += other.seconds[phase]
+        self.tokens += other.tokens
+        self.nodes += other.nodes
+        self.quadruples += other.quadruples
+        self.runs += other.runs
+        self.errors += other.errors
+
+    def report(self):
+        total = sum(self.seconds.values())
+        lines = [
+            f'{phase:<9} {seconds * 1000:10.3f} ms  {seconds / total * 100 if total else 0.0:5.1f}%'
+            for phase, seconds in self.seconds.items()
+        ]
+        lines.append(f'{self.runs} runs ({self.errors} errors): {self.tokens} tokens, '
+                     f'{self.nodes} AST nodes, {self.quadruples} quadruples')
+        return '\n'.join(lines)
+
 #######################################
 # RUN
 #######################################
 
-def run(fn, text, show_tokens=False):
+def run(fn, text, show_tokens=False, lexer_class=RegexLexer, stats=None, arena=None, symbols=None):
+    if stats is not None:
+        return run_with_stats(fn, text, lexer_class, stats, arena, symbols)
+
     # Generate tokens
-    lexer = Lexer(fn, text)
-    tokens, error = lexer.make_tokens()
+    lexer = lexer_class(fn, text)
+    tokens, error = lexer.make_token_buffer(symbols)
     if error: return None, error, tokens
 
     # Generate AST
-    parser = Parser(tokens)
+    parser = Parser(tokens, arena)
     ast = parser.parse()
 
     if ast.error:
         return None, ast.error, tokens
 
     return ast.node, None, tokens
+
+def run_recovering(fn, text, lexer_class=RegexLexer, arena=None, symbols=None):
+    """
+    Like run(), but lexing and parsing carry on past errors: illegal
+    characters are skipped and the parser resynchronizes after each syntax
+    error. Returns (statements, errors, tokens), where statements are the
+    ones that parsed and errors holds every error in source order. Errors
+    keep only offsets into the text, so collecting thousands of them costs
+    little; each is turned into a line and excerpt when rendered.
+    """
+    lexer = lexer_class(fn, text, recover=True)
+    tokens, _ = lexer.make_token_buffer(symbols)
+    statements, errors = Parser(tokens, arena).parse_recovering()
+    errors = sorted(lexer.errors + errors, key=lambda error: error.pos_start.idx)
+    return statements, errors, tokens
+
+def run_with_stats(fn, text, lexer_class, stats, arena=None, symbols=None):
+    # run(), timing each phase into stats; kept apart so the plain path
+    # pays nothing for it
+    stats.runs += 1
+    start = time.perf_counter()
+    tokens, error = lexer_class(fn, text).make_token_buffer(symbols)
+    lexed = time.perf_counter()
+    stats.tokens += len(tokens)
+    stats.record('lex', lexed - start, len(tokens))
+    if error:
+        stats.errors += 1
+        return None, error, tokens
+
+    ast = Parser(tokens, arena).parse()
+    parsed = time.perf_counter()
+    if ast.error:
+        stats.errors += 1
+        stats.record('parse', parsed - lexed)
+        return None, ast.error, tokens
+
+    nodes = count_nodes(ast.node)
+    stats.nodes += nodes
+    stats.record('parse', parsed - lexed, nodes)
+    return ast.node, None, tokens
+
+def run_streaming(fn, text, lexer_class=RegexLexer):
+    """
+    Like run(), but the parser pulls tokens from the lexer as it needs them,
+    so the full token list is never built. Returns (ast, error).
+    """
+    lexer = lexer_class(fn, text)
+    parser = Parser(lexer.iter_tokens())
+    ast = parser.parse()
+
+    # run() reports a lexer error in preference to any syntax error, so
+    # finish scanning in case the illegal character lies past the failure
+    if ast.error and not lexer.error:
+        for _ in parser.tokens: pass
+
+    if lexer.error: return None, lexer.error
+    if ast.error: return None, ast.error
+    return ast.node, None
+
+#######################################
+# SESSION
+#######################################
+
+SESSION_CACHE_SIZE = 256
+
+class Session:
+    """
+    Wraps run() with a bounded LRU cache keyed by (fn, text), so lines that
+    are entered again get their tokens, AST or error back without being
+    lexed and parsed a second time. A size of 0 turns the cache off.
+    """
+    def __init__(self, size=SESSION_CACHE_SIZE, lexer_class=RegexLexer, stats=None):
+        self.size = size
+        self.lexer_class = lexer_class
+        # Optional PhaseStats; lines served from the cache add nothing to it
+        self.stats = stats
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def run(self, fn, text):
+        key = (fn, text)
+        result = self.cache.get(key)
+        if result is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return result
+
+        self.misses += 1
+        result = run(fn, text, lexer_class=self.lexer_class, stats=self.stats)
+        if self.size > 0:
+            self.cache[key] = result
+            if len(self.cache) > self.size:
+                self.cache.popitem(last=False)
+        return result
+
+    def clear(self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return f'cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), {len(self.cache)}/{self.size} entries'
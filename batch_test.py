@@ -0,0 +1,114 @@
+import contextlib
+import io
+import os
+import tempfile
+
+from main import collect_sources, parse_args, run_batch
+
+PROGRAMS = {
+    'a.txt': "let x = 1 + 2\nprint(x)",
+    'b.txt': "let n = 3\nwhile n : let n = n - 1",
+    os.path.join('nested', 'c.txt'): "let y = 2 * 3 * 4",
+    os.path.join('nested', 'd.txt'): "let = 1",
+    'notes.md': "not a program",
+}
+
+
+def write_corpus(root):
+    for name, text in PROGRAMS.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(text)
+
+
+def read_outputs(root):
+    outputs = {}
+    for folder, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(folder, name)
+            with open(path) as file:
+                outputs[os.path.relpath(path, root)] = file.read()
+    return outputs
+
+
+def run_batch_tests():
+    with tempfile.TemporaryDirectory() as root:
+        source_dir = os.path.join(root, 'src')
+        write_corpus(source_dir)
+
+        sources = [relative for _, relative in collect_sources([source_dir])]
+        expected = ['a.txt', 'b.txt', os.path.join('nested', 'c.txt'), os.path.join('nested', 'd.txt')]
+        if sources == expected:
+            print("Test 1 passed")
+        else:
+            print(f"Test 1 failed: expected {expected}, got {sources}")
+
+        runs = {}
+        for jobs in (1, 2):
+            output_dir = os.path.join(root, f'out{jobs}')
+            results = run_batch([source_dir], jobs=jobs, output_dir=output_dir, out=io.StringIO())
+            runs[jobs] = [(result.source, result.quadruples, result.errors) for result in results], read_outputs(output_dir)
+
+        summary, outputs = runs[1]
+        if runs[1] == runs[2]:
+            print("Test 2 passed")
+        else:
+            print("Test 2 failed: serial and parallel batches differ")
+
+        if outputs.get('a.txt.quad') == "(PLUS, 1, 2, T1)\n(=, T1, None, x)\n(PRINT, x, None, None)\n":
+            print("Test 3 passed")
+        else:
+            print(f"Test 3 failed: got {outputs.get('a.txt.quad')!r}")
+
+        failed = [os.path.basename(source) for source, _, errors in summary if errors]
+        if failed == ['d.txt']:
+            print("Test 4 passed")
+        else:
+            print(f"Test 4 failed: expected errors in d.txt only, got {failed}")
+
+        cache_dir = os.path.join(root, 'cache')
+        output_dir = os.path.join(root, 'cached')
+        first = run_batch([source_dir], jobs=2, output_dir=output_dir, out=io.StringIO(), cache_dir=cache_dir)
+        second = run_batch([source_dir], jobs=2, output_dir=output_dir, out=io.StringIO(), cache_dir=cache_dir)
+        hits = [result.cached for result in second]
+        if [result.cached for result in first] == [False] * 4 and hits == [True, True, True, False] \
+                and read_outputs(output_dir) == outputs:
+            print("Test 5 passed")
+        else:
+            print(f"Test 5 failed: cache hits {hits}")
+
+        # A file that cannot be decoded or compiled is reported as failed
+        # without stopping the batch, serially or in parallel
+        bad_dir = os.path.join(root, 'bad')
+        os.makedirs(bad_dir)
+        with open(os.path.join(bad_dir, 'a.txt'), 'wb') as file:
+            file.write(b'let x = "\xff\xfe"\n')
+        with open(os.path.join(bad_dir, 'b.txt'), 'w') as file:
+            # Statements still nest by recursion in the parser
+            file.write('while 1 : ' * 5000 + 'print(1)\n')
+        with open(os.path.join(bad_dir, 'c.txt'), 'w') as file:
+            file.write('print(1)\n')
+        for jobs in (1, 2):
+            results = run_batch([bad_dir], jobs=jobs, output_dir=os.path.join(root, 'bad_out'), out=io.StringIO())
+            if [bool(result.errors) for result in results] == [True, True, False]:
+                print(f"Test {5 + jobs} passed")
+            else:
+                print(f"Test {5 + jobs} failed: got {[result.errors for result in results]}")
+
+    # A worker count below one is a usage error, not "one per CPU"
+    rejected = []
+    for jobs in ('0', '-1'):
+        try:
+            with contextlib.redirect_stderr(io.StringIO()):
+                parse_args(['-j', jobs, 'a.txt'])
+        except SystemExit:
+            rejected.append(jobs)
+    if rejected == ['0', '-1'] and parse_args(['-j', '3', 'a.txt']).jobs == 3:
+        print("Test 8 passed")
+    else:
+        print(f"Test 8 failed: only rejected {rejected}")
+
+
+if __name__ == "__main__":
+    run_batch_tests()
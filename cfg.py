@@ -0,0 +1,196 @@
+import sys
+
+from quadruple import JUMPS
+
+
+class BasicBlock:
+    """
+    A maximal run of quadruples entered only at the top and left only at
+    the bottom. start and end index the block's quadruples in the list the
+    graph was built from; label is the LABEL it begins with, if any.
+    """
+    def __init__(self, index, start):
+        self.index = index
+        self.start = start
+        self.end = start
+        self.label = None
+        self.quadruples = []
+        self.successors = []
+        self.predecessors = []
+
+    def last(self):
+        return self.quadruples[-1] if self.quadruples else None
+
+    def __repr__(self):
+        return f'B{self.index}[{self.start}:{self.end}] -> {[block.index for block in self.successors]}'
+
+
+class Loop:
+    """
+    The natural loop of one or more back edges into header: the header and
+    every block that can reach a latch without passing through it.
+    """
+    def __init__(self, header, latches, blocks):
+        self.header = header
+        self.latches = latches
+        self.blocks = blocks
+
+    def __contains__(self, block):
+        return block in self.blocks
+
+    def __repr__(self):
+        return f'Loop(B{self.header.index}, {sorted(block.index for block in self.blocks)})'
+
+
+class ControlFlowGraph:
+    """
+    Splits a quadruple list into basic blocks and links them. A block starts
+    at every LABEL and after every jump; control falls through from a block
+    into the next one unless it ends in a GOTO. Dominators are computed for
+    blocks reachable from the entry, which is block 0.
+    """
+    def __init__(self, quadruples):
+        self.quadruples = quadruples
+        self.blocks = []
+        self.labels = {}
+        self.split()
+        self.link()
+        self.reachable = self.reachable_blocks()
+        self.dominators = self.compute_dominators()
+
+    def split(self):
+        block = None
+        for i, quad in enumerate(self.quadruples):
+            if block is None or (quad.operator == 'LABEL' and block.quadruples):
+                block = BasicBlock(len(self.blocks), i)
+                self.blocks.append(block)
+            if quad.operator == 'LABEL':
+                if block.label is None:
+                    block.label = quad.result
+                self.labels[quad.result] = block
+            block.quadruples.append(quad)
+            block.end = i + 1
+            if quad.operator in JUMPS:
+                block = None
+
+    def link(self):
+        for block in self.blocks:
+            last = block.last()
+            targets = []
+            if (last is None or last.operator != 'GOTO') and block.index + 1 < len(self.blocks):
+                targets.append(self.blocks[block.index + 1])
+            if last is not None and last.operator in JUMPS:
+                if last.result not in self.labels:
+                    raise ValueError(f"Undefined label in {last}")
+                targets.append(self.labels[last.result])
+            for target in targets:
+                if target not in block.successors:
+                    block.successors.append(target)
+                    target.predecessors.append(block)
+
+    def reachable_blocks(self):
+        if not self.blocks:
+            return []
+        seen = {self.blocks[0]}
+        stack = [self.blocks[0]]
+        while stack:
+            for successor in stack.pop().successors:
+                if successor not in seen:
+                    seen.add(successor)
+                    stack.append(successor)
+        return [block for block in self.blocks if block in seen]
+
+    def compute_dominators(self):
+        """
+        Iterative dataflow: a block's dominators are itself plus those
+        common to all of its reachable predecessors. Returns a dict from
+        each reachable block to its set of dominators.
+        """
+        reachable = self.reachable
+        if not reachable:
+            return {}
+        entry = reachable[0]
+        everything = set(reachable)
+        dominators = {block: set(everything) for block in reachable}
+        dominators[entry] = {entry}
+
+        changed = True
+        while changed:
+            changed = False
+            for block in reachable[1:]:
+                incoming = [dominators[pred] for pred in block.predecessors if pred in dominators]
+                new = set.intersection(*incoming) if incoming else set()
+                new.add(block)
+                if new != dominators[block]:
+                    dominators[block] = new
+                    changed = True
+        return dominators
+
+    def dominates(self, a, b):
+        return b in self.dominators and a in self.dominators[b]
+
+    def back_edges(self):
+        # Edges whose target dominates their source
+        return [
+            (block, successor)
+            for block in self.reachable for successor in block.successors
+            if self.dominates(successor, block)
+        ]
+
+    def loops(self):
+        """
+        Natural loops, one per header, innermost (smallest) first.
+        """
+        latches = {}
+        for latch, header in self.back_edges():
+            latches.setdefault(header, []).append(latch)
+
+        loops = []
+        for header, sources in latches.items():
+            blocks = {header}
+            stack = [latch for latch in sources if latch is not header]
+            blocks.update(stack)
+            while stack:
+                for pred in stack.pop().predecessors:
+                    if pred not in blocks and pred in self.dominators:
+                        blocks.add(pred)
+                        stack.append(pred)
+            loops.append(Loop(header, sources, blocks))
+        loops.sort(key=lambda loop: (len(loop.blocks), loop.header.index))
+        return loops
+
+    def preheader_index(self, loop):
+        """
+        Where code that must run once before loop can be inserted: just
+        ahead of the header, provided control only enters the header from
+        outside the loop by falling into it. Returns None otherwise.
+        """
+        header = loop.header
+        outside = [pred for pred in header.predecessors if pred not in loop]
+        if header.index == 0:
+            return header.start if not outside else None
+        previous = self.blocks[header.index - 1]
+        if outside != [previous] or previous in loop:
+            return None
+        last = previous.last()
+        if last is not None and last.operator in JUMPS and self.labels[last.result] is header:
+            return None
+        return header.start
+
+
+def main(paths):
+    from icg import IntermediateCodeGenerator
+
+    for path in paths:
+        with open(path, 'r') as file:
+            quadruples, _ = IntermediateCodeGenerator().generate_program(file.read(), path)
+        graph = ControlFlowGraph(quadruples)
+        print(f"{path}: {len(graph.blocks)} blocks, {len(graph.loops())} loops")
+        for block in graph.blocks:
+            print(f"  {block}")
+        for loop in graph.loops():
+            print(f"  {loop}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ['input.txt'])
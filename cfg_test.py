@@ -0,0 +1,80 @@
+from cfg import ControlFlowGraph
+from quadruple import Quadruple
+
+
+def quads(*rows):
+    return [Quadruple(*row) for row in rows]
+
+
+def run_cfg_tests():
+    test = 0
+
+    # The while shape the ICG emits: entry, header, body, exit
+    graph = ControlFlowGraph(quads(
+        ('=', 3, None, 'n'),
+        ('LABEL', None, None, 'L1'),
+        ('IF_FALSE', 'n', None, 'L2'),
+        ('MINUS', 'n', 1, 'n'),
+        ('GOTO', None, None, 'L1'),
+        ('LABEL', None, None, 'L2'),
+        ('PRINT', 'n', None, None),
+    ))
+    entry, header, body, exit_ = graph.blocks
+    test += 1
+    edges = [[block.index for block in b.successors] for b in graph.blocks]
+    preds = [[block.index for block in b.predecessors] for b in graph.blocks]
+    if edges == [[1], [2, 3], [1], []] and preds == [[], [0, 2], [1], [1]] \
+            and [(b.start, b.end) for b in graph.blocks] == [(0, 1), (1, 3), (3, 5), (5, 7)]:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: got {graph.blocks}")
+
+    test += 1
+    if graph.dominators[body] == {entry, header, body} and graph.dominators[exit_] == {entry, header, exit_} \
+            and graph.dominates(header, body) and not graph.dominates(body, exit_):
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: got {graph.dominators}")
+
+    test += 1
+    loops = graph.loops()
+    if graph.back_edges() == [(body, header)] and len(loops) == 1 and loops[0].blocks == {header, body} \
+            and graph.preheader_index(loops[0]) == 1:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: got {loops}")
+
+    # Nested loops come out innermost first; code after a GOTO is unreachable
+    graph = ControlFlowGraph(quads(
+        ('LABEL', None, None, 'L1'),
+        ('IF_FALSE', 'a', None, 'L4'),
+        ('LABEL', None, None, 'L2'),
+        ('IF_FALSE', 'b', None, 'L3'),
+        ('MINUS', 'b', 1, 'b'),
+        ('GOTO', None, None, 'L2'),
+        ('LABEL', None, None, 'L3'),
+        ('MINUS', 'a', 1, 'a'),
+        ('GOTO', None, None, 'L1'),
+        ('PRINT', 'a', None, None),
+        ('LABEL', None, None, 'L4'),
+    ))
+    test += 1
+    loops = graph.loops()
+    inner = {block.index for block in loops[0].blocks}
+    outer = {block.index for block in loops[1].blocks}
+    if inner == {1, 2} and outer == {0, 1, 2, 3} and graph.blocks[4] not in graph.dominators \
+            and graph.preheader_index(loops[1]) == 0:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: got {loops}")
+
+    test += 1
+    try:
+        ControlFlowGraph(quads(('GOTO', None, None, 'L9')))
+        print(f"Test {test} failed: undefined label was accepted")
+    except ValueError:
+        print(f"Test {test} passed")
+
+
+if __name__ == "__main__":
+    run_cfg_tests()
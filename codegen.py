@@ -0,0 +1,177 @@
+import math
+from collections import OrderedDict
+
+from quadruple import BINARY_OPERATORS, BRANCH_OPERATORS, COMPARISON_OPERATORS, JUMPS, is_name, is_string_constant, is_temp, operand_key
+from vm import VMError
+
+PYTHON_OPERATORS = {
+    'PLUS': '+',
+    'MINUS': '-',
+    'MUL': '*',
+    'DIV': '/',
+    'LT': '<',
+    'GT': '>',
+    'LTE': '<=',
+    'GTE': '>=',
+    'EE': '==',
+    'NE': '!=',
+}
+
+# Comparison tested by each compare-and-branch
+BRANCH_COMPARISONS = {branch: PYTHON_OPERATORS[op] for op, branch in BRANCH_OPERATORS.items()}
+
+# Largest range of blocks dispatched with a plain if/elif chain
+DISPATCH_CHAIN = 4
+
+# Compiled programs kept per distinct quadruple list
+CACHE_SIZE = 128
+_cache = OrderedDict()
+_cache_stats = {'hits': 0, 'misses': 0}
+
+
+class CompiledProgram:
+    """
+    A quadruple list translated to the source of one Python function and
+    compiled with compile(). Variables and temporaries become local variables
+    of that function and every basic block becomes one branch of a dispatch
+    loop, so running it costs about as much as the equivalent Python code.
+    """
+    def __init__(self, quadruples):
+        self.names = {}
+        self.constants = []
+        self.source = self.translate(quadruples)
+        namespace = {'VMError': VMError, 'constants': self.constants}
+        exec(compile(self.source, '<quadruples>', 'exec'), namespace)
+        self.function = namespace['program']
+
+    def name(self, operand):
+        if operand not in self.names:
+            self.names[operand] = f'r{len(self.names)}'
+        return self.names[operand]
+
+    def value(self, operand):
+        if is_name(operand):
+            return self.name(operand)
+        if is_string_constant(operand):
+            return repr(operand[1:-1])
+        if isinstance(operand, float) and not math.isfinite(operand):
+            self.constants.append(operand)
+            return f'constants[{len(self.constants) - 1}]'
+        return repr(operand)
+
+    def statement(self, quad):
+        op = quad.operator
+        if op in COMPARISON_OPERATORS:
+            return (f'{self.name(quad.result)} = 1 if {self.value(quad.arg1)} {PYTHON_OPERATORS[op]} '
+                    f'{self.value(quad.arg2)} else 0')
+        if op in BINARY_OPERATORS:
+            return f'{self.name(quad.result)} = {self.value(quad.arg1)} {PYTHON_OPERATORS[op]} {self.value(quad.arg2)}'
+        if op == 'NEG':
+            return f'{self.name(quad.result)} = -{self.value(quad.arg1)}'
+        if op == '=':
+            return f'{self.name(quad.result)} = {self.value(quad.arg1)}'
+        if op == 'PRINT':
+            return f'output({self.value(quad.arg1)})'
+        raise VMError(f"Unknown operator in {quad}")
+
+    def split_blocks(self, quadruples):
+        blocks = [[]]
+        labels = {}
+        for quad in quadruples:
+            if quad.operator == 'LABEL':
+                if blocks[-1]:
+                    blocks.append([])
+                labels[quad.result] = len(blocks) - 1
+                continue
+            blocks[-1].append(quad)
+            if quad.operator in JUMPS:
+                blocks.append([])
+        return blocks, labels
+
+    def translate(self, quadruples):
+        blocks, labels = self.split_blocks(quadruples)
+        for quad in quadruples:
+            if quad.operator in JUMPS and quad.result not in labels:
+                raise VMError(f"Undefined label in {quad}")
+
+        bodies = []
+        for index, block in enumerate(blocks):
+            following = f'block = {index + 1}' if index + 1 < len(blocks) else 'break'
+            lines = []
+            for quad in block:
+                if quad.operator == 'GOTO':
+                    lines.append(f'block = {labels[quad.result]}')
+                    following = None
+                elif quad.operator == 'IF_FALSE':
+                    lines.append(f'if not {self.value(quad.arg1)}:')
+                    lines.append(f'    block = {labels[quad.result]}')
+                    lines.append('    continue')
+                elif quad.operator in BRANCH_COMPARISONS:
+                    comparison = BRANCH_COMPARISONS[quad.operator]
+                    lines.append(f'if not ({self.value(quad.arg1)} {comparison} {self.value(quad.arg2)}):')
+                    lines.append(f'    block = {labels[quad.result]}')
+                    lines.append('    continue')
+                else:
+                    lines.append(self.statement(quad))
+            if following:
+                lines.append(following)
+            bodies.append(lines)
+        body = self.dispatch(bodies, 0, len(bodies))
+
+        variables = [name for name in self.names if not is_temp(name)]
+        source = ['def program(output):']
+        if self.names:
+            source.append('    ' + ' = '.join(self.names.values()) + ' = None')
+        source.append('    block = 0')
+        source.append('    try:')
+        source.append('        while True:')
+        source.extend('            ' + line for line in body)
+        source.append('    except (TypeError, ZeroDivisionError, OverflowError) as error:')
+        source.append("        raise VMError(f'{error} in block {block}') from error")
+        source.append('    return {' + ', '.join(f'{name!r}: {self.names[name]}' for name in variables) + '}')
+        return '\n'.join(source) + '\n'
+
+    def dispatch(self, bodies, lo, hi):
+        # Binary search on the block number so a jump costs O(log blocks) tests
+        if hi - lo <= DISPATCH_CHAIN:
+            lines = []
+            for index in range(lo, hi):
+                keyword = 'if' if index == lo else 'elif'
+                lines.append(f'{keyword} block == {index}:' if index < hi - 1 or index == lo else 'else:')
+                lines.extend('    ' + line for line in bodies[index])
+            return lines
+
+        mid = (lo + hi) // 2
+        return (
+            [f'if block < {mid}:'] + ['    ' + line for line in self.dispatch(bodies, lo, mid)]
+            + ['else:'] + ['    ' + line for line in self.dispatch(bodies, mid, hi)]
+        )
+
+    def run(self, output=print):
+        return self.function(output)
+
+
+def program_key(quadruples):
+    return tuple(
+        (quad.operator, operand_key(quad.arg1), operand_key(quad.arg2), operand_key(quad.result))
+        for quad in quadruples
+    )
+
+
+def compile_quadruples(quadruples):
+    key = program_key(quadruples)
+    program = _cache.get(key)
+    if program is not None:
+        _cache_stats['hits'] += 1
+        _cache.move_to_end(key)
+        return program
+
+    _cache_stats['misses'] += 1
+    program = _cache[key] = CompiledProgram(quadruples)
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return program
+
+
+def cache_info():
+    return dict(_cache_stats, size=len(_cache), maxsize=CACHE_SIZE)
@@ -0,0 +1,89 @@
+import time
+
+from codegen import CompiledProgram, cache_info, compile_quadruples
+from quadruple import BRANCH_OPERATORS, is_temp
+from vm import VirtualMachine
+from vm_bench import PROGRAMS, compile_program
+
+OPERATIONS = {
+    'PLUS': lambda a, b: a + b,
+    'MINUS': lambda a, b: a - b,
+    'MUL': lambda a, b: a * b,
+    'DIV': lambda a, b: a / b,
+    'NEG': lambda a, b: -a,
+    'LT': lambda a, b: 1 if a < b else 0,
+    'GT': lambda a, b: 1 if a > b else 0,
+    'LTE': lambda a, b: 1 if a <= b else 0,
+    'GTE': lambda a, b: 1 if a >= b else 0,
+    'EE': lambda a, b: 1 if a == b else 0,
+    'NE': lambda a, b: 1 if a != b else 0,
+}
+
+# Each compare-and-branch jumps when its comparison is false
+BRANCHES = {branch: OPERATIONS[op] for op, branch in BRANCH_OPERATORS.items()}
+
+
+def interpret(quadruples, output=print):
+    # The straightforward way to run quadruples: walk the Quadruple objects,
+    # keep variables in a dict and look labels up by scanning
+    env = {}
+
+    def value(operand):
+        if isinstance(operand, str):
+            return operand[1:-1] if operand.startswith('"') else env.get(operand)
+        return operand
+
+    pc = 0
+    while pc < len(quadruples):
+        quad = quadruples[pc]
+        pc += 1
+        if quad.operator in OPERATIONS:
+            env[quad.result] = OPERATIONS[quad.operator](value(quad.arg1), value(quad.arg2))
+        elif quad.operator == '=':
+            env[quad.result] = value(quad.arg1)
+        elif quad.operator == 'PRINT':
+            output(value(quad.arg1))
+        elif quad.operator == 'GOTO' or (quad.operator == 'IF_FALSE' and not value(quad.arg1)) or (
+            quad.operator in BRANCHES and not BRANCHES[quad.operator](value(quad.arg1), value(quad.arg2))
+        ):
+            pc = next(i for i, q in enumerate(quadruples) if q.operator == 'LABEL' and q.result == quad.result)
+    return env
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_codegen_bench(iterations=100_000, repeat=3):
+    for name, template in PROGRAMS.items():
+        quadruples = compile_program(template.format(n=iterations))
+
+        interpreter_time = best_of(lambda: interpret(quadruples), repeat)
+        vm = VirtualMachine(quadruples)
+        vm_time = best_of(vm.run, repeat)
+        # The reference interpreter must agree with the VM it is timed against
+        variables = {name: value for name, value in interpret(quadruples).items() if not is_temp(name)}
+        if variables != vm.variables():
+            raise AssertionError(f"interpreter and VM disagree on {name}")
+
+        start = time.perf_counter()
+        CompiledProgram(quadruples)
+        compile_time = time.perf_counter() - start
+        compiled_time = best_of(lambda: compile_quadruples(quadruples).run(), repeat)
+
+        print(f"{name:<12} interpreter {interpreter_time * 1000:8.1f} ms  "
+              f"VM {vm_time * 1000:8.1f} ms  "
+              f"compiled {compiled_time * 1000:8.1f} ms (+{compile_time * 1000:.2f} ms once)  "
+              f"x{interpreter_time / compiled_time:5.1f} vs interpreter, x{vm_time / compiled_time:4.1f} vs VM")
+
+    print(f"cache: {cache_info()}")
+
+
+if __name__ == "__main__":
+    run_codegen_bench()
@@ -0,0 +1,74 @@
+from codegen import CompiledProgram, cache_info, compile_quadruples
+from icg import IntermediateCodeGenerator
+from optimizer import PassManager
+from quadruple import Quadruple
+from vm import VirtualMachine, VMError
+
+
+def compile_source(source, optimizer=None):
+    quadruples, errors = IntermediateCodeGenerator(optimizer).generate_program(source)
+    if errors:
+        raise ValueError(errors[0].as_string())
+    return quadruples
+
+
+def run_codegen_tests():
+    sources = [
+        "let x = 1 + 2 * 3",
+        "let x = 20 - 1 * (4 / 2)\nprint(x)",
+        "let y = -(2 + 3)\nprint(-y)",
+        'print("Hello")',
+        "let n = 5\nlet s = 0\nwhile n : let n = n - 1\nprint(n)",
+        "let a = 1\nexit\nlet a = 2",
+        "let x = 10\nlet y = 20\nwhile (x < y) : let x = x + 1\nprint(x >= y)\nlet z = x != y",
+    ]
+
+    test = 0
+    for optimizer in (None, PassManager()):
+        for source in sources:
+            test += 1
+            quadruples = compile_source(source, optimizer)
+            expected_output = []
+            vm = VirtualMachine(quadruples, output=expected_output.append).run()
+            printed = []
+            variables = compile_quadruples(quadruples).run(output=printed.append)
+            if variables == vm.variables() and printed == expected_output:
+                print(f"Test {test} passed")
+            else:
+                print(f"Test {test} failed: expected {vm.variables()} {expected_output}, got {variables} {printed}")
+
+    hits = cache_info()['hits']
+    compile_quadruples(compile_source(sources[0]))
+    test += 1
+    if cache_info()['hits'] == hits + 1:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: recompiling the same program missed the cache")
+
+    test += 1
+    try:
+        CompiledProgram([Quadruple('GOTO', None, None, 'L9')])
+        print(f"Test {test} failed: undefined label was accepted")
+    except VMError:
+        print(f"Test {test} passed")
+
+    test += 1
+    try:
+        compile_quadruples(compile_source("let x = 1 / 0")).run()
+        print(f"Test {test} failed: division by zero did not raise")
+    except VMError:
+        print(f"Test {test} passed")
+
+    # Both backends must report a float overflow the same way
+    quadruples = compile_source("let y = 3\nlet x = 1" + "0" * 400 + " / y")
+    for backend in (VirtualMachine, compile_quadruples):
+        test += 1
+        try:
+            backend(quadruples).run()
+            print(f"Test {test} failed: float overflow did not raise")
+        except VMError:
+            print(f"Test {test} passed")
+
+
+if __name__ == "__main__":
+    run_codegen_tests()
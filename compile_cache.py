@@ -0,0 +1,158 @@
+import hashlib
+import os
+import sys
+import tempfile
+
+import quadfile
+
+CACHE_DIR = '__quadcache__'
+# Total size the cache directory is trimmed back to
+MAX_BYTES = 64 * 1024 * 1024
+# Bump when the entry layout changes so old entries are never read
+FORMAT_VERSION = 2
+ENTRY_SUFFIX = '.bin'
+
+# Every module whose code affects the quadruples generated for a source
+COMPILER_MODULES = (
+    'basic.py',
+    'strings_with_arrows.py',
+    'quadruple.py',
+    'icg.py',
+    'optimizer.py',
+    'liveness.py',
+    'cfg.py',
+    'quadfile.py',
+)
+
+_compiler_digest = None
+
+
+def compiler_fingerprint(options=()):
+    """
+    Hash of the compiler's own source code, the Python version and the
+    compile options, so editing the compiler or changing flags can never
+    return quadruples produced by a different compiler.
+    """
+    global _compiler_digest
+    if _compiler_digest is None:
+        digest = hashlib.sha256(f'{FORMAT_VERSION}:{sys.version}'.encode())
+        here = os.path.dirname(os.path.abspath(__file__))
+        for module in COMPILER_MODULES:
+            with open(os.path.join(here, module), 'rb') as file:
+                digest.update(file.read())
+        _compiler_digest = digest.digest()
+    return hashlib.sha256(_compiler_digest + repr(options).encode()).hexdigest()
+
+
+class CompileCache:
+    """
+    On-disk cache of generated quadruples, one file per program named after
+    the hash of the compiler fingerprint and the source text. Entries are
+    written atomically, so concurrent writers (batch mode workers) at worst
+    replace each other's identical files; entries that cannot be read are
+    deleted and treated as misses. The least recently used entries are
+    evicted once the directory grows past max_bytes.
+    """
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES, options=()):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fingerprint = compiler_fingerprint(options)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def key(self, source):
+        return hashlib.sha256(f'{self.fingerprint}\0{source}'.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, source):
+        path = self.path(self.key(source))
+        try:
+            with open(path, 'rb') as file:
+                quadruples = quadfile.loads(file.read())
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, quadfile.QuadfileError):
+            self.misses += 1
+            self.discard(path)
+            return None
+
+        # The modification time doubles as the last-used time for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return quadruples
+
+    def put(self, source, quadruples):
+        path = self.path(self.key(source))
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(quadfile.dumps(quadruples))
+            os.replace(temp, path)
+        except BaseException:
+            self.discard(temp)
+            raise
+        self.stores += 1
+
+    def compile(self, source, fn, icg):
+        """
+        Return (quadruples, errors, cached) for source, generating them with
+        icg only on a miss. Programs with errors are never cached.
+        """
+        quadruples = self.get(source)
+        if quadruples is not None:
+            return quadruples, [], True
+        quadruples, errors = icg.generate_program(source, fn)
+        if not errors:
+            self.put(source, quadruples)
+        return quadruples, errors, False
+
+    def discard(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def entries(self):
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, stat.st_size, path))
+        return found
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.discard(path)
+            total -= size
+            self.evictions += 1
+        return total
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self.discard(path)
+
+    def report(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return (f'compile cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), '
+                f'{self.stores} stored, {self.evictions} evicted')
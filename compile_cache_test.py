@@ -0,0 +1,58 @@
+import glob
+import os
+import tempfile
+
+from compile_cache import CompileCache
+from icg import IntermediateCodeGenerator
+
+
+def run_compile_cache_tests():
+    source = "let x = 1 + 2\nprint(x)"
+    expected, _ = IntermediateCodeGenerator().generate_program(source)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = CompileCache(directory)
+        _, _, cached = cache.compile(source, "<test>", IntermediateCodeGenerator())
+        quadruples, errors, cached_again = cache.compile(source, "<test>", IntermediateCodeGenerator())
+        if (cached, cached_again) == (False, True) and quadruples == expected and not errors:
+            print("Test 1 passed")
+        else:
+            print(f"Test 1 failed: {cache.report()}, got {quadruples}")
+
+        # Different compile options never see each other's entries
+        other = CompileCache(directory, options=(('constant_folding',), False))
+        if other.get(source) is None and cache.get(source) is not None:
+            print("Test 2 passed")
+        else:
+            print("Test 2 failed: entry shared across compiler options")
+
+        # A damaged entry is a miss and gets removed
+        path = cache.path(cache.key(source))
+        with open(path, 'wb') as file:
+            file.write(b'\x00garbage')
+        if cache.get(source) is None and not os.path.exists(path):
+            print("Test 3 passed")
+        else:
+            print("Test 3 failed: damaged entry was returned or kept")
+
+        # Programs with errors are compiled every time and never stored
+        _, errors, _ = cache.compile("let = 1", "<test>", IntermediateCodeGenerator())
+        if errors and cache.get("let = 1") is None:
+            print("Test 4 passed")
+        else:
+            print("Test 4 failed: program with errors was cached")
+
+        for i in range(20):
+            cache.compile(f"let x = {i}", "<test>", IntermediateCodeGenerator())
+        entry_size = os.path.getsize(cache.path(cache.key("let x = 0")))
+        cache.max_bytes = entry_size * 5
+        remaining = cache.evict()
+        files = glob.glob(os.path.join(directory, '*', '*'))
+        if remaining <= cache.max_bytes and len(files) == 5 and cache.get("let x = 19") is not None:
+            print("Test 5 passed")
+        else:
+            print(f"Test 5 failed: {len(files)} entries left, {cache.report()}")
+
+
+if __name__ == "__main__":
+    run_compile_cache_tests()
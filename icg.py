@@ -1,11 +1,154 @@
-from quadruple import Quadruple
-from basic import run, BinOpNode, NumberNode, VarAssignNode, VarAccessNode, PrintNode, WhileNode
+import time
+
+from quadruple import BRANCH_OPERATORS, Quadruple
+from sinks import NullSink
+from symbols import EncodedProgram, SymbolTable
+from basic import run, Parser, RegexLexer, BinOpNode, NumberNode, StringNode, UnaryOpNode, VarAssignNode, VarAccessNode, PrintNode, WhileNode, TT_MINUS, TT_PLUS
+
+# Nodes that make up expressions, compiled by generate_expression
+EXPRESSION_NODES = (BinOpNode, UnaryOpNode, NumberNode, StringNode, VarAccessNode)
+
+class EmittingParser(Parser):
+    """
+    Parser whose node builders append quadruples to an
+    IntermediateCodeGenerator as each production is recognised and return
+    the operand holding its value, so no AST is built. The parser reduces
+    operators in post-order, which is the order generate_quadruples_from_ast
+    visits the tree, so the output is the same quadruple for quadruple.
+    """
+    def __init__(self, tokens, icg):
+        self.icg = icg
+        self.emit = icg.quadruples.append
+        super().__init__(tokens)
+
+    def build_number(self, tok):
+        return tok.value
+
+    def build_string(self, tok):
+        return tok.value
+
+    def build_var_access(self, tok):
+        return tok.value
+
+    def build_unary(self, op_tok, value):
+        if op_tok.type != TT_MINUS:
+            return value
+        result = self.icg.new_temp()
+        self.emit(Quadruple('NEG', value, None, result))
+        return result
+
+    def build_binop(self, left, op_tok, right):
+        result = self.icg.new_temp()
+        self.emit(Quadruple(op_tok.type, left, right, result))
+        return result
+
+    def build_var_assign(self, var_name, value):
+        self.emit(Quadruple('=', value, None, var_name.value))
+        return var_name.value
+
+    def build_print(self, value):
+        self.emit(Quadruple('PRINT', value, None, None))
+        return value
+
+    def begin_while(self):
+        label_start = self.icg.new_label()
+        label_end = self.icg.new_label()
+        self.emit(Quadruple('LABEL', None, None, label_start))
+        return label_start, label_end
+
+    def while_condition(self, loop, condition):
+        # A comparison just emitted into a fresh temporary for this condition
+        # is taken back and turned into a compare-and-branch, as the AST
+        # path does; releasing the temporary keeps the numbering the same
+        icg = self.icg
+        last = icg.quadruples[-1]
+        if last.operator in BRANCH_OPERATORS and last.result == condition == f"T{icg.temp_count}":
+            icg.quadruples.pop()
+            icg.temp_count -= 1
+            self.emit(Quadruple(BRANCH_OPERATORS[last.operator], last.arg1, last.arg2, loop[1]))
+        else:
+            self.emit(Quadruple('IF_FALSE', condition, None, loop[1]))
+
+    def build_while(self, loop, condition, body):
+        label_start, label_end = loop
+        self.emit(Quadruple('GOTO', None, None, label_start))
+        self.emit(Quadruple('LABEL', None, None, label_end))
+        return None
+
+class CompileSession:
+    """
+    One compilation unit. Lines are compiled into the generator's pending
+    buffer and handed to its sink: straight after each line when there is
+    no optimizer or temp allocator, so a unit of any length streams through
+    in constant memory, or all at once on close() when those whole-unit
+    passes have to see everything first.
+    """
+    def __init__(self, icg, fn='<stdin>', keep=False):
+        self.icg = icg
+        self.fn = fn
+        self.errors = []
+        self.lines = 0
+        self.count = 0
+        # Every quadruple of the unit, only when the caller wants them back
+        self.kept = [] if keep else None
+        self.buffered = icg.optimizer is not None or icg.temp_allocator is not None
+
+    def compile(self, line):
+        self.lines += 1
+        ast, error, tokens = self.icg.compile_line(self.fn, line)
+        if error:
+            self.errors.append(error)
+        elif not self.buffered:
+            self.flush()
+        return ast, error, tokens
+
+    def flush(self):
+        pending = self.icg.quadruples
+        if not pending:
+            return
+        self.icg.sink.write(pending)
+        if self.kept is not None:
+            self.kept.extend(pending)
+        self.count += len(pending)
+        pending.clear()
+
+    def close(self):
+        if self.buffered:
+            self.icg.finalize(0)
+        self.flush()
+        return self.kept
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.icg.quadruples.clear()
+        return False
 
 class IntermediateCodeGenerator:
-    def __init__(self):
+    def __init__(self, optimizer=None, temp_allocator=None, stats=None, direct=False, sink=None):
+        # Quadruples of the compilation unit in progress; sessions pass them
+        # on to the sink, which is where finished code ends up. By default it
+        # keeps nothing, so a long-lived generator does not grow: callers
+        # wanting the code back get it from the session or pass a ListSink
         self.quadruples = []
+        self.sink = sink if sink is not None else NullSink()
         self.temp_count = 0
         self.label_count = 0
+        # Optional stages applied to each batch of new quadruples: an
+        # optimizer.PassManager, then a liveness.TempAllocator
+        self.optimizer = optimizer
+        self.temp_allocator = temp_allocator
+        # Optional basic.PhaseStats timing every phase of each compile
+        self.stats = stats
+        # Emit quadruples while parsing instead of building and walking an
+        # AST; the output is the same, but no AST is returned
+        self.direct = direct
+        # Identifiers of every line compiled, interned by the lexer
+        self.symbols = SymbolTable()
 
     def new_temp(self):
         self.temp_count += 1
@@ -19,20 +162,12 @@ class IntermediateCodeGenerator:
         if isinstance(node, list):
             for sub_node in node:
                 self.generate_quadruples_from_ast(sub_node)
-        elif isinstance(node, BinOpNode):
-            left = self.generate_quadruples_from_ast(node.left_node)
-            right = self.generate_quadruples_from_ast(node.right_node)
-            result = self.new_temp()
-            self.quadruples.append(Quadruple(node.op_tok.type, left, right, result))
-            return result
-        elif isinstance(node, NumberNode):
-            return node.tok.value
+        elif isinstance(node, EXPRESSION_NODES):
+            return self.generate_expression(node)
         elif isinstance(node, VarAssignNode):
             value = self.generate_quadruples_from_ast(node.value_node)
             self.quadruples.append(Quadruple('=', value, None, node.var_name.value))
             return node.var_name.value
-        elif isinstance(node, VarAccessNode):
-            return node.var_name.value
         elif isinstance(node, PrintNode):
             value = self.generate_quadruples_from_ast(node.value_node)
             self.quadruples.append(Quadruple('PRINT', value, None, None))
@@ -41,18 +176,162 @@ class IntermediateCodeGenerator:
             label_start = self.new_label()
             label_end = self.new_label()
             self.quadruples.append(Quadruple('LABEL', None, None, label_start))
-            condition = self.generate_quadruples_from_ast(node.condition_node)
-            self.quadruples.append(Quadruple('IF_FALSE', condition, None, label_end))
+            self.generate_branch(node.condition_node, label_end)
             self.generate_quadruples_from_ast(node.body_node)
             self.quadruples.append(Quadruple('GOTO', None, None, label_start))
             self.quadruples.append(Quadruple('LABEL', None, None, label_end))
         else:
             raise Exception(f"Unknown AST node: {node}")
 
-    def generate_quadruples(self, expression):
-        ast, error, tokens = run('<stdin>', expression)
+    def generate_expression(self, node):
+        """
+        Emit an expression's quadruples and return the operand holding its
+        value. The tree is walked in post-order with an explicit stack, the
+        way Parser.expr builds it, so nesting and operator chains of any
+        length compile without recursing.
+        """
+        values = []
+        stack = [(node, False)]
+        while stack:
+            node, visited = stack.pop()
+            if isinstance(node, BinOpNode):
+                if not visited:
+                    stack.append((node, True))
+                    stack.append((node.right_node, False))
+                    stack.append((node.left_node, False))
+                    continue
+                right = values.pop()
+                left = values.pop()
+                result = self.new_temp()
+                self.quadruples.append(Quadruple(node.op_tok.type, left, right, result))
+                values.append(result)
+            elif isinstance(node, UnaryOpNode):
+                if not visited:
+                    stack.append((node, True))
+                    stack.append((node.node, False))
+                    continue
+                if node.op_tok.type == TT_MINUS:
+                    result = self.new_temp()
+                    self.quadruples.append(Quadruple('NEG', values.pop(), None, result))
+                    values.append(result)
+            elif isinstance(node, (NumberNode, StringNode)):
+                values.append(node.tok.value)
+            elif isinstance(node, VarAccessNode):
+                values.append(node.var_name.value)
+            else:
+                raise Exception(f"Unknown AST node: {node}")
+        return values.pop()
+
+    def generate_branch(self, node, label):
+        # Jump to label when the condition node is false. A comparison
+        # becomes one compare-and-branch instead of a comparison into a
+        # temporary followed by IF_FALSE.
+        while isinstance(node, UnaryOpNode) and node.op_tok.type == TT_PLUS:
+            node = node.node
+        if isinstance(node, BinOpNode) and node.op_tok.type in BRANCH_OPERATORS:
+            left = self.generate_quadruples_from_ast(node.left_node)
+            right = self.generate_quadruples_from_ast(node.right_node)
+            self.quadruples.append(Quadruple(BRANCH_OPERATORS[node.op_tok.type], left, right, label))
+        else:
+            condition = self.generate_quadruples_from_ast(node)
+            self.quadruples.append(Quadruple('IF_FALSE', condition, None, label))
+
+    def session(self, fn='<stdin>', keep=False):
+        return CompileSession(self, fn, keep)
+
+    def generate_quadruples(self, expression, fn='<stdin>'):
+        # Compile one line as its own unit and return only its quadruples
+        with self.session(fn, keep=True) as unit:
+            ast, error, tokens = unit.compile(expression)
         if error:
             print(error.as_string())
             return [], tokens, None
+        return unit.kept, tokens, ast
+
+    def compile_unit(self, lines, fn='<stdin>', keep=False):
+        """
+        Compile an iterable of lines (a list, or an open file read lazily)
+        as one unit the way main.py does: stop at 'exit', skip blank lines
+        and collect errors instead of printing them. Returns the session.
+        """
+        with self.session(fn, keep) as unit:
+            for line in lines:
+                line = line.rstrip('\r\n')
+                if line.strip() == 'exit':
+                    break
+                if not line.strip():
+                    continue
+                unit.compile(line)
+        return unit
+
+    def generate_program(self, source, fn='<stdin>'):
+        unit = self.compile_unit(source.splitlines(), fn, keep=True)
+        return unit.kept, unit.errors
+
+    def compile_line(self, fn, text):
+        # Append the quadruples for one line; returns (ast, error, tokens)
+        if self.direct:
+            error, tokens = self.emit_quadruples(fn, text)
+            return None, error, tokens
+        ast, error, tokens = run(fn, text, stats=self.stats, symbols=self.symbols)
+        if not error:
+            self.generate(ast)
+        return ast, error, tokens
+
+    def emit_quadruples(self, fn, text):
+        """
+        Lex text and parse it with an EmittingParser. On a syntax error the
+        quadruples, temporaries and labels emitted so far for text are
+        rolled back, leaving things as the AST path would. With stats, the
+        emission is timed as part of the parse phase. Returns (error, tokens).
+        """
+        stats = self.stats
+        started = time.perf_counter()
+        tokens, error = RegexLexer(fn, text).make_token_buffer(self.symbols)
+        lexed = time.perf_counter()
+        if stats is not None:
+            stats.runs += 1
+            stats.tokens += len(tokens)
+            stats.record('lex', lexed - started, len(tokens))
+            if error:
+                stats.errors += 1
+        if error:
+            return error, tokens
+
+        mark = len(self.quadruples)
+        temp_count, label_count = self.temp_count, self.label_count
+        res = EmittingParser(tokens, self).parse()
+        if res.error:
+            del self.quadruples[mark:]
+            self.temp_count, self.label_count = temp_count, label_count
+        if stats is not None:
+            emitted = len(self.quadruples) - mark
+            stats.quadruples += emitted
+            stats.errors += 1 if res.error else 0
+            stats.record('parse', time.perf_counter() - lexed, emitted)
+        return res.error, tokens
+
+    def generate(self, ast):
+        if self.stats is None:
+            self.generate_quadruples_from_ast(ast)
+            return
+        before = len(self.quadruples)
+        start = time.perf_counter()
         self.generate_quadruples_from_ast(ast)
-        return self.quadruples, tokens, ast
+        emitted = len(self.quadruples) - before
+        self.stats.quadruples += emitted
+        self.stats.record('icg', time.perf_counter() - start, emitted)
+
+    def encode(self, quadruples):
+        # Variable ids come from this generator's symbol table, so every
+        # program it encodes numbers the same variable the same way
+        return EncodedProgram(quadruples, self.symbols)
+
+    def finalize(self, start):
+        began = time.perf_counter()
+        if self.optimizer is not None:
+            self.quadruples[start:] = self.optimizer.run(self.quadruples[start:])
+        if self.temp_allocator is not None:
+            self.quadruples[start:] = self.temp_allocator.run(self.quadruples[start:])
+        if self.stats is not None and (self.optimizer is not None or self.temp_allocator is not None):
+            self.stats.record('optimize', time.perf_counter() - began, len(self.quadruples) - start)
@@ -0,0 +1,102 @@
+import gc
+import os
+import random
+import time
+import tracemalloc
+
+from concurrent.futures import ProcessPoolExecutor
+
+from basic import Lexer, RegexLexer
+from parallel_lexer import ParallelLexer
+
+
+def generate_source(size, seed=0):
+    rng = random.Random(seed)
+    pieces = []
+    length = 0
+    while length < size:
+        piece = rng.choice([
+            f"let v{rng.randint(0, 999)} = {rng.randint(0, 10**6)}",
+            f"({rng.random() * 100:.3f} * x_{rng.randint(0, 99)} - 7) / 3",
+            'print("some string literal")',
+            "while n : let n = n - 1",
+        ])
+        pieces.append(piece)
+        length += len(piece) + 1
+    return ' '.join(pieces)
+
+
+def time_lexer(lexer_class, text, repeat, method='make_tokens'):
+    best = None
+    for _ in range(repeat):
+        # Like timeit, keep the collector out of the measurement
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            tokens, error = getattr(lexer_class('<bench>', text), method)()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, tokens, error
+
+
+def peak_memory(lexer_class, text, method):
+    tracemalloc.start()
+    try:
+        tokens, error = getattr(lexer_class('<bench>', text), method)()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_lexer_bench(sizes=(10_000, 100_000, 1_000_000), repeat=3):
+    for size in sizes:
+        text = generate_source(size)
+        classic_time, classic_tokens, _ = time_lexer(Lexer, text, repeat)
+        regex_time, regex_tokens, _ = time_lexer(RegexLexer, text, repeat)
+        buffer_time, buffer_tokens, _ = time_lexer(RegexLexer, text, repeat, 'make_token_buffer')
+
+        expected = [repr(t) for t in classic_tokens]
+        same = expected == [repr(t) for t in regex_tokens] == [repr(t) for t in buffer_tokens]
+        print(f"{len(text):>9} chars  {len(classic_tokens):>8} tokens  "
+              f"Lexer {classic_time * 1000:8.1f} ms  "
+              f"RegexLexer {regex_time * 1000:8.1f} ms  "
+              f"TokenBuffer {buffer_time * 1000:8.1f} ms  "
+              f"speedup x{classic_time / buffer_time:5.2f}  "
+              f"{'identical' if same else 'MISMATCH'}")
+
+    text = generate_source(sizes[-1])
+    for label, lexer_class, method in (
+        ('Token list', RegexLexer, 'make_tokens'),
+        ('TokenBuffer', RegexLexer, 'make_token_buffer'),
+    ):
+        peak = peak_memory(lexer_class, text, method)
+        print(f"{label:<12} peak memory {peak / 2**20:8.1f} MiB for {len(text)} chars")
+
+
+def run_parallel_lexer_bench(size=20_000_000, workers=(1, 2, 4, 8), repeat=3):
+    text = generate_source(size)
+    serial_time, serial_tokens, _ = time_lexer(RegexLexer, text, repeat, 'make_token_buffer')
+    print(f"{len(text):>9} chars  {os.cpu_count()} CPUs  serial TokenBuffer {serial_time * 1000:8.1f} ms")
+    for count in workers:
+        # The pool is started once, outside the timing, as a long-lived
+        # caller would keep it
+        with ProcessPoolExecutor(count) as executor:
+            list(executor.map(abs, range(count)))
+            best = None
+            for _ in range(repeat):
+                lexer = ParallelLexer('<bench>', text, workers=count, executor=executor)
+                start = time.perf_counter()
+                tokens, error = lexer.make_token_buffer()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+        same = list(tokens.types) == list(serial_tokens.types) and list(tokens.starts) == list(serial_tokens.starts)
+        print(f"{count:>3} workers  {best * 1000:8.1f} ms  "
+              f"speedup x{serial_time / best:5.2f}  "
+              f"{'identical' if same else 'MISMATCH'}")
+
+
+if __name__ == "__main__":
+    run_lexer_bench()
+    run_parallel_lexer_bench()
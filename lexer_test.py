@@ -1,4 +1,8 @@
-from basic import Lexer
+from concurrent.futures import ProcessPoolExecutor
+
+from basic import Lexer, RegexLexer
+from parallel_lexer import ParallelLexer, split_points
+from symbols import SymbolTable
 
 
 def run_lexer_tests():
@@ -15,6 +19,8 @@ def run_lexer_tests():
         ("var x = 5", "KEYWORD:var IDENTIFIER:x EQ INT:5"),
         ("let y = 10", "KEYWORD:let IDENTIFIER:y EQ INT:10"),
         ("print(x)", "KEYWORD:print LPAREN IDENTIFIER:x RPAREN"),
+        ("x < y", "IDENTIFIER:x LT IDENTIFIER:y"),
+        ("a>=1 == b<=2 != c>3", "IDENTIFIER:a GTE INT:1 EE IDENTIFIER:b LTE INT:2 NE IDENTIFIER:c GT INT:3"),
     ]
 
     for i, (input_text, expected_output) in enumerate(tests):
@@ -32,5 +38,139 @@ def run_lexer_tests():
                 print(f"Test {i + 1} failed: expected '{expected_output}', got '{result}'")
 
 
+def token_signature(result):
+    tokens, error = result
+    if error:
+        return (error.as_string(), error.pos_start.idx, error.pos_end.idx)
+    return [
+        (token.type, token.value, token.pos_start.idx, token.pos_start.ln, token.pos_start.col,
+         token.pos_end.idx, token.pos_end.ln, token.pos_end.col)
+        for token in tokens
+    ]
+
+
+REGEX_TESTS = [
+    "1234",
+    "12.34 + 5. * (6 / 7)",
+    "1.2.3",
+    "let foo_1 = bar2 - 3",
+    'print("Hello, \\"World!")',
+    '"multi\nline" x',
+    '"unterminated',
+    "x = 1 $ 2",
+    "a\nb",
+    "_x",
+    "   \t  ",
+    "a<=b==c!=d>=e<f>g",
+    "x =< == = y",
+    "a ! b",
+    "a !",
+]
+
+
+def run_regex_lexer_tests():
+    for i, input_text in enumerate(REGEX_TESTS):
+        expected = token_signature(Lexer('<stdin>', input_text).make_tokens())
+        result = token_signature(RegexLexer('<stdin>', input_text).make_tokens())
+        if result == expected:
+            print(f"Regex test {i + 1} passed")
+        else:
+            print(f"Regex test {i + 1} failed: expected {expected}, got {result}")
+
+
+def run_token_buffer_tests():
+    for i, input_text in enumerate(REGEX_TESTS):
+        expected = token_signature(Lexer('<stdin>', input_text).make_tokens())
+        for lexer_class in (Lexer, RegexLexer):
+            tokens, error = lexer_class('<stdin>', input_text).make_token_buffer()
+            result = token_signature((list(tokens), error))
+            if result != expected:
+                print(f"Buffer test {i + 1} failed with {lexer_class.__name__}: expected {expected}, got {result}")
+                break
+        else:
+            print(f"Buffer test {i + 1} passed")
+
+
+def run_parallel_lexer_tests():
+    # Tiny chunks so every input is cut wherever it can be
+    texts = REGEX_TESTS + [
+        'let a = "x y  z" + b\tprint("a \" b")  c',
+        'x y "open string with spaces',
+        "let x = 1 let y = 2 $ let z = 3",
+    ]
+    with ProcessPoolExecutor(2) as executor:
+        for i, input_text in enumerate(texts):
+            expected = token_signature(RegexLexer('<stdin>', input_text).make_token_buffer())
+            lexer = ParallelLexer('<stdin>', input_text, workers=4, executor=executor, min_chunk=1)
+            tokens, error = lexer.make_token_buffer()
+            result = token_signature((tokens, error))
+            if result == expected:
+                print(f"Parallel test {i + 1} passed")
+            else:
+                print(f"Parallel test {i + 1} failed: expected {expected}, got {result}")
+
+    # Cuts never land inside a string
+    text = 'a "b c d e" f "g h" i'
+    points = split_points(text, 8, 1)
+    if points == [11, 13, 19]:
+        print("Split test passed")
+    else:
+        print(f"Split test failed: got {points}")
+
+    # Recovering, every piece collects its illegal characters
+    input_text = 'let $a = 1 # + "o k$" ²b'
+    expected = RegexLexer('<stdin>', input_text, recover=True)
+    expected_tokens = token_signature((expected.make_token_buffer()[0], None))
+    lexer = ParallelLexer('<stdin>', input_text, recover=True, workers=4, min_chunk=1)
+    tokens, error = lexer.make_token_buffer()
+    offsets = [e.pos_start.idx for e in lexer.errors]
+    if token_signature((tokens, None)) == expected_tokens and offsets == [e.pos_start.idx for e in expected.errors] \
+            and offsets == [4, 11, 22] and error is lexer.errors[0]:
+        print("Parallel recovery test passed")
+    else:
+        print(f"Parallel recovery test failed: got {tokens} with errors at {offsets}")
+
+    symbols = SymbolTable()
+    ParallelLexer('<stdin>', "b = a + b * c", workers=3, min_chunk=1).make_token_buffer(symbols)
+    if symbols.names == ['b', 'a', 'c']:
+        print("Parallel symbols test passed")
+    else:
+        print(f"Parallel symbols test failed: got {symbols.names}")
+
+
+def run_recovering_lexer_tests():
+    # Illegal characters are skipped and collected, and the rest is lexed
+    input_text = 'let $a = 1 # + "ok$"'
+    expected = token_signature(RegexLexer('<stdin>', 'let  a = 1   + "ok$"').make_tokens())
+    for lexer_class in (Lexer, RegexLexer):
+        lexer = lexer_class('<stdin>', input_text, recover=True)
+        tokens, error = lexer.make_tokens()
+        buffer, _ = lexer_class('<stdin>', input_text, recover=True).make_token_buffer()
+        offsets = [e.pos_start.idx for e in lexer.errors]
+        if (token_signature((tokens, None)) == expected == token_signature((buffer, None))
+                and offsets == [4, 11] and error is lexer.errors[0]):
+            print(f"Recovering {lexer_class.__name__} test passed")
+        else:
+            print(f"Recovering {lexer_class.__name__} test failed: got {tokens} with errors at {offsets}")
+
+    # A word starting with a non-letter such as '²' loses only that character
+    for input_text, expected_tokens, expected_offsets in (
+        ('²abc', '[IDENTIFIER:abc, EOF]', [0]),
+        ('²1²a', '[INT:1, IDENTIFIER:a, EOF]', [0, 2]),
+    ):
+        for lexer_class in (Lexer, RegexLexer):
+            lexer = lexer_class('<stdin>', input_text, recover=True)
+            tokens, _ = lexer.make_tokens()
+            offsets = [e.pos_start.idx for e in lexer.errors]
+            if repr(tokens) == expected_tokens and offsets == expected_offsets:
+                print(f"Recovering {lexer_class.__name__} {input_text!r} test passed")
+            else:
+                print(f"Recovering {lexer_class.__name__} {input_text!r} test failed: got {tokens} with errors at {offsets}")
+
+
 if __name__ == "__main__":
     run_lexer_tests()
+    run_regex_lexer_tests()
+    run_token_buffer_tests()
+    run_parallel_lexer_tests()
+    run_recovering_lexer_tests()
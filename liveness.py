@@ -0,0 +1,154 @@
+import sys
+
+from quadruple import Quadruple, BINARY_OPERATORS, CONDITIONAL_JUMPS, UNARY_OPERATORS, is_temp
+
+# Quadruples that assign their result field
+DEFINING_OPERATORS = BINARY_OPERATORS + UNARY_OPERATORS + ('=',)
+
+
+def successors(quadruples):
+    labels = {quad.result: i for i, quad in enumerate(quadruples) if quad.operator == 'LABEL'}
+    succ = []
+    for i, quad in enumerate(quadruples):
+        following = [i + 1] if i + 1 < len(quadruples) else []
+        if quad.operator == 'GOTO':
+            succ.append([labels[quad.result]])
+        elif quad.operator in CONDITIONAL_JUMPS:
+            succ.append(following + [labels[quad.result]])
+        else:
+            succ.append(following)
+    return succ
+
+
+def temp_uses(quad):
+    return {operand for operand in (quad.arg1, quad.arg2) if is_temp(operand)}
+
+
+def temp_def(quad):
+    if quad.operator in DEFINING_OPERATORS and is_temp(quad.result):
+        return quad.result
+    return None
+
+
+def live_temps(quadruples):
+    """
+    Backward dataflow over the instruction-level control flow graph. Returns
+    the set of temporaries live on entry to and on exit from each quadruple.
+    """
+    succ = successors(quadruples)
+    uses = [temp_uses(quad) for quad in quadruples]
+    defs = [temp_def(quad) for quad in quadruples]
+    live_in = [set() for _ in quadruples]
+    live_out = [set() for _ in quadruples]
+
+    changed = True
+    while changed:
+        changed = False
+        for i in range(len(quadruples) - 1, -1, -1):
+            out = set()
+            for j in succ[i]:
+                out |= live_in[j]
+            new_in = uses[i] | (out - {defs[i]})
+            if out != live_out[i] or new_in != live_in[i]:
+                live_out[i] = out
+                live_in[i] = new_in
+                changed = True
+
+    return live_in, live_out
+
+
+def interference(quadruples):
+    live_in, live_out = live_temps(quadruples)
+    graph = {}
+
+    def connect(a, b):
+        graph.setdefault(a, set()).add(b)
+        graph.setdefault(b, set()).add(a)
+
+    for i, quad in enumerate(quadruples):
+        for temp in temp_uses(quad):
+            graph.setdefault(temp, set())
+        target = temp_def(quad)
+        if target is None:
+            continue
+        graph.setdefault(target, set())
+        for temp in live_out[i]:
+            if temp != target:
+                connect(target, temp)
+
+    # Temporaries already live at the start all hold values at once
+    entry = sorted(live_in[0]) if quadruples else []
+    for i, a in enumerate(entry):
+        for b in entry[i + 1:]:
+            connect(a, b)
+
+    return graph
+
+
+def allocate(quadruples):
+    """
+    Colour the interference graph greedily in order of first appearance and
+    return a mapping from each temporary to its new name T1..Tk.
+    """
+    graph = interference(quadruples)
+    order = []
+    seen = set()
+    for quad in quadruples:
+        for operand in (quad.arg1, quad.arg2, quad.result):
+            if operand in graph and operand not in seen:
+                seen.add(operand)
+                order.append(operand)
+
+    colours = {}
+    for temp in order:
+        taken = {colours[other] for other in graph[temp] if other in colours}
+        colour = 0
+        while colour in taken:
+            colour += 1
+        colours[temp] = colour
+
+    return {temp: f"T{colour + 1}" for temp, colour in colours.items()}
+
+
+class TempAllocator:
+    """
+    Renames temporaries so that ones which are never live at the same time
+    share a name, and keeps before/after counts across calls.
+    """
+    def __init__(self):
+        self.temps_before = 0
+        self.temps_after = 0
+
+    def run(self, quadruples):
+        mapping = allocate(quadruples)
+        self.temps_before += len(mapping)
+        self.temps_after = max(self.temps_after, len(set(mapping.values())))
+
+        def rename(operand):
+            return mapping.get(operand, operand) if is_temp(operand) else operand
+
+        return [
+            Quadruple(quad.operator, rename(quad.arg1), rename(quad.arg2), rename(quad.result))
+            for quad in quadruples
+        ]
+
+    def report(self):
+        return f'temporaries: {self.temps_before} -> {self.temps_after}'
+
+
+def main(paths):
+    from icg import IntermediateCodeGenerator
+    from optimizer import PassManager
+
+    for path in paths:
+        with open(path, 'r') as file:
+            source = file.read()
+        for label, optimizer in (('naive', None), ('optimized', PassManager())):
+            allocator = TempAllocator()
+            icg = IntermediateCodeGenerator(optimizer, temp_allocator=allocator)
+            icg.generate_program(source, path)
+            print(f"{path} ({label}): {allocator.report()}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ['input.txt'])
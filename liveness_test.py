@@ -0,0 +1,28 @@
+from icg import IntermediateCodeGenerator
+from liveness import TempAllocator
+from vm import VirtualMachine
+
+
+def run_liveness_tests():
+    tests = [
+        ("let x = (1 + 2) * (3 + 4)", 2),
+        ("let x = 1 + 2 + 3 + 4 + 5 + 6", 1),
+        ("let x = ((1 + 2) * (3 + 4)) - ((5 + 6) * (7 + 8))", 3),
+        ("let n = 3\nwhile n : let n = n - (1 * 1)\nlet y = n * 2 + 1", 1),
+    ]
+
+    for i, (source, expected_temps) in enumerate(tests):
+        original, _ = IntermediateCodeGenerator().generate_program(source)
+        allocator = TempAllocator()
+        renamed, _ = IntermediateCodeGenerator(temp_allocator=allocator).generate_program(source)
+
+        same = VirtualMachine(original).run().variables() == VirtualMachine(renamed).run().variables()
+        if allocator.temps_after == expected_temps and same:
+            print(f"Test {i + 1} passed")
+        else:
+            print(f"Test {i + 1} failed: expected {expected_temps} temporaries, got {allocator.report()}"
+                  f"{'' if same else ' and different results'}")
+
+
+if __name__ == "__main__":
+    run_liveness_tests()
@@ -1,11 +1,22 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from basic import PhaseStats
+from compile_cache import CACHE_DIR, MAX_BYTES, CompileCache
 from icg import IntermediateCodeGenerator
+from liveness import TempAllocator
+from optimizer import DEFAULT_PASSES, PASSES, PassManager
+from sinks import FileSink
 
 def read_expressions_from_file(filename):
     with open(filename, 'r') as file:
         return file.read().splitlines()
 
-def main():
-    icg = IntermediateCodeGenerator()
+def main(optimizer=None, temp_allocator=None, stats=None):
+    icg = IntermediateCodeGenerator(optimizer, temp_allocator, stats)
     expressions = read_expressions_from_file('input.txt')
     
     for expression in expressions:
@@ -27,5 +38,211 @@ def main():
             print(quad)
         print("\n" + "="*50 + "\n")
 
+    if optimizer is not None:
+        print("Optimizer Report:")
+        print(optimizer.report())
+    if temp_allocator is not None:
+        print(temp_allocator.report())
+    if stats is not None:
+        print("Phase Stats:")
+        print(stats.report())
+
+#######################################
+# BATCH MODE
+#######################################
+
+SOURCE_SUFFIX = '.txt'
+OUTPUT_SUFFIX = '.quad'
+
+class FileResult:
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+        self.lines = 0
+        self.quadruples = 0
+        self.errors = []
+        self.seconds = 0.0
+        # True or False when a compile cache was consulted
+        self.cached = None
+        # PhaseStats when requested; cache hits run no phases
+        self.stats = None
+
+def collect_sources(paths, suffix=SOURCE_SUFFIX):
+    # Files are taken as given; directories are walked in sorted order for
+    # files ending in suffix. Returns (path, path relative to its argument)
+    sources = []
+    for path in paths:
+        if not os.path.isdir(path):
+            sources.append((path, os.path.basename(path)))
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(suffix):
+                    full = os.path.join(root, name)
+                    sources.append((full, os.path.relpath(full, path)))
+    return sources
+
+def output_path(source, relative, output_dir=None):
+    if output_dir is None:
+        return source + OUTPUT_SUFFIX
+    return os.path.join(output_dir, relative + OUTPUT_SUFFIX)
+
+def counted_lines(file, result):
+    for line in file:
+        result.lines += 1
+        yield line
+
+def compile_file(job):
+    # Runs in a worker process: compile one file, write its quadruples next
+    # to it (or under the output directory) and send back a summary only
+    source, target, passes, reuse_temps, cache_dir, stats, direct = job
+    result = FileResult(source, target)
+    result.stats = PhaseStats() if stats else None
+    start = time.perf_counter()
+    try:
+        icg = IntermediateCodeGenerator(PassManager(passes) if passes is not None else None,
+                                        TempAllocator() if reuse_temps else None, result.stats, direct)
+        os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+        if cache_dir is None:
+            # Stream: lines are read and quadruples written as they are compiled
+            with open(source, 'r') as file, open(target, 'w') as output:
+                icg.sink = FileSink(output)
+                unit = icg.compile_unit(counted_lines(file, result), source)
+            errors = unit.errors
+            result.quadruples = unit.count
+        else:
+            with open(source, 'r') as file:
+                text = file.read()
+            cache = CompileCache(cache_dir, options=cache_options(passes, reuse_temps))
+            quadruples, errors, result.cached = cache.compile(text, source, icg)
+            with open(target, 'w') as file:
+                FileSink(file).write(quadruples)
+            result.lines = len(text.splitlines())
+            result.quadruples = len(quadruples)
+        result.errors = [error.as_string() for error in errors]
+    except OSError as error:
+        result.errors = [str(error)]
+    except Exception as error:
+        # Undecodable text or nesting too deep to compile fails this file
+        # only; the rest of the batch carries on
+        result.errors = [f"{type(error).__name__}: {error}"]
+    result.seconds = time.perf_counter() - start
+    return result
+
+def cache_options(passes, reuse_temps):
+    return (tuple(passes) if passes is not None else None, reuse_temps)
+
+def run_batch(paths, jobs=None, output_dir=None, passes=None, reuse_temps=False, out=sys.stdout,
+              cache_dir=None, cache_max_bytes=MAX_BYTES, stats=None, direct=False):
+    """
+    Compile every source file under paths across a pool of worker
+    processes. Results are reported in the order the files were collected,
+    whatever order the workers finish in. With a cache_dir, unchanged
+    programs are loaded from the compile cache instead of being compiled.
+    A PhaseStats passed as stats collects the phase timings of every worker.
+    With direct, quadruples are emitted while parsing, without an AST.
+    Returns the list of FileResults.
+    """
+    sources = collect_sources(paths)
+    work = [
+        (source, output_path(source, relative, output_dir), passes, reuse_temps, cache_dir, stats is not None, direct)
+        for source, relative in sources
+    ]
+    workers = jobs or os.cpu_count() or 1
+    results = []
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = [compile_file(job) for job in work]
+    else:
+        # Hand out files in chunks so thousands of small programs do not
+        # cost one round trip each
+        chunksize = max(1, len(work) // (workers * 8))
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(compile_file, work, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        for error in result.errors:
+            print(f"{result.source}: {error}", file=out)
+
+    files = len(results)
+    lines = sum(result.lines for result in results)
+    quadruples = sum(result.quadruples for result in results)
+    failed = sum(1 for result in results if result.errors)
+    rate = elapsed or float('inf')
+    print(f"{files} files ({failed} with errors), {lines} lines, {quadruples} quadruples "
+          f"in {elapsed:.2f} s with {workers} workers: "
+          f"{files / rate:.1f} files/s, {lines / rate:.1f} lines/s", file=out)
+
+    if cache_dir is not None:
+        # Workers each had their own CompileCache; total their lookups here
+        # and trim the directory once everyone has finished writing
+        cache = CompileCache(cache_dir, cache_max_bytes, cache_options(passes, reuse_temps))
+        cache.hits = sum(1 for result in results if result.cached is True)
+        cache.misses = sum(1 for result in results if result.cached is False)
+        cache.stores = sum(1 for result in results if result.cached is False and not result.errors)
+        cache.evict()
+        print(cache.report(), file=out)
+
+    if stats is not None:
+        for result in results:
+            if result.stats is not None:
+                stats.merge(result.stats)
+        print(stats.report(), file=out)
+    return results
+
+def pass_list(value):
+    passes = [name.strip() for name in value.split(',') if name.strip()]
+    for name in passes:
+        if name not in PASSES:
+            raise argparse.ArgumentTypeError(f"unknown pass '{name}' (choose from {', '.join(PASSES)})")
+    return passes
+
+def positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: '{value}'") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compile input.txt to quadruples, or every file given in batch mode")
+    parser.add_argument('paths', nargs='*',
+                        help=f"source files, or directories searched for *{SOURCE_SUFFIX} files")
+    parser.add_argument('--optimize', action='store_true', help="run the optimization passes on the quadruples")
+    parser.add_argument('--passes', type=pass_list, default=list(DEFAULT_PASSES),
+                        help="comma-separated optimization passes, in order (default: %(default)s)")
+    parser.add_argument('--reuse-temps', action='store_true',
+                        help="rename temporaries so dead ones are reused")
+    parser.add_argument('--jobs', '-j', type=positive_int, default=None,
+                        help="worker processes for batch mode (default: one per CPU)")
+    parser.add_argument('--output-dir', default=None,
+                        help=f"where batch mode writes *{OUTPUT_SUFFIX} files (default: next to each source)")
+    parser.add_argument('--cache-dir', default=CACHE_DIR,
+                        help="compile cache used by batch mode (default: %(default)s)")
+    parser.add_argument('--cache-max-mb', type=float, default=MAX_BYTES / (1024 * 1024),
+                        help="size the compile cache is trimmed back to, in MiB (default: %(default)s)")
+    parser.add_argument('--no-cache', action='store_true', help="compile every file in batch mode from scratch")
+    parser.add_argument('--direct', action='store_true',
+                        help="batch mode: emit quadruples while parsing instead of building an AST")
+    parser.add_argument('--stats', action='store_true',
+                        help="time the lex, parse, icg and optimize phases and print the totals")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.paths:
+        results = run_batch(args.paths, args.jobs, args.output_dir,
+                            args.passes if args.optimize else None, args.reuse_temps,
+                            cache_dir=None if args.no_cache else args.cache_dir,
+                            cache_max_bytes=int(args.cache_max_mb * 1024 * 1024),
+                            stats=PhaseStats() if args.stats else None, direct=args.direct)
+        sys.exit(1 if any(result.errors for result in results) else 0)
+    main(PassManager(args.passes) if args.optimize else None,
+         TempAllocator() if args.reuse_temps else None,
+         PhaseStats() if args.stats else None)
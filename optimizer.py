@@ -0,0 +1,407 @@
+import time
+
+from cfg import ControlFlowGraph
+from quadruple import Quadruple, BINARY_OPERATORS, BRANCH_OPERATORS, UNARY_OPERATORS, JUMPS, is_name, is_temp, operand_key
+
+# Quadruples whose only effect is writing their result
+PURE_OPERATORS = BINARY_OPERATORS + UNARY_OPERATORS + ('=',)
+
+FOLDERS = {
+    'PLUS': lambda a, b: a + b,
+    'MINUS': lambda a, b: a - b,
+    'MUL': lambda a, b: a * b,
+    'DIV': lambda a, b: a / b,
+    'NEG': lambda a, b: -a,
+    'LT': lambda a, b: 1 if a < b else 0,
+    'GT': lambda a, b: 1 if a > b else 0,
+    'LTE': lambda a, b: 1 if a <= b else 0,
+    'GTE': lambda a, b: 1 if a >= b else 0,
+    'EE': lambda a, b: 1 if a == b else 0,
+    'NE': lambda a, b: 1 if a != b else 0,
+}
+
+# Comparison folded for each compare-and-branch
+BRANCH_FOLDERS = {branch: FOLDERS[op] for op, branch in BRANCH_OPERATORS.items()}
+
+PASSES = {}
+
+
+def register_pass(name):
+    def decorator(func):
+        PASSES[name] = func
+        return func
+    return decorator
+
+
+def is_number(operand):
+    return isinstance(operand, (int, float)) and not isinstance(operand, bool)
+
+
+def ends_block(quad):
+    return quad.operator in JUMPS
+
+
+def writes(quad):
+    return quad.operator in PURE_OPERATORS
+
+
+def may_fault(quad):
+    # Division is only known to be safe by a non-zero constant
+    return quad.operator == 'DIV' and not (is_number(quad.arg2) and quad.arg2 != 0)
+
+
+def numeric_names(quadruples):
+    """
+    Names that can only ever hold a number: every write to them stores a
+    numeric constant or applies an operator to names already known to be
+    numeric. Built up from the constants, so a name whose value depends on
+    itself (let n = n - 1) or on a name never written is left out.
+    """
+    definitions = {}
+    for quad in quadruples:
+        if writes(quad):
+            definitions.setdefault(quad.result, []).append(quad)
+
+    numeric = set()
+    changed = True
+    while changed:
+        changed = False
+        for name, quads in definitions.items():
+            if name not in numeric and all(
+                operand is None or is_number(operand) or operand in numeric
+                for quad in quads for operand in (quad.arg1, quad.arg2)
+            ):
+                numeric.add(name)
+                changed = True
+    return numeric
+
+
+def use_counts(quadruples):
+    counts = {}
+    for quad in quadruples:
+        for operand in (quad.arg1, quad.arg2):
+            if is_name(operand):
+                counts[operand] = counts.get(operand, 0) + 1
+    return counts
+
+
+#######################################
+# PASSES
+#######################################
+
+@register_pass('constant_folding')
+def constant_folding(quadruples):
+    """
+    Substitute names known to hold a constant within a basic block and
+    evaluate operators whose operands are all numeric constants.
+    """
+    known = {}
+    result = []
+
+    for quad in quadruples:
+        op = quad.operator
+        if op == 'LABEL':
+            known.clear()
+            result.append(quad)
+            continue
+
+        a = known.get(quad.arg1, quad.arg1) if is_name(quad.arg1) else quad.arg1
+        b = known.get(quad.arg2, quad.arg2) if is_name(quad.arg2) else quad.arg2
+
+        if op in FOLDERS and is_number(a) and (op in UNARY_OPERATORS or is_number(b)) \
+                and not (op == 'DIV' and b == 0):
+            quad = Quadruple('=', FOLDERS[op](a, b), None, quad.result)
+        elif op == 'IF_FALSE' and is_number(a):
+            if a:
+                continue
+            quad = Quadruple('GOTO', None, None, quad.result)
+        elif op in BRANCH_FOLDERS and is_number(a) and is_number(b):
+            if BRANCH_FOLDERS[op](a, b):
+                continue
+            quad = Quadruple('GOTO', None, None, quad.result)
+        elif a is not quad.arg1 or b is not quad.arg2:
+            quad = Quadruple(op, a, b, quad.result)
+
+        if writes(quad):
+            if quad.operator == '=' and is_number(quad.arg1):
+                known[quad.result] = quad.arg1
+            else:
+                known.pop(quad.result, None)
+        result.append(quad)
+        if ends_block(quad):
+            known.clear()
+
+    return result
+
+
+@register_pass('copy_propagation')
+def copy_propagation(quadruples):
+    """
+    Write a temporary's value straight into the variable it is copied to, then
+    replace later uses of a copy with its source within the basic block.
+    """
+    counts = use_counts(quadruples)
+    coalesced = []
+    for quad in quadruples:
+        prev = coalesced[-1] if coalesced else None
+        if quad.operator == '=' and is_temp(quad.arg1) and counts.get(quad.arg1) == 1 \
+                and prev is not None and writes(prev) and prev.result == quad.arg1:
+            coalesced[-1] = Quadruple(prev.operator, prev.arg1, prev.arg2, quad.result)
+            continue
+        coalesced.append(quad)
+
+    copies = {}
+    copied_from = {}
+    result = []
+    for quad in coalesced:
+        if quad.operator == 'LABEL':
+            copies.clear()
+            copied_from.clear()
+            result.append(quad)
+            continue
+
+        a = copies.get(quad.arg1, quad.arg1) if is_name(quad.arg1) else quad.arg1
+        b = copies.get(quad.arg2, quad.arg2) if is_name(quad.arg2) else quad.arg2
+        if a is not quad.arg1 or b is not quad.arg2:
+            quad = Quadruple(quad.operator, a, b, quad.result)
+
+        if writes(quad):
+            target = quad.result
+            copies.pop(target, None)
+            for name in copied_from.pop(target, ()):
+                if copies.get(name) == target:
+                    del copies[name]
+            if quad.operator == '=' and quad.arg1 != target:
+                copies[target] = quad.arg1
+                if is_name(quad.arg1):
+                    copied_from.setdefault(quad.arg1, set()).add(target)
+        result.append(quad)
+        if ends_block(quad):
+            copies.clear()
+            copied_from.clear()
+
+    return result
+
+
+@register_pass('dead_code_elimination')
+def dead_code_elimination(quadruples):
+    """
+    Drop unreachable code after a GOTO, jumps to the very next label, unused
+    labels, self-copies and computations of temporaries nobody reads.
+    """
+    reachable = []
+    unreachable = False
+    for quad in quadruples:
+        if quad.operator == 'LABEL':
+            unreachable = False
+        if not unreachable:
+            reachable.append(quad)
+        if quad.operator == 'GOTO':
+            unreachable = True
+
+    result = []
+    for i, quad in enumerate(reachable):
+        following = reachable[i + 1] if i + 1 < len(reachable) else None
+        if quad.operator == 'GOTO' and following is not None \
+                and following.operator == 'LABEL' and following.result == quad.result:
+            continue
+        if quad.operator == '=' and quad.arg1 == quad.result and is_name(quad.arg1):
+            continue
+        result.append(quad)
+
+    targets = {quad.result for quad in result if quad.operator in JUMPS}
+    result = [quad for quad in result if quad.operator != 'LABEL' or quad.result in targets]
+
+    # Removing one dead temporary can make the ones it read dead too
+    while True:
+        counts = use_counts(result)
+        live = [
+            quad for quad in result
+            if not (writes(quad) and is_temp(quad.result) and quad.result not in counts and not may_fault(quad))
+        ]
+        if len(live) == len(result):
+            return result
+        result = live
+
+
+@register_pass('common_subexpression_elimination')
+def common_subexpression_elimination(quadruples):
+    """
+    Within a basic block, reuse the result of an identical earlier computation
+    whose operands have not been reassigned since.
+    """
+    available = {}
+    # Name -> keys in available that read it or are held in it
+    depends = {}
+    result = []
+
+    for quad in quadruples:
+        op = quad.operator
+        if op == 'LABEL':
+            available.clear()
+            depends.clear()
+            result.append(quad)
+            continue
+
+        if op in BINARY_OPERATORS or op in UNARY_OPERATORS:
+            key = (op, operand_key(quad.arg1), operand_key(quad.arg2))
+            previous = available.get(key)
+            if previous is not None:
+                quad = Quadruple('=', previous, None, quad.result)
+
+        if writes(quad):
+            target = quad.result
+            for stale in depends.pop(target, ()):
+                available.pop(stale, None)
+            if quad.operator != '=' and target not in (quad.arg1, quad.arg2):
+                available[key] = target
+                for name in (quad.arg1, quad.arg2, target):
+                    if is_name(name):
+                        depends.setdefault(name, set()).add(key)
+        result.append(quad)
+        if ends_block(quad):
+            available.clear()
+            depends.clear()
+
+    return result
+
+
+@register_pass('loop_invariant_code_motion')
+def loop_invariant_code_motion(quadruples):
+    """
+    Move computations whose operands do not change inside a loop to just
+    ahead of its header, so they run once instead of on every iteration.
+    Only temporaries written once in the whole program are moved. A moved
+    computation runs even when the loop body would not have, so it must not
+    be able to fail: every name it reads has to hold a number on every
+    write and be assigned on all paths to the loop, and a division has to
+    be by a non-zero constant.
+    """
+    counts = {}
+    for quad in quadruples:
+        if writes(quad):
+            counts[quad.result] = counts.get(quad.result, 0) + 1
+    numeric = numeric_names(quadruples)
+
+    while True:
+        graph = ControlFlowGraph(quadruples)
+        for loop in graph.loops():
+            at = graph.preheader_index(loop)
+            if at is None:
+                continue
+            # Names written before the loop on every path into it
+            assigned = {
+                quad.result
+                for block in graph.dominators[loop.header] if block is not loop.header
+                for quad in block.quadruples if writes(quad)
+            }
+            hoisted = invariant_computations(loop, counts, numeric & assigned)
+            if hoisted:
+                moved = [quadruples[i] for i in hoisted]
+                kept = [quad for i, quad in enumerate(quadruples) if i not in hoisted]
+                quadruples = kept[:at] + moved + kept[at:]
+                break
+        else:
+            return quadruples
+
+
+def invariant_computations(loop, counts, safe=frozenset()):
+    # Indices of the loop's quadruples that compute the same value on every
+    # iteration and can be moved out of it, each after those it reads. Names
+    # in safe, and results already moved, hold numbers before the loop.
+    blocks = sorted(loop.blocks, key=lambda block: block.index)
+    defined = {quad.result for block in blocks for quad in block.quadruples if writes(quad)}
+    hoisted = []
+    invariant = set()
+    # Moved results that are sure to hold a number
+    numbers = set()
+
+    changed = True
+    while changed:
+        changed = False
+        for block in blocks:
+            for i, quad in enumerate(block.quadruples, block.start):
+                if quad.result in invariant or not writes(quad) or not is_temp(quad.result) \
+                        or counts.get(quad.result) != 1 or may_fault(quad):
+                    continue
+                operands = (quad.arg1, quad.arg2)
+                if any(is_name(operand) and operand in defined and operand not in invariant for operand in operands):
+                    continue
+                # Only a copy cannot fail whatever its operand holds
+                known = all(operand is None or is_number(operand) or operand in safe or operand in numbers
+                            for operand in operands)
+                if not known and quad.operator != '=':
+                    continue
+                hoisted.append(i)
+                invariant.add(quad.result)
+                if known:
+                    numbers.add(quad.result)
+                changed = True
+
+    return hoisted
+
+
+#######################################
+# PASS MANAGER
+#######################################
+
+DEFAULT_PASSES = (
+    'constant_folding',
+    'common_subexpression_elimination',
+    'loop_invariant_code_motion',
+    'copy_propagation',
+    'dead_code_elimination',
+)
+
+
+class PassStats:
+    def __init__(self, name):
+        self.name = name
+        self.runs = 0
+        self.seconds = 0.0
+        self.removed = 0
+
+    def __repr__(self):
+        return f'{self.name}: {self.runs} runs, {self.seconds * 1000:.3f} ms, {self.removed} removed'
+
+
+class PassManager:
+    """
+    Runs a configurable sequence of optimization passes over a quadruple list,
+    repeating the sequence until nothing changes (or max_rounds is reached),
+    and keeps per-pass timing and instruction counts across calls.
+    """
+    def __init__(self, passes=DEFAULT_PASSES, max_rounds=4):
+        for name in passes:
+            if name not in PASSES:
+                raise ValueError(f"Unknown optimization pass '{name}'")
+        self.passes = list(passes)
+        self.max_rounds = max_rounds
+        self.stats = {name: PassStats(name) for name in self.passes}
+        self.instructions_in = 0
+        self.instructions_out = 0
+
+    def run(self, quadruples):
+        self.instructions_in += len(quadruples)
+
+        for _ in range(self.max_rounds):
+            before_round = quadruples
+            for name in self.passes:
+                stats = self.stats[name]
+                start = time.perf_counter()
+                optimized = PASSES[name](quadruples)
+                stats.seconds += time.perf_counter() - start
+                stats.runs += 1
+                stats.removed += len(quadruples) - len(optimized)
+                quadruples = optimized
+            if quadruples == before_round:
+                break
+
+        self.instructions_out += len(quadruples)
+        return quadruples
+
+    def report(self):
+        lines = [repr(stats) for stats in self.stats.values()]
+        removed = self.instructions_in - self.instructions_out
+        lines.append(f'total: {self.instructions_in} -> {self.instructions_out} quadruples ({removed} removed)')
+        return '\n'.join(lines)
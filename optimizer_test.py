@@ -0,0 +1,69 @@
+from icg import IntermediateCodeGenerator
+from optimizer import PassManager
+from vm import VirtualMachine, VMError
+
+
+def behaviour(quadruples):
+    printed = []
+    try:
+        vm = VirtualMachine(quadruples, output=printed.append).run()
+    except VMError as error:
+        return str(error).split(' in ')[0], printed
+    return vm.variables(), printed
+
+
+def run_optimizer_tests():
+    tests = [
+        ("let x = 2 * 3 + 4", "[(=, 10, None, x)]"),
+        ("let x = y + 1", "[(PLUS, y, 1, x)]"),
+        ("let x = a * b + a * b", "[(MUL, a, b, T1), (PLUS, T1, T1, x)]"),
+        ("let a = 3\nlet b = a * a", "[(=, 3, None, a), (=, 9, None, b)]"),
+        ("let n = 3\nwhile n : let n = n - 1",
+         "[(=, 3, None, n), (LABEL, None, None, L1), (IF_FALSE, n, None, L2), (MINUS, n, 1, n), "
+         "(GOTO, None, None, L1), (LABEL, None, None, L2)]"),
+        ("let x = 1 / 0", "[(DIV, 1, 0, x)]"),
+        ("while 0 : print(1)\nprint(2)", "[(PRINT, 2, None, None)]"),
+        ("let a = 2\nlet b = 1\nlet n = 4\nwhile n : let n = n - a * b",
+         "[(=, 2, None, a), (=, 1, None, b), (=, 4, None, n), (=, 2, None, T1), (LABEL, None, None, L1), "
+         "(IF_FALSE, n, None, L2), (MINUS, n, T1, n), (GOTO, None, None, L1), (LABEL, None, None, L2)]"),
+        ("let x = 2 < 3\nlet y = x == 2.5", "[(=, 1, None, x), (=, 0, None, y)]"),
+        ("while 2 > 3 : print(1)\nprint(2)", "[(PRINT, 2, None, None)]"),
+        # Nothing that could fail is moved out of a loop that never runs:
+        # arithmetic on a string, or on a variable only assigned later
+        ("let s = \"x\"\nlet i = 0\nwhile (i < 0) : let i = i + (s - 1)\nprint(i)",
+         "[(=, \"x\", None, s), (=, 0, None, i), (LABEL, None, None, L1), (IF_NOT_LT, i, 0, L2), "
+         "(MINUS, s, 1, T1), (PLUS, i, T1, i), (GOTO, None, None, L1), (LABEL, None, None, L2), (PRINT, i, None, None)]"),
+        ("let i = 0\nwhile (i < 0) : let i = i + y * 2\nlet y = 1\nprint(i)",
+         "[(=, 0, None, i), (LABEL, None, None, L1), (IF_NOT_LT, i, 0, L2), (MUL, y, 2, T1), (PLUS, i, T1, i), "
+         "(GOTO, None, None, L1), (LABEL, None, None, L2), (=, 1, None, y), (PRINT, i, None, None)]"),
+    ]
+
+    for i, (source, expected) in enumerate(tests):
+        optimized, _ = IntermediateCodeGenerator(PassManager()).generate_program(source)
+        result = repr(optimized)
+        if result != expected:
+            print(f"Test {i + 1} failed: expected {expected}, got {result}")
+            continue
+
+        # The optimized program must behave exactly like the original one
+        original, _ = IntermediateCodeGenerator().generate_program(source)
+        if behaviour(original) == behaviour(optimized):
+            print(f"Test {i + 1} passed")
+        else:
+            print(f"Test {i + 1} failed: optimized program behaves differently")
+
+    # a * a - 3 is worked out once before the loop instead of 100 times
+    source = "let n = 100\nlet a = 2\nwhile n : let n = n - (a * a - 3)"
+    executed = []
+    for passes in (('loop_invariant_code_motion',), ()):
+        quadruples, _ = IntermediateCodeGenerator(PassManager(passes)).generate_program(source)
+        executed.append(VirtualMachine(quadruples).run().executed)
+    test = len(tests) + 1
+    if executed[0] == executed[1] - 2 * 100 + 2:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: executed {executed[0]} quadruples with hoisting, {executed[1]} without")
+
+
+if __name__ == "__main__":
+    run_optimizer_tests()
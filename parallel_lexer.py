@@ -0,0 +1,181 @@
+import os
+import re
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+from basic import TOKEN_TYPE_CODES, TOKEN_TYPES, TT_EOF, TT_IDENTIFIER, IllegalCharError, RegexLexer, TokenBuffer
+
+# Texts shorter than this are not worth shipping to other processes, and no
+# chunk is made smaller than it
+MIN_CHUNK = 256 * 1024
+
+# Characters no token outside a string contains, so a text can be cut
+# before any of them
+BLANK = re.compile(r'[ \t\n]')
+
+
+def split_points(text, chunks, min_chunk=MIN_CHUNK):
+    """
+    Offsets that cut text into at most chunks pieces of roughly equal size,
+    each cut falling on a blank or newline outside any string literal. A string
+    runs from one '"' to the next, with no escapes that could end it early,
+    so an offset is inside a string exactly when an odd number of quotes
+    come before it. No token spans such a cut, so the pieces can be lexed
+    on their own. Returns the start of every piece after the first.
+    """
+    points = []
+    size = max(len(text) // max(chunks, 1), min_chunk)
+    start = 0
+    quotes = 0
+    while len(points) < chunks - 1:
+        target = start + size
+        if target >= len(text) - min_chunk // 2:
+            break
+        cut = target
+        while True:
+            match = BLANK.search(text, cut)
+            if match is None:
+                return points
+            cut = match.start()
+            quotes += text.count('"', start, cut)
+            start = cut
+            if quotes % 2 == 0:
+                break
+            # Inside a string: carry on past its closing quote
+            close = text.find('"', cut)
+            if close < 0:
+                return points
+            quotes += 1
+            start = cut = close + 1
+        points.append(cut)
+    return points
+
+
+def lex_chunk(chunk, recover=False):
+    """
+    Lex one piece of a text in a worker. Returns its token type codes and
+    offsets as bytes, relative to the piece, its token values, and the
+    offset and character of each illegal character: the first only, unless
+    recovering. The trailing EOF is dropped; the caller adds one for the
+    whole text.
+    """
+    lexer = RegexLexer('<chunk>', chunk, recover)
+    types, starts, ends = array('B'), array('I'), array('I')
+    values = []
+    codes = TOKEN_TYPE_CODES
+    for type_, value, start, end in lexer.scan():
+        if type_ == TT_EOF:
+            break
+        types.append(codes[type_])
+        values.append(value)
+        starts.append(start)
+        ends.append(end)
+    errors = lexer.errors if recover else [lexer.error] if lexer.error is not None else []
+    illegal = [(error.pos_start.idx, chunk[error.pos_start.idx]) for error in errors]
+    return types.tobytes(), starts.tobytes(), ends.tobytes(), values, illegal
+
+
+class ParallelLexer(RegexLexer):
+    """
+    RegexLexer that cuts a long text at blanks and newlines outside string
+    literals, lexes the pieces in a process pool and joins their tokens
+    with each piece's offset added. Positions are offsets into the whole
+    text and get their lines from its LineIndex, so nothing else needs
+    fixing up and the TokenBuffer is identical to RegexLexer's. Texts
+    shorter than min_chunk are lexed in this process.
+
+    Pass an executor to reuse one pool across texts; otherwise a pool of
+    workers processes (one per CPU by default) is started for each text.
+    With recover, every piece skips and collects its illegal characters
+    as RegexLexer does.
+    """
+    def __init__(self, fn, text, recover=False, workers=None, executor=None, min_chunk=MIN_CHUNK):
+        super().__init__(fn, text, recover)
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.min_chunk = min_chunk
+
+    def chunks(self):
+        text = self.text
+        bounds = [0] + split_points(text, self.workers, self.min_chunk) + [len(text)]
+        return [(start, text[start:end]) for start, end in zip(bounds, bounds[1:])]
+
+    def lex_chunks(self, pieces):
+        if len(pieces) == 1:
+            return [lex_chunk(pieces[0][1], self.recover)]
+        texts = [piece for _, piece in pieces]
+        recover = [self.recover] * len(pieces)
+        if self.executor is not None:
+            return list(self.executor.map(lex_chunk, texts, recover))
+        with ProcessPoolExecutor(min(self.workers, len(pieces))) as executor:
+            return list(executor.map(lex_chunk, texts, recover))
+
+    def make_token_buffer(self, symbols=None):
+        fn, text = self.fn, self.text
+        pieces = self.chunks()
+        buffer = TokenBuffer(fn, text, symbols)
+        self.error = None
+        self.errors = []
+
+        for (offset, piece), (types, starts, ends, values, illegal) in zip(pieces, self.lex_chunks(pieces)):
+            errors = [
+                IllegalCharError(self.position(offset + idx), self.position(offset + idx + 1), "'" + char + "'")
+                for idx, char in illegal
+            ]
+            if self.error is None and errors:
+                self.error = errors[0]
+            if self.recover:
+                self.errors.extend(errors)
+            elif errors:
+                # Earlier pieces lexed cleanly, so this is the first error
+                # in the text, as the serial lexer would report it
+                return TokenBuffer(fn, text, symbols), self.error
+            buffer.types.frombytes(types)
+            piece_starts, piece_ends = array('I'), array('I')
+            piece_starts.frombytes(starts)
+            piece_ends.frombytes(ends)
+            if offset:
+                piece_starts = array('I', [start + offset for start in piece_starts])
+                piece_ends = array('I', [end + offset for end in piece_ends])
+            buffer.starts.extend(piece_starts)
+            buffer.ends.extend(piece_ends)
+            buffer.values.extend(values)
+
+        # EOF goes where RegexLexer puts it: one past an unterminated
+        # string, which only the last piece can end with
+        eof = len(text)
+        if buffer.types and buffer.ends[-1] > eof:
+            eof += 1
+        buffer.append(TT_EOF, None, eof, eof + 1)
+
+        if symbols is not None:
+            identifier = TOKEN_TYPE_CODES[TT_IDENTIFIER]
+            for type_code, value in zip(buffer.types, buffer.values):
+                if type_code == identifier:
+                    symbols.intern(value)
+        return buffer, self.error
+
+    def scan(self):
+        # make_tokens and iter_tokens see the same tokens as the buffer
+        buffer, _ = self.make_token_buffer()
+        if self.error is not None and not self.recover:
+            yield TT_EOF, None, self.error.pos_start.idx, self.error.pos_start.idx + 1
+            return
+        for type_code, value, start, end in zip(buffer.types, buffer.values, buffer.starts, buffer.ends):
+            yield TOKEN_TYPES[type_code], value, start, end
+
+
+def main(paths):
+    for path in paths:
+        with open(path, 'r') as file:
+            text = file.read()
+        tokens, error = ParallelLexer(path, text).make_token_buffer()
+        if error:
+            print(error.as_string())
+        else:
+            print(f"{path}: {len(tokens)} tokens")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or ['input.txt'])
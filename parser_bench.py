@@ -0,0 +1,65 @@
+import gc
+import time
+import tracemalloc
+
+from basic import NodeArena, Parser, RecursiveDescentParser, RegexLexer
+
+SHAPES = {
+    'long chain': lambda n: "let x = " + " + ".join(f"{i % 97} * y - -{i}" for i in range(n)),
+    'nested parens': lambda n: "let x = " + "(" * n + "1" + " + 2)" * n,
+    'statements': lambda n: " : ".join(f"let v{i} = (v{i - 1} + {i}) * 2 / 3" for i in range(1, n + 1)),
+    'repeated': lambda n: " : ".join(f"let v{i % 10} = (a * b + c) * (a * b - c) / (x + {i % 7})" for i in range(n)),
+}
+
+
+def time_parser(parser_class, tokens, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = parser_class(tokens).parse()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_parser_bench(sizes=(100, 1_000, 10_000), repeat=3):
+    for shape, build in SHAPES.items():
+        for size in sizes:
+            tokens, _ = RegexLexer('<bench>', build(size)).make_token_buffer()
+            new_time, _ = time_parser(Parser, tokens, repeat)
+            try:
+                old_time, _ = time_parser(RecursiveDescentParser, tokens, repeat)
+                old = f"{old_time * 1000:9.2f} ms  speedup x{old_time / new_time:5.2f}"
+            except RecursionError:
+                old = "RecursionError"
+            print(f"{shape:<14} {size:>6}  {len(tokens):>7} tokens  "
+                  f"precedence {new_time * 1000:9.2f} ms  recursive {old}")
+
+
+def retained_memory(tokens, arena=None):
+    # Bytes still allocated once the parse is done, i.e. held by the AST
+    tracemalloc.start()
+    try:
+        result = Parser(tokens, arena).parse()
+        return tracemalloc.get_traced_memory()[0], result
+    finally:
+        tracemalloc.stop()
+
+
+def run_memory_bench(size=5_000):
+    for shape, build in SHAPES.items():
+        tokens, _ = RegexLexer('<bench>', build(size)).make_token_buffer()
+        plain, _ = retained_memory(tokens)
+        arena = NodeArena()
+        pooled, _ = retained_memory(tokens, arena)
+        print(f"{shape:<14} {size:>6}  AST {plain / 2**20:7.2f} MiB  "
+              f"hash-consed {pooled / 2**20:7.2f} MiB ({len(arena)} shared nodes, {arena.hits} reuses)")
+
+
+if __name__ == "__main__":
+    run_parser_bench()
+    run_memory_bench()
@@ -1,16 +1,21 @@
-from basic import Lexer, Parser
+from basic import Lexer, NodeArena, Parser, PhaseStats, RecursiveDescentParser, RegexLexer, Session, TT_MINUS, run, run_recovering, run_streaming
+from icg import IntermediateCodeGenerator
+from parallel_lexer import ParallelLexer
+
+
+TEST_CASES = [
+    ("20-1*(4/3)+2+(2+4)", "[(((INT:20, MINUS, (INT:1, MUL, (INT:4, DIV, INT:3))), PLUS, INT:2), PLUS, (INT:2, PLUS, INT:4))]"),
+    ("print(hello)", "[(PRINT: (VAR_ACCESS: IDENTIFIER:hello))]"),
+    ("var x = 5", "[(VAR_ASSIGN: IDENTIFIER:x, INT:5)]"),
+    ("let y = 10", "[(VAR_ASSIGN: IDENTIFIER:y, INT:10)]"),
+    ('print("Hello, World!")', '[(PRINT: (STRING:"Hello, World!"))]'),
+    ("let z = 1 + x < 2 * y == 3", "[(VAR_ASSIGN: IDENTIFIER:z, (((INT:1, PLUS, (VAR_ACCESS: IDENTIFIER:x)), LT, "
+                                  "(INT:2, MUL, (VAR_ACCESS: IDENTIFIER:y))), EE, INT:3))]"),
+]
 
 
 def run_parser_tests():
-    test_cases = [
-        ("20-1*(4/3)+2+(2+4)", "[(((INT:20, MINUS, (INT:1, MUL, (INT:4, DIV, INT:3))), PLUS, INT:2), PLUS, (INT:2, PLUS, INT:4))]"),
-        ("print(hello)", "[(PRINT: (VAR_ACCESS: IDENTIFIER:hello))]"),
-        ("var x = 5", "[(VAR_ASSIGN: IDENTIFIER:x, INT:5)]"),
-        ("let y = 10", "[(VAR_ASSIGN: IDENTIFIER:y, INT:10)]"),
-        ('print("Hello, World!")', '[(PRINT: (STRING:"Hello, World!"))]')
-    ]
-
-    for i, (input_text, expected_output) in enumerate(test_cases):
+    for i, (input_text, expected_output) in enumerate(TEST_CASES):
         lexer = Lexer("<stdin>", input_text)
         tokens, error = lexer.make_tokens()
         if error:
@@ -30,4 +35,175 @@ def run_parser_tests():
                 print(f"Test {i + 1} failed: expected {expected_output}, got {result}")
 
 
+def run_streaming_parser_tests():
+    for lexer_class in (Lexer, RegexLexer):
+        for i, (input_text, expected_output) in enumerate(TEST_CASES):
+            ast, error = run_streaming("<stdin>", input_text, lexer_class)
+            if error:
+                print(f"Streaming test {i + 1} failed: {error.as_string()}")
+            elif repr(ast) == expected_output:
+                print(f"Streaming test {i + 1} passed")
+            else:
+                print(f"Streaming test {i + 1} failed: expected {expected_output}, got {ast}")
+
+    # A lexer error past a syntax error is still the one reported
+    ast, error = run_streaming("<stdin>", "let = 1 $")
+    if error and error.error_name == 'Illegal Character':
+        print("Streaming error test passed")
+    else:
+        print(f"Streaming error test failed: got {error.as_string() if error else ast}")
+
+
+def run_session_tests():
+    session = Session(size=2)
+    first = session.run("<stdin>", "let x = 1 + 2")
+    again = session.run("<stdin>", "let x = 1 + 2")
+    if again is first and (session.hits, session.misses) == (1, 1):
+        print("Session test 1 passed")
+    else:
+        print(f"Session test 1 failed: {session.report()}")
+
+    # Errors are cached too, and the least recently used line is evicted
+    session.run("<stdin>", "let = 1")
+    session.run("<stdin>", "print(2)")
+    ast, error, _ = session.run("<stdin>", "let = 1")
+    if error and len(session.cache) == 2 and ("<stdin>", "let x = 1 + 2") not in session.cache:
+        print("Session test 2 passed")
+    else:
+        print(f"Session test 2 failed: {session.report()}")
+
+    disabled = Session(size=0)
+    disabled.run("<stdin>", "print(1)")
+    disabled.run("<stdin>", "print(1)")
+    if not disabled.cache and disabled.misses == 2:
+        print("Session test 3 passed")
+    else:
+        print(f"Session test 3 failed: {disabled.report()}")
+
+
+def run_stats_tests():
+    calls = []
+    stats = PhaseStats(hooks=[lambda phase, seconds, count: calls.append((phase, count))])
+    run("<stdin>", "let x = -(1 + 2)", stats=stats)
+    run("<stdin>", "let = 1", stats=stats)
+    expected = [('lex', 10), ('parse', 5), ('lex', 4), ('parse', 0)]
+    if calls == expected and (stats.runs, stats.errors, stats.tokens, stats.nodes) == (2, 1, 14, 5):
+        print("Stats test passed")
+    else:
+        print(f"Stats test failed: hooks saw {calls}, {stats.report()}")
+
+
+def parse_with(parser_class, text):
+    tokens, _ = RegexLexer("<stdin>", text).make_token_buffer()
+    return parser_class(tokens).parse()
+
+
+def run_precedence_parser_tests():
+    # Both expression parsers agree on the trees and on every error
+    inputs = [text for text, _ in TEST_CASES] + ["1 +", "(1 + 2", "((1) 2)", "- - 3 * (x)", "let x = * 2", "print(1"]
+    for i, text in enumerate(inputs):
+        new, old = parse_with(Parser, text), parse_with(RecursiveDescentParser, text)
+        same_tree = repr(new.node) == repr(old.node)
+        same_error = (new.error and new.error.as_string()) == (old.error and old.error.as_string())
+        if same_tree and same_error and new.advance_count == old.advance_count:
+            print(f"Precedence test {i + 1} passed")
+        else:
+            print(f"Precedence test {i + 1} failed: {new.node or new.error.as_string()} "
+                  f"vs {old.node or old.error.as_string()}")
+
+    depth = 20000
+    result = parse_with(Parser, "let x = " + "(" * depth + "1" + ")" * depth)
+    if not result.error:
+        print("Deep nesting test passed")
+    else:
+        print(f"Deep nesting test failed: {result.error.as_string()}")
+
+    # Deep and long expressions compile through the AST and print, too
+    for name, text, expected in (
+        ("deep", "let x = " + "-" * 5000 + "1", 5001),
+        ("long", "let x = 1" + " + 1" * 20000, 20001),
+    ):
+        quadruples, errors = IntermediateCodeGenerator().generate_program(text)
+        direct, _ = IntermediateCodeGenerator(direct=True).generate_program(text)
+        ast, _, _ = run("<stdin>", text)
+        if not errors and len(quadruples) == expected and repr(quadruples) == repr(direct) and repr(ast):
+            print(f"Compile {name} expression test passed")
+        else:
+            print(f"Compile {name} expression test failed: {len(quadruples)} quadruples, errors {errors}")
+
+    class RightMinusParser(Parser):
+        right_associative = {TT_MINUS}
+
+    result = parse_with(RightMinusParser, "1 - 2 - 3")
+    if repr(result.node) == "[(INT:1, MINUS, (INT:2, MINUS, INT:3))]":
+        print("Operator table test passed")
+    else:
+        print(f"Operator table test failed: got {result.node}")
+
+
+def run_arena_tests():
+    arena = NodeArena()
+    text = "let x = (a * 2) + (a * 2) * -y"
+    ast, _, _ = run("<stdin>", text, arena=arena)
+    plain, _, _ = run("<stdin>", text)
+    value = ast[0].value_node
+    if repr(ast) == repr(plain) and value.left_node is value.right_node.left_node:
+        print("Arena test 1 passed")
+    else:
+        print(f"Arena test 1 failed: got {ast}")
+
+    # Nodes are pooled across parses sharing the arena, but 1 and 1.0 differ
+    again, _, _ = run("<stdin>", "print(a * 2 + 1.0 + 1)", arena=arena)
+    expr = again[0].value_node
+    if expr.left_node.left_node is value.left_node and expr.left_node.right_node is not expr.right_node:
+        print("Arena test 2 passed")
+    else:
+        print(f"Arena test 2 failed: got {again}")
+
+
+RECOVERY_CASES = [
+    # (text, statements that parse, (error name, offset) of every error)
+    ("let a = 1 : print(a)", "[(VAR_ASSIGN: IDENTIFIER:a, INT:1), (PRINT: (VAR_ACCESS: IDENTIFIER:a))]", []),
+    ("let = 1 : print(2)", "[(PRINT: INT:2)]", [("Invalid Syntax", 4)]),
+    ("while x print(1)", "[(PRINT: INT:1)]", [("Invalid Syntax", 8)]),
+    ("int x : let y = (1 + : var z = 3", "[(VAR_ASSIGN: IDENTIFIER:z, INT:3)]",
+     [("Invalid Syntax", 0), ("Invalid Syntax", 21)]),
+    ("let a$b = 1 : print(# 2)", "[(PRINT: INT:2)]",
+     [("Illegal Character", 5), ("Invalid Syntax", 6), ("Illegal Character", 20)]),
+]
+
+
+def run_recovering_parser_tests():
+    for lexer_class in (Lexer, RegexLexer):
+        for i, (input_text, expected_ast, expected_errors) in enumerate(RECOVERY_CASES):
+            ast, errors, _ = run_recovering("<stdin>", input_text, lexer_class)
+            result = [(error.error_name, error.pos_start.idx) for error in errors]
+            if repr(ast) == expected_ast and result == expected_errors:
+                print(f"Recovery test {i + 1} passed")
+            else:
+                print(f"Recovery test {i + 1} failed: got {ast} with {result}")
+
+    ast, errors, _ = run_recovering("<stdin>", "let = 1 : print(2) : let y = $3", ParallelLexer)
+    if repr(ast) == "[(PRINT: INT:2), (VAR_ASSIGN: IDENTIFIER:y, INT:3)]" \
+            and [error.pos_start.idx for error in errors] == [4, 29]:
+        print("Recovery with ParallelLexer test passed")
+    else:
+        print(f"Recovery with ParallelLexer test failed: got {ast} with {errors}")
+
+    # Every bad statement is reported and rendered, not just the first
+    text = " : ".join(["let = 1", "print(x)"] * 1000)
+    ast, errors, _ = run_recovering("<stdin>", text)
+    rendered = [error.as_string() for error in errors]
+    if len(ast) == 1000 and len(rendered) == 1000 and all("Expected Identifier" in r for r in rendered):
+        print("Recovery volume test passed")
+    else:
+        print(f"Recovery volume test failed: {len(ast)} statements, {len(errors)} errors")
+
+
 run_parser_tests()
+run_streaming_parser_tests()
+run_session_tests()
+run_stats_tests()
+run_precedence_parser_tests()
+run_arena_tests()
+run_recovering_parser_tests()
@@ -0,0 +1,172 @@
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from basic import Parser, RegexLexer
+from icg import EmittingParser, IntermediateCodeGenerator
+
+# Each shape builds a one-line program from a size; the suite runs it at
+# base * scale for every scale
+SHAPES = {
+    'arithmetic chain': (100, lambda n: "let x = " + " + ".join(f"{i % 97} * y" for i in range(n))),
+    'nested parens': (20, lambda n: "let x = " + "(" * n + "1" + " + 2)" * n),
+    'many lets': (250, lambda n: " : ".join(f"let v{i} = v{i - 1} * 2 + {i}" for i in range(1, n + 1))),
+    'strings': (250, lambda n: " : ".join(f'print("string literal number {i} with some padding")' for i in range(n))),
+}
+SCALES = (1, 2, 4, 8)
+PHASES = ('lex', 'parse', 'icg')
+# Parsing and code generation in one pass, timed from the lexer's output
+DIRECT = 'direct'
+# Slowdown against the baseline that counts as a regression
+THRESHOLD = 1.25
+# Differences smaller than this are timer noise whatever the ratio
+NOISE_SECONDS = 0.0005
+
+
+def lex(text):
+    tokens, error = RegexLexer('<bench>', text).make_token_buffer()
+    if error:
+        raise ValueError(error.as_string())
+    return tokens
+
+
+def parse(tokens):
+    ast = Parser(tokens).parse()
+    if ast.error:
+        raise ValueError(ast.error.as_string())
+    return ast.node
+
+
+def generate(ast):
+    icg = IntermediateCodeGenerator()
+    icg.generate_quadruples_from_ast(ast)
+    icg.finalize(0)
+    return icg.quadruples
+
+
+def emit(tokens):
+    icg = IntermediateCodeGenerator()
+    EmittingParser(tokens, icg).parse()
+    icg.finalize(0)
+    return icg.quadruples
+
+
+def timed(func, arg, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = func(arg)
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def peak_memory(func, arg):
+    tracemalloc.start()
+    try:
+        func(arg)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(text, repeat):
+    """
+    Time each phase on its own, feeding it the previous phase's output, and
+    record the peak memory each one allocates. Returns a dict of results.
+    """
+    row = {'chars': len(text)}
+    arg = text
+    for phase, func in zip(PHASES, (lex, parse, generate)):
+        row[phase], result = timed(func, arg, repeat)
+        row[phase + ' peak'] = peak_memory(func, arg)
+        if phase == 'lex':
+            tokens = result
+            row['tokens'] = len(result)
+        arg = result
+    row['quadruples'] = len(arg)
+    row[DIRECT], _ = timed(emit, tokens, repeat)
+    row[DIRECT + ' peak'] = peak_memory(emit, tokens)
+    return row
+
+
+def run_suite(shapes=SHAPES, scales=SCALES, repeat=5, out=sys.stdout):
+    results = {}
+    for shape, (base, build) in shapes.items():
+        for scale in scales:
+            size = base * scale
+            key = f'{shape}/{size}'
+            try:
+                row = results[key] = measure(build(size), repeat)
+            except RecursionError:
+                results[key] = {'error': 'recursion limit'}
+                print(f"{key:<24} hit the recursion limit", file=out)
+                continue
+            print(f"{key:<24} {row['chars']:>8} chars {row['tokens']:>7} tokens {row['quadruples']:>7} quads  "
+                  f"lex {row['lex'] * 1000:7.2f} ms ({row['chars'] / row['lex'] / 1e6:5.2f} Mchar/s)  "
+                  f"parse {row['parse'] * 1000:7.2f} ms ({row['tokens'] / row['parse'] / 1e3:6.0f} ktok/s)  "
+                  f"icg {row['icg'] * 1000:7.2f} ms ({row['quadruples'] / row['icg'] / 1e3:6.0f} kquad/s)  "
+                  f"direct {row[DIRECT] * 1000:7.2f} ms (x{(row['parse'] + row['icg']) / row[DIRECT]:4.2f})  "
+                  f"peak {max(row[phase + ' peak'] for phase in PHASES) / 1024:8.1f} KiB", file=out)
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD, out=sys.stdout):
+    """
+    Print every phase that got slower than threshold times its baseline
+    timing, or that newly fails. Returns the number of regressions.
+    """
+    regressions = 0
+    for key, row in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if 'error' in row and 'error' not in old:
+            print(f"REGRESSION {key}: {row['error']}", file=out)
+            regressions += 1
+            continue
+        if 'error' in row or 'error' in old:
+            continue
+        for phase in PHASES + (DIRECT,):
+            if phase not in old:
+                continue
+            ratio = row[phase] / old[phase]
+            if ratio > threshold and row[phase] - old[phase] > NOISE_SECONDS:
+                print(f"REGRESSION {key} {phase}: {old[phase] * 1000:.2f} ms -> {row[phase] * 1000:.2f} ms "
+                      f"(x{ratio:.2f})", file=out)
+                regressions += 1
+    print(f"{regressions} regressions against the baseline (threshold x{threshold})", file=out)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the lexer, parser and ICG on generated programs")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per measurement, best one kept")
+    parser.add_argument('--scales', type=lambda v: [int(s) for s in v.split(',')], default=list(SCALES),
+                        help="size multipliers for every shape (default: %(default)s)")
+    parser.add_argument('--save-baseline', metavar='PATH', help="write the results to a JSON baseline")
+    parser.add_argument('--baseline', metavar='PATH', help="compare the results against a JSON baseline")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="slowdown that counts as a regression (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    results = run_suite(scales=args.scales, repeat=args.repeat)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        return 1 if compare(results, baseline, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
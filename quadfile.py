@@ -0,0 +1,245 @@
+import mmap
+import struct
+import sys
+from array import array
+
+from quadruple import Quadruple, operand_key
+
+MAGIC = b'QUAD'
+VERSION = 1
+
+# Opcode byte for each operator; new operators are appended so existing
+# files keep their meaning
+OPERATORS = (
+    'PLUS', 'MINUS', 'MUL', 'DIV', 'NEG', '=', 'PRINT', 'LABEL', 'GOTO', 'IF_FALSE',
+    'LT', 'GT', 'LTE', 'GTE', 'EE', 'NE',
+    'IF_NOT_LT', 'IF_NOT_GT', 'IF_NOT_LTE', 'IF_NOT_GTE', 'IF_NOT_EE', 'IF_NOT_NE',
+)
+OPCODES = {operator: code for code, operator in enumerate(OPERATORS)}
+
+# magic, version, instruction count, operand count
+HEADER = struct.Struct('<4sHxxII')
+# opcode, then arg1, arg2 and result as indexes into the operand table
+INSTRUCTION = struct.Struct('<BIII')
+NO_OPERAND = 0xFFFFFFFF
+# The operand table is an array of offsets into the operand data that follows
+OFFSET = struct.Struct('<I')
+
+# Operand table entries start with a kind byte
+KIND_STR, KIND_INT, KIND_FLOAT, KIND_BIGINT = range(4)
+INT64 = struct.Struct('<q')
+FLOAT64 = struct.Struct('<d')
+LENGTH = struct.Struct('<I')
+
+
+class QuadfileError(ValueError):
+    pass
+
+
+#######################################
+# WRITER
+#######################################
+
+def encode_operand(operand):
+    if isinstance(operand, str):
+        data = operand.encode('utf-8')
+        return bytes([KIND_STR]) + LENGTH.pack(len(data)) + data
+    if isinstance(operand, bool):
+        raise QuadfileError(f"Cannot encode operand {operand!r}")
+    if isinstance(operand, int):
+        if -2 ** 63 <= operand < 2 ** 63:
+            return bytes([KIND_INT]) + INT64.pack(operand)
+        data = str(operand).encode('ascii')
+        return bytes([KIND_BIGINT]) + LENGTH.pack(len(data)) + data
+    if isinstance(operand, float):
+        return bytes([KIND_FLOAT]) + FLOAT64.pack(operand)
+    raise QuadfileError(f"Cannot encode operand {operand!r}")
+
+
+def dumps(quadruples):
+    """
+    Encode a quadruple list: a header, one fixed-width record per
+    instruction, then the table of distinct operands the records point into
+    (fixed-width offsets followed by the encoded operands).
+    """
+    index = {}
+    table = []
+
+    def intern(operand):
+        if operand is None:
+            return NO_OPERAND
+        key = operand_key(operand)
+        position = index.get(key)
+        if position is None:
+            position = index[key] = len(table)
+            table.append(encode_operand(operand))
+        return position
+
+    records = bytearray(INSTRUCTION.size * len(quadruples))
+    for i, quad in enumerate(quadruples):
+        opcode = OPCODES.get(quad.operator)
+        if opcode is None:
+            raise QuadfileError(f"Cannot encode operator in {quad}")
+        INSTRUCTION.pack_into(records, i * INSTRUCTION.size, opcode,
+                              intern(quad.arg1), intern(quad.arg2), intern(quad.result))
+
+    offsets = bytearray(OFFSET.size * len(table))
+    position = HEADER.size + len(records) + len(offsets)
+    for i, entry in enumerate(table):
+        OFFSET.pack_into(offsets, i * OFFSET.size, position)
+        position += len(entry)
+
+    header = HEADER.pack(MAGIC, VERSION, len(quadruples), len(table))
+    return b''.join([header, bytes(records), bytes(offsets)] + table)
+
+
+def dump(quadruples, path):
+    with open(path, 'wb') as file:
+        file.write(dumps(quadruples))
+
+
+#######################################
+# READER
+#######################################
+
+class QuadrupleReader:
+    """
+    Read-only sequence of Quadruples over an encoded buffer (bytes,
+    memoryview or mmap). Opening only checks the header; instruction records
+    and operands are unpacked from the buffer as they are accessed, and
+    Quadruple objects are only built by indexing or iterating.
+    """
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer)
+        if len(self.buffer) < HEADER.size:
+            raise QuadfileError("Truncated quadruple file")
+        magic, version, self.count, self.operand_count = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise QuadfileError("Not a quadruple file")
+        if version != VERSION:
+            raise QuadfileError(f"Unsupported quadruple file version {version}")
+        self.offsets_start = HEADER.size + self.count * INSTRUCTION.size
+        if self.offsets_start + self.operand_count * OFFSET.size > len(self.buffer):
+            raise QuadfileError("Truncated quadruple file")
+        # Operands decoded so far; every instruction naming one shares it
+        self.operands = {}
+
+    def read_operand(self, index):
+        buffer = self.buffer
+        try:
+            offset = OFFSET.unpack_from(buffer, self.offsets_start + index * OFFSET.size)[0]
+            kind = buffer[offset]
+            offset += 1
+            if kind == KIND_INT:
+                return INT64.unpack_from(buffer, offset)[0]
+            if kind == KIND_FLOAT:
+                return FLOAT64.unpack_from(buffer, offset)[0]
+            if kind in (KIND_STR, KIND_BIGINT):
+                length = LENGTH.unpack_from(buffer, offset)[0]
+                offset += LENGTH.size
+                data = bytes(buffer[offset:offset + length])
+                if len(data) != length:
+                    raise QuadfileError("Truncated quadruple file")
+                return data.decode('utf-8') if kind == KIND_STR else int(data)
+        except (IndexError, struct.error, UnicodeDecodeError) as error:
+            raise QuadfileError(f"Damaged operand table: {error}") from error
+        raise QuadfileError(f"Unknown operand kind {kind}")
+
+    def read_table(self):
+        # Decode every operand in one go, for full passes over the program
+        offsets = array('I')
+        offsets.frombytes(self.buffer[self.offsets_start:self.offsets_start + self.operand_count * OFFSET.size])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        # Read straight from the memoryview: only each string's own bytes
+        # are copied, never the whole buffer
+        data = self.buffer
+        unpack_int = INT64.unpack_from
+        unpack_length = LENGTH.unpack_from
+        table = []
+        try:
+            for offset in offsets:
+                kind = data[offset]
+                if kind == KIND_STR:
+                    length = unpack_length(data, offset + 1)[0]
+                    text = data[offset + 5:offset + 5 + length]
+                    if len(text) != length:
+                        raise QuadfileError("Truncated quadruple file")
+                    table.append(str(text, 'utf-8'))
+                elif kind == KIND_INT:
+                    table.append(unpack_int(data, offset + 1)[0])
+                else:
+                    table.append(self.read_operand(len(table)))
+        except (IndexError, struct.error, UnicodeDecodeError) as error:
+            raise QuadfileError(f"Damaged operand table: {error}") from error
+        self.operands.update(enumerate(table))
+        return table
+
+    def __len__(self):
+        return self.count
+
+    def operand(self, index):
+        if index == NO_OPERAND:
+            return None
+        try:
+            return self.operands[index]
+        except KeyError:
+            pass
+        if index >= self.operand_count:
+            raise QuadfileError(f"Operand index {index} out of range")
+        operand = self.operands[index] = self.read_operand(index)
+        return operand
+
+    def decode(self, record):
+        opcode, a, b, r = record
+        if opcode >= len(OPERATORS):
+            raise QuadfileError(f"Unknown opcode {opcode}")
+        return Quadruple(OPERATORS[opcode], self.operand(a), self.operand(b), self.operand(r))
+
+    def records(self):
+        # Raw (opcode, arg1, arg2, result) index tuples, straight from the buffer
+        return INSTRUCTION.iter_unpack(self.buffer[HEADER.size:self.offsets_start])
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.count))]
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("quadruple index out of range")
+        return self.decode(INSTRUCTION.unpack_from(self.buffer, HEADER.size + i * INSTRUCTION.size))
+
+    def __iter__(self):
+        # A full pass touches almost every operand, so decode the table once
+        # up front and look operands up directly
+        operands = dict(enumerate(self.read_table()))
+        operands[NO_OPERAND] = None
+        for record in self.records():
+            opcode, a, b, r = record
+            try:
+                quad = Quadruple(OPERATORS[opcode], operands[a], operands[b], operands[r])
+            except (IndexError, KeyError):
+                # A damaged record; decode it the slow way so iterating
+                # raises the same error as indexing
+                quad = self.decode(record)
+            yield quad
+
+    def release(self):
+        self.operands.clear()
+        self.buffer.release()
+
+
+def loads(data):
+    return list(QuadrupleReader(data))
+
+
+def open_file(path):
+    """
+    Map a quadruple file into memory and return a QuadrupleReader over it.
+    The mapping stays open as long as the reader's buffer is referenced.
+    """
+    with open(path, 'rb') as file:
+        if not file.seek(0, 2):
+            raise QuadfileError("Truncated quadruple file")
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return QuadrupleReader(mapped)
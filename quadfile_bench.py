@@ -0,0 +1,72 @@
+import ast
+import pickle
+import random
+import time
+
+import quadfile
+from icg import IntermediateCodeGenerator
+from quadruple import Quadruple
+
+
+def generate_source(lines, seed=0):
+    rng = random.Random(seed)
+    statements = []
+    for i in range(lines):
+        terms = ' + '.join(f"v{rng.randrange(50)} * {rng.randint(1, 99)}" for _ in range(4))
+        statements.append(f"let v{i % 50} = {terms}")
+    return '\n'.join(statements)
+
+
+def dump_text(quadruples):
+    return '\n'.join(repr(quad) for quad in quadruples)
+
+
+def parse_operand(text):
+    if text == 'None':
+        return None
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def load_text(text):
+    # What loading a printed program takes today: split every line and
+    # turn each field back into a Python value
+    quadruples = []
+    for line in text.splitlines():
+        operator, arg1, arg2, result = line[1:-1].split(', ')
+        quadruples.append(Quadruple(operator, parse_operand(arg1), parse_operand(arg2), parse_operand(result)))
+    return quadruples
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_quadfile_bench(lines=20_000, repeat=5):
+    quadruples, _ = IntermediateCodeGenerator().generate_program(generate_source(lines))
+    text = dump_text(quadruples)
+    pickled = pickle.dumps(quadruples)
+    binary = quadfile.dumps(quadruples)
+    print(f"{len(quadruples)} quadruples")
+
+    formats = [
+        ('text', len(text.encode()), lambda: load_text(text)),
+        ('pickle', len(pickled), lambda: pickle.loads(pickled)),
+        ('quadfile', len(binary), lambda: quadfile.loads(binary)),
+        ('quadfile open', len(binary), lambda: quadfile.QuadrupleReader(binary)),
+    ]
+    for name, size, load in formats:
+        elapsed = best_of(load, repeat)
+        print(f"{name:<14} {size / 1024:9.1f} KiB  load {elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    run_quadfile_bench()
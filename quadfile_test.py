@@ -0,0 +1,73 @@
+import math
+import os
+import tempfile
+
+import quadfile
+from icg import IntermediateCodeGenerator
+from quadruple import Quadruple, operand_key
+
+
+def same_program(a, b):
+    return [tuple(operand_key(x) for x in quad.as_tuple()) for quad in a] == \
+        [tuple(operand_key(x) for x in quad.as_tuple()) for quad in b]
+
+
+def run_quadfile_tests():
+    source = 'let n = 3\nwhile n : let n = n - 1 * 2.5\nprint("héllo")'
+    program, _ = IntermediateCodeGenerator().generate_program(source)
+    if same_program(quadfile.loads(quadfile.dumps(program)), program):
+        print("Test 1 passed")
+    else:
+        print("Test 1 failed: program changed in a round trip")
+
+    # Literals that compare equal stay distinct, and odd values survive
+    edge = [
+        Quadruple('=', 0.0, None, 'a'), Quadruple('=', -0.0, None, 'b'), Quadruple('=', 0, None, 'c'),
+        Quadruple('=', 2 ** 100, None, 'd'), Quadruple('=', math.inf, None, 'e'),
+        Quadruple('PLUS', -2 ** 63, 2 ** 63 - 1, 'T1'), Quadruple('PRINT', '""', None, None),
+    ]
+    decoded = quadfile.loads(quadfile.dumps(edge))
+    if same_program(decoded, edge) and math.copysign(1, decoded[1].arg1) == -1:
+        print("Test 2 passed")
+    else:
+        print(f"Test 2 failed: got {decoded}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'program.quad')
+        quadfile.dump(program, path)
+        reader = quadfile.open_file(path)
+        if len(reader) == len(program) and reader[-1] == program[-1] and reader[1:3] == program[1:3]:
+            print("Test 3 passed")
+        else:
+            print("Test 3 failed: random access through the mapped file differs")
+        reader.release()
+
+    data = quadfile.dumps(program)
+    for i, damaged in enumerate((b'', b'NOPE' + data[4:], data[:len(data) - 3])):
+        try:
+            quadfile.loads(damaged)
+            print(f"Test {4 + i} failed: damaged input was accepted")
+        except quadfile.QuadfileError:
+            print(f"Test {4 + i} passed")
+
+    # An operand index just past the table fails the same way whether the
+    # record is reached by indexing or by iterating
+    two = quadfile.dumps([Quadruple('=', 1, None, 'a')])
+    damaged = bytearray(two)
+    quadfile.INSTRUCTION.pack_into(damaged, quadfile.HEADER.size, quadfile.OPCODES['='], 2,
+                                   quadfile.NO_OPERAND, 1)
+    reader = quadfile.QuadrupleReader(bytes(damaged))
+    errors = []
+    for access in (lambda: reader[0], lambda: list(reader)):
+        try:
+            access()
+        except quadfile.QuadfileError as error:
+            errors.append(str(error))
+    if len(errors) == 2 and errors[0] == errors[1]:
+        print("Test 7 passed")
+    else:
+        print(f"Test 7 failed: got {errors}")
+
+
+if __name__ == "__main__":
+    run_quadfile_tests()
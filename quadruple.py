@@ -1,3 +1,37 @@
+# Operators emitted by IntermediateCodeGenerator besides '=', 'PRINT' and 'LABEL'
+# Comparisons write 1 when they hold and 0 otherwise
+COMPARISON_OPERATORS = ('LT', 'GT', 'LTE', 'GTE', 'EE', 'NE')
+BINARY_OPERATORS = ('PLUS', 'MINUS', 'MUL', 'DIV') + COMPARISON_OPERATORS
+UNARY_OPERATORS = ('NEG',)
+# Compare-and-branch for a comparison used directly as a loop condition:
+# (IF_NOT_LT, a, b, L) jumps to L unless a < b. Spelled as a negation
+# rather than IF_GTE so comparisons with NaN branch like IF_FALSE would.
+BRANCH_OPERATORS = {op: 'IF_NOT_' + op for op in COMPARISON_OPERATORS}
+CONDITIONAL_JUMPS = ('IF_FALSE',) + tuple(BRANCH_OPERATORS.values())
+JUMPS = ('GOTO',) + CONDITIONAL_JUMPS
+
+
+def is_temp(operand):
+    return isinstance(operand, str) and operand[:1] == 'T' and operand[1:].isdigit()
+
+
+def is_string_constant(operand):
+    return isinstance(operand, str) and operand[:1] == '"'
+
+
+def operand_key(operand):
+    # Hashable identity for an operand: 1, 1.0 and -0.0 all compare equal to
+    # some other literal but are different operands
+    if isinstance(operand, float):
+        return (float, repr(operand))
+    return (type(operand), operand)
+
+
+def is_name(operand):
+    # Variables and temporaries; literals are Python numbers or quoted strings
+    return isinstance(operand, str) and not is_string_constant(operand)
+
+
 class Quadruple:
     def __init__(self, operator, arg1, arg2, result):
         self.operator = operator
@@ -7,3 +41,12 @@ class Quadruple:
 
     def __repr__(self):
         return f"({self.operator}, {self.arg1}, {self.arg2}, {self.result})"
+
+    def __eq__(self, other):
+        return isinstance(other, Quadruple) and self.as_tuple() == other.as_tuple()
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def as_tuple(self):
+        return (self.operator, self.arg1, self.arg2, self.result)
@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from basic import Token
+from icg import IntermediateCodeGenerator
+from main import positive_int
+from optimizer import PassManager
+
+HOST = '127.0.0.1'
+PORT = 8765
+# Requests a connection may have in flight before the server stops reading
+# from it, which in turn stops the client once the socket buffers fill up
+MAX_PENDING = 64
+# Longest request line accepted
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+OUTPUTS = ('tokens', 'ast', 'quadruples')
+DEFAULT_OUTPUTS = ('quadruples',)
+
+
+#######################################
+# REQUEST HANDLING (worker processes)
+#######################################
+
+def token_to_json(tok):
+    return [tok.type, tok.value]
+
+
+def ast_to_json(node):
+    if isinstance(node, list):
+        return [ast_to_json(sub_node) for sub_node in node]
+    data = {'type': type(node).__name__}
+    fields = node.__slots__ if hasattr(node, '__slots__') else vars(node)
+    for field in fields:
+        value = getattr(node, field)
+        data[field] = token_to_json(value) if isinstance(value, Token) else ast_to_json(value)
+    return data
+
+
+def error_response(request_id, message):
+    return {'id': request_id, 'ok': False, 'errors': [message]}
+
+
+def handle_request(request):
+    """
+    Compile request['source'] and return the JSON-ready response. Tokens
+    and ASTs are per line, since each line is lexed and parsed on its own;
+    quadruples are for the whole source as one compilation unit.
+    """
+    request_id = request.get('id')
+    source = request.get('source')
+    outputs = request.get('output', DEFAULT_OUTPUTS)
+    if not isinstance(source, str):
+        return error_response(request_id, "'source' must be a string")
+    if not isinstance(outputs, (list, tuple)) or any(output not in OUTPUTS for output in outputs):
+        return error_response(request_id, f"'output' must be a list drawn from {', '.join(OUTPUTS)}")
+
+    icg = IntermediateCodeGenerator(PassManager() if request.get('optimize') else None)
+    tokens = []
+    trees = []
+    # The unit's quadruples are only held on to when they are sent back
+    with icg.session(request.get('fn', '<server>'), keep='quadruples' in outputs) as unit:
+        for line in source.splitlines():
+            if line.strip() == 'exit':
+                break
+            if not line.strip():
+                continue
+            ast, error, line_tokens = unit.compile(line)
+            if 'tokens' in outputs:
+                tokens.append([token_to_json(tok) for tok in line_tokens])
+            if 'ast' in outputs and not error:
+                trees.append(ast_to_json(ast))
+
+    response = {'id': request_id, 'ok': not unit.errors, 'errors': [error.as_string() for error in unit.errors]}
+    if 'tokens' in outputs:
+        response['tokens'] = tokens
+    if 'ast' in outputs:
+        response['ast'] = trees
+    if 'quadruples' in outputs:
+        response['quadruples'] = [list(quad.as_tuple()) for quad in unit.kept]
+    return response
+
+
+#######################################
+# SERVER
+#######################################
+
+class CompileServer:
+    """
+    Newline-delimited JSON compile server. Each request line is handed to a
+    process pool as soon as it is read, so a client may pipeline many
+    requests on one connection; responses come back in request order. A
+    connection with max_pending requests in flight is not read from until
+    the oldest one has been answered.
+    """
+    def __init__(self, workers=None, max_pending=MAX_PENDING, executor=None):
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be at least 1, got {max_pending}")
+        self.executor = executor or ProcessPoolExecutor(workers)
+        self.max_pending = max_pending
+        self.server = None
+        self.connections = set()
+        self.requests = 0
+
+    async def start(self, host=HOST, port=PORT, path=None):
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_connection, path, limit=MAX_REQUEST_BYTES)
+        else:
+            self.server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_REQUEST_BYTES)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        # Connections outlive the listening socket; drop any still open
+        for task in self.connections:
+            task.cancel()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        self.executor.shutdown()
+
+    async def dispatch(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as error:
+            return error_response(None, f"Invalid JSON: {error}")
+        if not isinstance(request, dict):
+            return error_response(None, "Request must be a JSON object")
+
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self.executor, handle_request, request)
+        except Exception as error:
+            return error_response(request.get('id'), f"{type(error).__name__}: {error}")
+
+    async def handle_connection(self, reader, writer):
+        self.connections.add(asyncio.current_task())
+        pending = asyncio.Queue()
+        # One slot per request from the moment its task is created until its
+        # response has been written
+        slots = asyncio.Semaphore(self.max_pending)
+
+        async def respond():
+            try:
+                while True:
+                    task = await pending.get()
+                    if task is None:
+                        return
+                    response = await task
+                    writer.write(json.dumps(response).encode() + b'\n')
+                    await writer.drain()
+                    slots.release()
+            finally:
+                # Wake the reader if it is waiting for a slot, so it notices
+                # the responder has stopped
+                slots.release()
+
+        responder = asyncio.create_task(respond())
+        try:
+            while not responder.done():
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    await slots.acquire()
+                    pending.put_nowait(asyncio.create_task(self.too_long()))
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    # Blocks while max_pending requests are unanswered
+                    await slots.acquire()
+                    pending.put_nowait(asyncio.create_task(self.dispatch(line)))
+            if not responder.done():
+                pending.put_nowait(None)
+            await responder
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            responder.cancel()
+            while not pending.empty():
+                task = pending.get_nowait()
+                if task is not None:
+                    task.cancel()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+            self.connections.discard(asyncio.current_task())
+
+    async def too_long(self):
+        return error_response(None, f"Request longer than {MAX_REQUEST_BYTES} bytes")
+
+
+async def serve(host=HOST, port=PORT, path=None, workers=None, max_pending=MAX_PENDING):
+    server = CompileServer(workers, max_pending)
+    await server.start(host, port, path)
+    where = path or f"{host}:{port}"
+    print(f"Compile server listening on {where} with {workers or os.cpu_count()} workers")
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve compile requests as newline-delimited JSON")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket instead of TCP")
+    parser.add_argument('--workers', type=positive_int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument('--max-pending', type=positive_int, default=MAX_PENDING,
+                        help="requests in flight per connection before it stops being read (default: %(default)s)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
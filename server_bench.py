@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from server import CompileServer
+
+
+def make_requests(count, seed=0):
+    rng = random.Random(seed)
+    requests = []
+    for i in range(count):
+        lines = [f"let v{j} = " + " + ".join(f"{rng.randint(1, 99)} * v{rng.randrange(max(j, 1))}" for _ in range(4))
+                 for j in range(rng.randint(1, 20))]
+        requests.append({'id': i, 'source': '\n'.join(lines), 'optimize': rng.random() < 0.5})
+    return requests
+
+
+async def client(host, port, requests, window, latencies):
+    """
+    Keep up to window requests in flight on one connection and record the
+    time from sending each request to reading its response.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    sent = {}
+    in_flight = asyncio.Semaphore(window)
+
+    async def send():
+        for request in requests:
+            await in_flight.acquire()
+            sent[request['id']] = time.perf_counter()
+            writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    for _ in requests:
+        response = json.loads(await reader.readline())
+        latencies.append(time.perf_counter() - sent.pop(response['id']))
+        in_flight.release()
+    await sender
+    writer.close()
+    await writer.wait_closed()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def run_load(host, port, connections, requests_per_connection, window):
+    requests = make_requests(connections * requests_per_connection)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, requests[i::connections], window, latencies)
+        for i in range(connections)
+    ))
+    elapsed = time.perf_counter() - start
+    print(f"{len(latencies)} requests over {connections} connections (window {window}) in {elapsed:.2f} s: "
+          f"{len(latencies) / elapsed:.0f} req/s  "
+          f"p50 {percentile(latencies, 0.50) * 1000:.2f} ms  p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+
+
+async def run_server_bench(connections=8, requests_per_connection=200, windows=(1, 16), workers=None,
+                           host=None, port=None):
+    server = None
+    if host is None:
+        # Benchmark against a server in this process, on a free port
+        server = CompileServer(workers)
+        listening = await server.start(port=0)
+        host, port = listening.sockets[0].getsockname()[:2]
+    try:
+        for window in windows:
+            await run_load(host, port, connections, requests_per_connection, window)
+    finally:
+        if server is not None:
+            await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the compile server and report latency percentiles")
+    parser.add_argument('--connections', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help="requests per connection")
+    parser.add_argument('--windows', type=lambda v: [int(w) for w in v.split(',')], default=[1, 16],
+                        help="pipelined requests in flight per connection, one run each (default: 1,16)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes for the in-process server")
+    parser.add_argument('--host', help="benchmark a running server instead of starting one")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+    asyncio.run(run_server_bench(args.connections, args.requests, args.windows, args.workers,
+                                 args.host, args.port if args.host else None))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from icg import IntermediateCodeGenerator
+from server import CompileServer
+
+
+async def exchange(port, lines):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    # Pipelined: everything is sent before the first response is read
+    writer.write(b''.join(line.encode() + b'\n' for line in lines))
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in lines]
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+async def run_server_tests():
+    server = CompileServer(workers=2, max_pending=2)
+    listening = await server.start(port=0)
+    port = listening.sockets[0].getsockname()[1]
+    try:
+        sources = [f"let x = {i} * (y + {i})\nprint(x)" for i in range(10)]
+        requests = [json.dumps({'id': i, 'source': source}) for i, source in enumerate(sources)]
+        responses = await exchange(port, requests)
+        expected = [[list(quad.as_tuple()) for quad in IntermediateCodeGenerator().generate_program(source)[0]]
+                    for source in sources]
+        if [r['id'] for r in responses] == list(range(10)) and [r['quadruples'] for r in responses] == expected:
+            print("Test 1 passed")
+        else:
+            print(f"Test 1 failed: got {responses}")
+
+        request = {'id': 'a', 'source': "let x = -1", 'output': ['tokens', 'ast']}
+        response, = await exchange(port, [json.dumps(request)])
+        tree = response['ast'][0][0]
+        if response['ok'] and response['tokens'][0][0] == ['KEYWORD', 'let'] and tree['type'] == 'VarAssignNode' \
+                and tree['value_node']['type'] == 'UnaryOpNode' and 'quadruples' not in response:
+            print("Test 2 passed")
+        else:
+            print(f"Test 2 failed: got {response}")
+
+        responses = await exchange(port, ['not json', json.dumps({'id': 5, 'source': 'let = 1'})])
+        if [r['ok'] for r in responses] == [False, False] and responses[1]['id'] == 5 \
+                and 'Expected Identifier' in responses[1]['errors'][0]:
+            print("Test 3 passed")
+        else:
+            print(f"Test 3 failed: got {responses}")
+
+        # No more than max_pending requests are dispatched ahead of the
+        # responses written back
+        dispatch = server.dispatch
+        in_flight = peak = 0
+
+        async def counting(line):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                return await dispatch(line)
+            finally:
+                in_flight -= 1
+
+        server.dispatch = counting
+        responses = await exchange(port, requests)
+        del server.dispatch
+        if len(responses) == 10 and peak <= server.max_pending:
+            print("Test 4 passed")
+        else:
+            print(f"Test 4 failed: {peak} requests in flight with max_pending {server.max_pending}")
+
+        try:
+            CompileServer(max_pending=0, executor=server.executor)
+            print("Test 5 failed: max_pending 0 was accepted")
+        except ValueError:
+            print("Test 5 passed")
+    finally:
+        await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_server_tests())
@@ -1,11 +1,29 @@
+import argparse
+
 import basic
 
+parser = argparse.ArgumentParser(description="Interactive BASIC shell")
+parser.add_argument('--cache-size', type=int, default=basic.SESSION_CACHE_SIZE,
+					help="lines whose tokens and AST are kept for reuse (default: %(default)s)")
+parser.add_argument('--no-cache', action='store_true', help="lex and parse every line from scratch")
+parser.add_argument('--stats', action='store_true', help="print the time spent in each phase after every line")
+args = parser.parse_args()
+
+session = basic.Session(0 if args.no_cache else args.cache_size)
+
 while True:
-	text = input('basic > ')
+	try:
+		text = input('basic > ')
+	except (EOFError, KeyboardInterrupt):
+		print()
+		print(session.report())
+		break
 	if text.strip() == "":
 		continue
 
-	ast, error, tokens = basic.run('<stdin>', text)
+	if args.stats:
+		session.stats = basic.PhaseStats()
+	ast, error, tokens = session.run('<stdin>', text)
 
 	if error:
 		print(error.as_string())
@@ -15,3 +33,6 @@ while True:
 			print(token)
 		print("\nParse Tree: ")
 		print(ast)
+
+	if args.stats:
+		print(session.stats.report() if session.stats.runs else "(served from the cache)")
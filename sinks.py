@@ -0,0 +1,73 @@
+from collections import deque
+
+
+class NullSink:
+    """
+    Counts the quadruples written to it and drops them, for callers that
+    already get their code back some other way.
+    """
+    def __init__(self):
+        self.count = 0
+
+    def write(self, quadruples):
+        self.count += len(quadruples)
+
+
+class ListSink:
+    """Keeps every quadruple written to it, in order."""
+    def __init__(self):
+        self.quadruples = []
+
+    def write(self, quadruples):
+        self.quadruples.extend(quadruples)
+
+
+class FileSink:
+    """Writes one quadruple per line to an open text file."""
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+
+    def write(self, quadruples):
+        self.file.writelines(f"{quad}\n" for quad in quadruples)
+        self.count += len(quadruples)
+
+
+class BoundedBuffer:
+    """
+    Keeps only the most recent maxlen quadruples, counting the ones that
+    were pushed out, for watching the tail of a long compile.
+    """
+    def __init__(self, maxlen=1024):
+        self.quadruples = deque(maxlen=maxlen)
+        self.dropped = 0
+
+    def write(self, quadruples):
+        overflow = len(self.quadruples) + len(quadruples) - self.quadruples.maxlen
+        if overflow > 0:
+            self.dropped += overflow
+        self.quadruples.extend(quadruples)
+
+
+class GeneratorSink:
+    """
+    Sends each quadruple into a generator used as a coroutine, e.g.
+
+        def consumer():
+            while True:
+                quad = yield
+                ...
+
+    The generator is primed here, so it can be passed in freshly created.
+    """
+    def __init__(self, generator):
+        self.generator = generator
+        next(generator)
+
+    def write(self, quadruples):
+        send = self.generator.send
+        for quad in quadruples:
+            send(quad)
+
+    def close(self):
+        self.generator.close()
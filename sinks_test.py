@@ -0,0 +1,63 @@
+import io
+
+from icg import IntermediateCodeGenerator
+from optimizer import PassManager
+from sinks import BoundedBuffer, FileSink, GeneratorSink, ListSink, NullSink
+
+SOURCE = "let a = 1 + 2\nlet b = a * 3\nprint(b)"
+
+
+def run_sinks_tests():
+    # Each generate_quadruples call hands back only that line's code, and
+    # the default sink holds on to none of it
+    icg = IntermediateCodeGenerator()
+    sizes = [len(icg.generate_quadruples(line)[0]) for line in SOURCE.splitlines()]
+    if sizes == [2, 2, 1] and isinstance(icg.sink, NullSink) and icg.sink.count == 5 and not icg.quadruples:
+        print("Test 1 passed")
+    else:
+        print(f"Test 1 failed: got {sizes}")
+
+    # Without whole-unit passes nothing stays pending between lines
+    output = io.StringIO()
+    icg = IntermediateCodeGenerator(sink=FileSink(output))
+    pending = []
+    with icg.session() as unit:
+        for line in SOURCE.splitlines():
+            unit.compile(line)
+            pending.append(len(icg.quadruples))
+    expected, _ = IntermediateCodeGenerator().generate_program(SOURCE)
+    if pending == [0, 0, 0] and output.getvalue() == ''.join(f"{quad}\n" for quad in expected):
+        print("Test 2 passed")
+    else:
+        print(f"Test 2 failed: pending {pending}, wrote {output.getvalue()!r}")
+
+    # With an optimizer the unit is buffered and optimized as a whole
+    sink = ListSink()
+    unit = IntermediateCodeGenerator(PassManager(), sink=sink).compile_unit(SOURCE.splitlines())
+    if repr(sink.quadruples) == "[(=, 3, None, a), (=, 9, None, b), (PRINT, 9, None, None)]" and unit.count == 3:
+        print("Test 3 passed")
+    else:
+        print(f"Test 3 failed: got {sink.quadruples}")
+
+    buffer = BoundedBuffer(maxlen=2)
+    IntermediateCodeGenerator(sink=buffer).compile_unit(SOURCE.splitlines())
+    if list(buffer.quadruples) == expected[-2:] and buffer.dropped == 3:
+        print("Test 4 passed")
+    else:
+        print(f"Test 4 failed: kept {list(buffer.quadruples)}, dropped {buffer.dropped}")
+
+    received = []
+
+    def consumer():
+        while True:
+            received.append((yield))
+
+    IntermediateCodeGenerator(sink=GeneratorSink(consumer())).compile_unit(io.StringIO(SOURCE))
+    if received == expected:
+        print("Test 5 passed")
+    else:
+        print(f"Test 5 failed: got {received}")
+
+
+if __name__ == "__main__":
+    run_sinks_tests()
@@ -1,26 +1,71 @@
-def string_with_arrows(text, pos_start, pos_end):
-    result = ''
-
-    # Calculate indices
-    idx_start = max(text.rfind('\n', 0, pos_start.idx), 0)
-    idx_end = text.find('\n', idx_start + 1)
-    if idx_end < 0: idx_end = len(text)
-    
+import re
+from bisect import bisect_right
+
+# Lines longer than this are cut down to a window around the error
+MAX_LINE_WIDTH = 160
+# Spans covering more lines than this only show the first ones
+MAX_SPAN_LINES = 5
+
+
+class LineIndex:
+    """
+    Offsets where each line of a source text starts, built on first use, so
+    an offset can be turned into a (line, column) pair with a binary search.
+    """
+    def __init__(self, text):
+        self.text = text
+        self.starts = None
+
+    def build(self):
+        self.starts = [0] + [match.end() for match in re.finditer('\n', self.text)]
+        return self.starts
+
+    def line_col(self, idx):
+        starts = self.starts or self.build()
+        ln = max(bisect_right(starts, idx) - 1, 0)
+        return ln, idx - starts[ln]
+
+    def line_end(self, ln):
+        starts = self.starts or self.build()
+        return starts[ln + 1] - 1 if ln + 1 < len(starts) else len(self.text)
+
+
+def clip_line(line, col_start, col_end):
+    if len(line) <= MAX_LINE_WIDTH:
+        return line, col_start, col_end
+
+    left = max(min(col_start, len(line)) - MAX_LINE_WIDTH // 2, 0)
+    right = min(left + MAX_LINE_WIDTH, len(line))
+    prefix = '...' if left > 0 else ''
+    suffix = '...' if right < len(line) else ''
+    shift = len(prefix) - left
+    col_end = min(col_end, right)
+    return prefix + line[left:right] + suffix, col_start + shift, max(col_end + shift, col_start + shift)
+
+
+def string_with_arrows(text, pos_start, pos_end, lines=None):
+    if lines is None:
+        lines = LineIndex(text)
+    result = []
+
+    ln_start, col_first = lines.line_col(pos_start.idx)
+    ln_end, col_last = lines.line_col(pos_end.idx)
+
     # Generate each line
-    line_count = pos_end.ln - pos_start.ln + 1
-    for i in range(line_count):
+    line_count = ln_end - ln_start + 1
+    for i in range(min(line_count, MAX_SPAN_LINES)):
+        # Every line after the first one in the file keeps the newline before it
+        ln = ln_start + i
+        lead = '\n' if ln > 0 else ''
+        line = text[lines.starts[ln]:lines.line_end(ln)]
+
         # Calculate line columns
-        line = text[idx_start:idx_end]
-        col_start = pos_start.col if i == 0 else 0
-        col_end = pos_end.col if i == line_count - 1 else len(line) - 1
+        col_start = col_first if i == 0 else 0
+        col_end = col_last if i == line_count - 1 else len(lead) + len(line) - 1
+        line, col_start, col_end = clip_line(line, col_start, col_end)
 
         # Append to result
-        result += line + '\n'
-        result += ' ' * col_start + '^' * (col_end - col_start)
-
-        # Re-calculate indices
-        idx_start = idx_end
-        idx_end = text.find('\n', idx_start + 1)
-        if idx_end < 0: idx_end = len(text)
+        result.append(lead + line + '\n')
+        result.append(' ' * col_start + '^' * (col_end - col_start))
 
-    return result.replace('\t', '')
\ No newline at end of file
+    return ''.join(result).replace('\t', '')
@@ -0,0 +1,154 @@
+from quadruple import JUMPS, Quadruple, is_string_constant, is_temp, operand_key
+
+# Operand kinds, kept in the low bits of an encoded operand
+CONSTANT, VARIABLE, TEMP, LABEL = range(4)
+KIND_BITS = 2
+KIND_MASK = (1 << KIND_BITS) - 1
+
+# Encoding of an absent operand
+NO_OPERAND = -1
+
+
+def encode(kind, index):
+    return index << KIND_BITS | kind
+
+
+def kind_of(code):
+    return code & KIND_MASK
+
+
+def index_of(code):
+    return code >> KIND_BITS
+
+
+class SymbolTable:
+    """
+    Interns names to small consecutive integers in order of first
+    appearance. The lexer fills one in as it meets identifiers, so the ids
+    of a program's variables are known before it is parsed.
+    """
+    def __init__(self, names=()):
+        self.ids = {}
+        self.names = []
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name):
+        index = self.ids.get(name)
+        if index is None:
+            index = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def get(self, name):
+        return self.ids.get(name)
+
+    def __getitem__(self, index):
+        return self.names[index]
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f'SymbolTable({self.names!r})'
+
+
+class ConstantPool:
+    """
+    Literals interned by operand_key, so 1, 1.0 and True get separate
+    entries. operands holds each literal as it appears in a quadruple and
+    values as it is used at run time, strings without their quotes.
+    """
+    def __init__(self):
+        self.ids = {}
+        self.operands = []
+        self.values = []
+
+    def add(self, operand):
+        key = operand_key(operand)
+        index = self.ids.get(key)
+        if index is None:
+            index = self.ids[key] = len(self.operands)
+            self.operands.append(operand)
+            self.values.append(operand[1:-1] if is_string_constant(operand) else operand)
+        return index
+
+    def __len__(self):
+        return len(self.operands)
+
+
+class EncodedProgram:
+    """
+    A quadruple list with every operand replaced by an integer code: the
+    index into its constant pool, symbol table, temporary table or label
+    table, shifted left by KIND_BITS and tagged with its kind. code holds
+    (operator, arg1, arg2, result) tuples of those codes, so later stages
+    can keep their per-operand state in lists indexed by id.
+
+    symbols may be shared with the lexer and other programs; variables
+    lists the ids this program actually mentions, in order, and slots maps
+    each of those ids to its position in variables. Registers are numbered
+    by slot, so names other programs added to a shared table cost nothing.
+    """
+    def __init__(self, quadruples=(), symbols=None):
+        self.symbols = symbols if symbols is not None else SymbolTable()
+        self.temps = SymbolTable()
+        self.labels = SymbolTable()
+        self.constants = ConstantPool()
+        self.variables = []
+        self.slots = {}
+        self.code = []
+        self.extend(quadruples)
+
+    def operand(self, operand, label=False):
+        if operand is None:
+            return NO_OPERAND
+        if label:
+            return encode(LABEL, self.labels.intern(operand))
+        if is_string_constant(operand) or not isinstance(operand, str):
+            return encode(CONSTANT, self.constants.add(operand))
+        if is_temp(operand):
+            return encode(TEMP, self.temps.intern(operand))
+        index = self.symbols.intern(operand)
+        if index not in self.slots:
+            self.slots[index] = len(self.variables)
+            self.variables.append(index)
+        return encode(VARIABLE, index)
+
+    def extend(self, quadruples):
+        operand = self.operand
+        for quad in quadruples:
+            label = quad.operator == 'LABEL' or quad.operator in JUMPS
+            self.code.append((
+                quad.operator, operand(quad.arg1), operand(quad.arg2), operand(quad.result, label)
+            ))
+
+    def decode(self, code):
+        if code == NO_OPERAND:
+            return None
+        kind, index = kind_of(code), index_of(code)
+        if kind == CONSTANT:
+            return self.constants.operands[index]
+        if kind == VARIABLE:
+            return self.symbols[index]
+        if kind == TEMP:
+            return self.temps[index]
+        return self.labels[index]
+
+    def quadruples(self):
+        decode = self.decode
+        return [Quadruple(op, decode(a), decode(b), decode(r)) for op, a, b, r in self.code]
+
+    def bases(self):
+        # Start of each kind's registers when constants, variables (by
+        # slot) and temporaries share one register file, in that order;
+        # labels are given no registers
+        variables = len(self.constants)
+        temps = variables + len(self.variables)
+        return [0, variables, temps, temps + len(self.temps)]
+
+    def __len__(self):
+        return len(self.code)
@@ -0,0 +1,83 @@
+from basic import Lexer, RegexLexer
+from icg import IntermediateCodeGenerator
+from optimizer import PassManager
+from symbols import CONSTANT, LABEL, NO_OPERAND, TEMP, VARIABLE, EncodedProgram, SymbolTable, index_of, kind_of
+from vm import VirtualMachine
+
+SOURCES = [
+    "let x = 1 + 2 * 3",
+    "let y = -(2 + 3)\nprint(-y)",
+    'print("Hello")\nprint("Hello")',
+    "let n = 5\nlet s = 0\nwhile n : let n = n - 1 : let s = s + 1.0\nprint(s)",
+    "let a = 1\nlet b = 1.0\nlet c = a * b",
+]
+
+
+def run_symbols_tests():
+    test = 0
+
+    # Encoding and decoding gives back the same quadruples
+    for optimizer in (None, PassManager()):
+        for source in SOURCES:
+            test += 1
+            quadruples, _ = IntermediateCodeGenerator(optimizer).generate_program(source)
+            decoded = EncodedProgram(quadruples).quadruples()
+            if repr(decoded) == repr(quadruples):
+                print(f"Test {test} passed")
+            else:
+                print(f"Test {test} failed: expected {quadruples}, got {decoded}")
+
+    # Both lexers intern identifiers in order of first appearance
+    test += 1
+    names = []
+    for lexer_class in (Lexer, RegexLexer):
+        symbols = SymbolTable()
+        tokens, _ = lexer_class('<stdin>', "let b = a + b * c").make_token_buffer(symbols)
+        names.append(symbols.names)
+    if names == [['b', 'a', 'c'], ['b', 'a', 'c']] and tokens.symbols is symbols:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: got {names}")
+
+    # Operands are tagged with their kind; 1 and 1.0 are separate constants
+    test += 1
+    icg = IntermediateCodeGenerator()
+    quadruples, _ = icg.generate_program(SOURCES[4] + "\nwhile c : let c = c - 1")
+    program = icg.encode(quadruples)
+    kinds = {
+        (quad.operator, kind_of(code) if code != NO_OPERAND else None)
+        for quad, (op, a, b, r) in zip(quadruples, program.code) for code in (r,)
+    }
+    if program.symbols is icg.symbols and icg.symbols.names == ['a', 'b', 'c'] \
+            and program.constants.operands == [1, 1.0] \
+            and ('MUL', TEMP) in kinds and ('=', VARIABLE) in kinds and ('LABEL', LABEL) in kinds \
+            and kind_of(program.code[0][1]) == CONSTANT and index_of(program.code[1][1]) == 1:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: got {program.code}")
+
+    # A VM loaded from a shared table only reports the variables it uses
+    test += 1
+    symbols = SymbolTable(['unused'])
+    quadruples, _ = IntermediateCodeGenerator().generate_program(SOURCES[3])
+    variables = VirtualMachine(quadruples, output=[].append, symbols=symbols).run().variables()
+    if variables == {'n': 0, 's': 1.0} and symbols.get('n') == 1:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: got {variables}")
+
+    # Registers are sized by the variables a program uses, however many
+    # names the shared table has collected
+    test += 1
+    symbols = SymbolTable(f'v{i}' for i in range(10000))
+    program = EncodedProgram(quadruples, symbols)
+    vm = VirtualMachine(program, output=[].append).run()
+    if len(vm.registers) == len(program.constants) + 2 + len(program.temps) \
+            and vm.variables() == variables and program.slots == {symbols.get('n'): 0, symbols.get('s'): 1}:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: {len(vm.registers)} registers, got {vm.variables()}")
+
+
+if __name__ == "__main__":
+    run_symbols_tests()
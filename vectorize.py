@@ -0,0 +1,285 @@
+import sys
+
+from basic import BinOpNode, NumberNode, UnaryOpNode, VarAccessNode, run
+from icg import IntermediateCodeGenerator
+from liveness import TempAllocator
+from optimizer import PassManager
+from quadruple import COMPARISON_OPERATORS, Quadruple, is_name, is_string_constant, is_temp
+from vm import VirtualMachine, VMError
+
+# NumPy ufunc for each operator; comparisons write into integer buffers, so
+# they give 1 and 0 like the scalar VM rather than booleans
+UFUNCS = {
+    'PLUS': 'add',
+    'MINUS': 'subtract',
+    'MUL': 'multiply',
+    'DIV': 'true_divide',
+    'NEG': 'negative',
+    '=': 'positive',
+    'LT': 'less',
+    'GT': 'greater',
+    'LTE': 'less_equal',
+    'GTE': 'greater_equal',
+    'EE': 'equal',
+    'NE': 'not_equal',
+}
+
+# Integer steps that can leave the int64 range
+CHECKED_OPERATORS = ('PLUS', 'MINUS', 'MUL', 'NEG')
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+# A float64 estimate below this magnitude proves an integer result fits:
+# its rounding error is far smaller than the distance to the int64 limits
+EXACT_BELOW = 2 ** 62
+
+
+def result_bounds(op, a, b):
+    # Smallest and largest result of an integer arithmetic step or copy
+    # whose operands lie within the (low, high) bounds a and b
+    if op == 'PLUS':
+        return a[0] + b[0], a[1] + b[1]
+    if op == 'MINUS':
+        return a[0] - b[1], a[1] - b[0]
+    if op == 'MUL':
+        products = (a[0] * b[0], a[0] * b[1], a[1] * b[0], a[1] * b[1])
+        return min(products), max(products)
+    if op == 'NEG':
+        return -a[1], -a[0]
+    return a
+
+# Rows evaluated per pass over the plan; small enough that a chunk of every
+# intermediate buffer stays in cache
+CHUNK_ROWS = 1 << 16
+
+
+def import_numpy():
+    # NumPy is only needed here, so it is not a dependency of the compiler
+    try:
+        import numpy
+    except ImportError as error:
+        raise ImportError("vectorized evaluation needs NumPy: pip install numpy") from error
+    return numpy
+
+
+def expression_node(expression):
+    # Accept source text, a parsed statement list or a single node
+    if isinstance(expression, str):
+        ast, error, _ = run('<vectorize>', expression)
+        if error:
+            raise ValueError(error.as_string())
+        expression = ast
+    if isinstance(expression, list):
+        if len(expression) != 1:
+            raise ValueError("expected exactly one expression")
+        expression = expression[0]
+    if not isinstance(expression, (BinOpNode, UnaryOpNode, NumberNode, VarAccessNode)):
+        raise ValueError(f"only arithmetic over numbers and variables can be vectorized, not {expression!r}")
+    return expression
+
+
+class VectorPlan:
+    """
+    An arithmetic expression compiled once and evaluated over whole columns
+    of variable bindings. The expression goes through the usual ICG and
+    optimization passes; each remaining quadruple becomes one ufunc call
+    writing into a preallocated buffer, and temporaries that are never live
+    together share a buffer.
+
+    Results match the scalar VM: / always divides as floats and raises
+    VMError on a zero divisor, and comparisons give 1 or 0. Integer
+    columns are held as int64; where the scalar VM's unbounded integers
+    would give any step a result outside that range, VMError is raised
+    instead of letting it wrap.
+    """
+    def __init__(self, expression, optimizer=None):
+        self.numpy = import_numpy()
+        node = expression_node(expression)
+        icg = IntermediateCodeGenerator()
+        result = icg.generate_quadruples_from_ast(node)
+        # PRINT keeps the result alive through dead code elimination and
+        # shows which operand holds it afterwards
+        quadruples = icg.quadruples + [Quadruple('PRINT', result, None, None)]
+        quadruples = (optimizer or PassManager()).run(quadruples)
+        quadruples = TempAllocator().run(quadruples)
+
+        self.result = quadruples[-1].arg1
+        self.steps = []
+        for quad in quadruples[:-1]:
+            for operand in (quad.arg1, quad.arg2):
+                if is_string_constant(operand):
+                    raise ValueError("string constants cannot be vectorized")
+            self.steps.append((quad.operator, quad.arg1, quad.arg2, quad.result))
+        if is_string_constant(self.result):
+            raise ValueError("string constants cannot be vectorized")
+
+        self.variables = sorted({
+            operand for step in self.steps for operand in step[1:3] if is_name(operand) and not is_temp(operand)
+        } | ({self.result} if is_name(self.result) and not is_temp(self.result) else set()))
+        # (chunk rows, dtype of each step) -> buffers by temporary name
+        self.buffers = {}
+
+    def dtypes(self, kinds):
+        # Result kind ('i' or 'f') of every step for the given column kinds
+        def kind(operand):
+            if is_name(operand):
+                return kinds[operand]
+            return 'f' if isinstance(operand, float) else 'i'
+
+        step_kinds = []
+        for op, a, b, r in self.steps:
+            if op in COMPARISON_OPERATORS:
+                result = 'i'
+            elif op == 'DIV':
+                result = 'f'
+            elif op in ('NEG', '='):
+                result = kind(a)
+            else:
+                result = 'f' if 'f' in (kind(a), kind(b)) else 'i'
+            kinds[r] = result
+            step_kinds.append(result)
+        return tuple(step_kinds), kinds.get(self.result) if is_name(self.result) else kind(self.result)
+
+    def columns(self, bindings):
+        np = self.numpy
+        columns = {}
+        for name in self.variables:
+            if name not in bindings:
+                raise ValueError(f"no column for variable '{name}'")
+            column = np.asarray(bindings[name])
+            if column.dtype.kind in 'bui':
+                column = column.astype(np.int64, copy=False)
+            elif column.dtype.kind == 'f':
+                column = column.astype(np.float64, copy=False)
+            else:
+                raise TypeError(f"column '{name}' holds {column.dtype}, not numbers")
+            columns[name] = column
+        # Every binding counts towards the rows, used by the expression or not
+        rows = {np.shape(values)[0] for values in bindings.values() if np.ndim(values)}
+        if len(rows) > 1:
+            raise ValueError(f"columns have different lengths: {sorted(rows)}")
+        return columns, rows.pop() if rows else 1
+
+    def evaluate(self, bindings, out=None, chunk=CHUNK_ROWS):
+        """
+        Evaluate the expression for every row of bindings, a mapping from
+        variable name to a sequence or array of values. Scalars are
+        broadcast to every row. Returns the result column, written into out
+        when one is given.
+        """
+        np = self.numpy
+        columns, rows = self.columns(bindings)
+        kinds = {name: 'f' if column.dtype.kind == 'f' else 'i' for name, column in columns.items()}
+        step_kinds, result_kind = self.dtypes(kinds)
+        dtype = {'i': np.int64, 'f': np.float64}
+        if out is None:
+            out = np.empty(rows, dtype[result_kind])
+        elif len(out) != rows:
+            raise ValueError(f"out has {len(out)} rows, expected {rows}")
+
+        size = min(chunk, rows) or 1
+        key = (size, step_kinds)
+        buffers = self.buffers.get(key)
+        if buffers is None:
+            buffers = self.buffers[key] = {}
+            for (op, a, b, r), kind in zip(self.steps, step_kinds):
+                if (r, kind) not in buffers:
+                    buffers[r, kind] = np.empty(size, dtype[kind])
+
+        ufuncs = [getattr(np, UFUNCS[op]) for op, _, _, _ in self.steps]
+        for start in range(0, rows, size):
+            stop = min(start + size, rows)
+            held = {}
+            # Bounds of the integer columns and temporaries in this chunk
+            bounds = {}
+
+            def value(operand):
+                if is_temp(operand):
+                    return held[operand]
+                if is_name(operand):
+                    column = columns[operand]
+                    return column[start:stop] if column.ndim else column
+                return operand
+
+            def bound(operand):
+                if not is_name(operand):
+                    return operand, operand
+                if operand not in bounds:
+                    values = value(operand)
+                    bounds[operand] = int(values.min()), int(values.max())
+                return bounds[operand]
+
+            for ufunc, (op, a, b, r), kind in zip(ufuncs, self.steps, step_kinds):
+                target = buffers[r, kind][:stop - start]
+                if op in ('NEG', '='):
+                    args = (value(a),)
+                else:
+                    args = (value(a), value(b))
+                    if op == 'DIV' and not np.all(args[1]):
+                        raise VMError(f"division by zero in {op} {a}, {b}")
+                low = high = None
+                if op in COMPARISON_OPERATORS:
+                    low, high = 0, 1
+                elif kind == 'i':
+                    low, high = result_bounds(op, bound(a), bound(b) if b is not None else None)
+                try:
+                    # Checked before the step runs, as the result may be
+                    # written over one of its own operands; bounds within
+                    # int64 prove every row fits without looking at them
+                    if op in CHECKED_OPERATORS and kind == 'i' and not INT64_MIN <= low <= high <= INT64_MAX:
+                        self.check_overflow(ufunc, args, op, a, b)
+                        low = high = None
+                    ufunc(*args, out=target)
+                except OverflowError as error:
+                    # A constant too large for int64
+                    raise VMError(f"{error} in {op} {a}, {b}") from error
+                held[r] = target
+                bounds.pop(r, None)
+                if low is not None:
+                    bounds[r] = low, high
+            out[start:stop] = value(self.result)
+        return out
+
+    def check_overflow(self, ufunc, args, op, a, b):
+        # Redo the step in float64; only rows whose estimate comes near the
+        # int64 limits are worked out exactly, with Python integers
+        np = self.numpy
+        with np.errstate(over='ignore', invalid='ignore'):
+            estimate = ufunc(*[np.asarray(arg, np.float64) for arg in args])
+        suspect = ~(np.abs(estimate) < EXACT_BELOW)
+        if not np.any(suspect):
+            return
+        exact = ufunc(*[np.broadcast_to(arg, estimate.shape)[suspect].astype(object) for arg in args])
+        if any(not INT64_MIN <= result <= INT64_MAX for result in exact.tolist()):
+            raise VMError(f"integer overflow in {op} {a}, {b}")
+
+    def __repr__(self):
+        return f'VectorPlan({len(self.steps)} steps over {self.variables})'
+
+
+def compile_vectorized(expression, optimizer=None):
+    return VectorPlan(expression, optimizer)
+
+
+def scalar_evaluate(expression, row):
+    # The expression for one row of bindings, compiled and run on the VM;
+    # the reference VectorPlan results are checked against
+    quadruples, errors = IntermediateCodeGenerator().generate_program(f"let result = {expression}")
+    if errors:
+        raise ValueError(errors[0].as_string())
+    bindings = [Quadruple('=', value, None, name) for name, value in row.items()]
+    return VirtualMachine(bindings + quadruples).run().variables()['result']
+
+
+def main(args):
+    np = import_numpy()
+    expression = ' '.join(args) or 'a * b + (a - b) / 2'
+    plan = compile_vectorized(expression)
+    rng = np.random.default_rng(0)
+    bindings = {name: rng.integers(1, 100, 10) for name in plan.variables}
+    print(plan)
+    for name, column in bindings.items():
+        print(f"{name} = {column}")
+    print(f"result = {plan.evaluate(bindings)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
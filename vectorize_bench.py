@@ -0,0 +1,43 @@
+import time
+
+from vectorize import CHUNK_ROWS, compile_vectorized, import_numpy, scalar_evaluate
+
+EXPRESSIONS = {
+    'linear': "a * 3 + b",
+    'polynomial': "a * a * a - 2 * a * b + b * b / 4",
+    'compare': "(a - b) * (a + b) < a * 0.5",
+}
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_vectorize_bench(rows=1_000_000, scalar_rows=2_000, repeat=3):
+    np = import_numpy()
+    rng = np.random.default_rng(0)
+    bindings = {'a': rng.integers(-1000, 1000, rows), 'b': rng.uniform(-1000, 1000, rows)}
+    sample = [{name: column[i].item() for name, column in bindings.items()} for i in range(scalar_rows)]
+
+    for name, expression in EXPRESSIONS.items():
+        scalar = best_of(lambda: [scalar_evaluate(expression, row) for row in sample], 1)
+        plan = compile_vectorized(expression)
+        out = np.empty(rows)
+        timings = [
+            ('scalar', scalar, scalar_rows),
+            ('whole', best_of(lambda: plan.evaluate(bindings, out, chunk=rows), repeat), rows),
+            ('chunked', best_of(lambda: plan.evaluate(bindings, out, chunk=CHUNK_ROWS), repeat), rows),
+        ]
+        print(f"{name:<11} {len(plan.steps):>2} steps  " + "  ".join(
+            f"{label} {count / seconds / 1e6:8.3f} M rows/s" for label, seconds, count in timings
+        ))
+
+
+if __name__ == "__main__":
+    run_vectorize_bench()
@@ -0,0 +1,100 @@
+import random
+
+from vm import VMError
+
+EXPRESSIONS = [
+    "a + b * c",
+    "(a - b) / (c + 0.5)",
+    "-a * -(b - 2) + 3",
+    "a < b == (c >= 2)",
+    "a * a - b * b + a * a",
+    "2 * 3 + 1",
+    "b",
+    "a / 2 * b / 4 - c != 1.5",
+]
+
+
+def same(expected, got):
+    return expected == got or (expected != expected and got != got)
+
+
+def run_vectorize_tests():
+    try:
+        import numpy as np
+    except ImportError:
+        print("Vectorize tests skipped: NumPy is not installed")
+        return
+    from vectorize import compile_vectorized, scalar_evaluate
+
+    rng = random.Random(0)
+    rows = 200
+    bindings = {
+        'a': [rng.randint(-5, 5) for _ in range(rows)],
+        'b': [rng.choice([rng.randint(-5, 5), rng.uniform(-5, 5)]) for _ in range(rows)],
+        'c': np.arange(rows, dtype=np.int32) % 7 + 1,
+    }
+    test = 0
+    for expression in EXPRESSIONS:
+        test += 1
+        plan = compile_vectorized(expression)
+        # A small chunk makes the plan reuse its buffers across chunks
+        result = plan.evaluate(bindings, chunk=64)
+        mismatches = [
+            i for i in range(rows)
+            if not same(scalar_evaluate(expression, {name: bindings[name][i] for name in plan.variables}), result[i])
+        ]
+        if not mismatches:
+            print(f"Test {test} passed")
+        else:
+            print(f"Test {test} failed: row {mismatches[0]} of {expression!r} gave {result[mismatches[0]]}")
+
+    # Scalars are broadcast and out is filled in place
+    test += 1
+    out = np.zeros(4)
+    plan = compile_vectorized("x * y + 1")
+    result = plan.evaluate({'x': [1, 2, 3, 4], 'y': 0.5}, out=out)
+    if result is out and out.tolist() == [1.5, 2.0, 2.5, 3.0]:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: got {out}")
+
+    test += 1
+    try:
+        compile_vectorized("1 / x").evaluate({'x': [1, 0, 2]})
+        print(f"Test {test} failed: division by zero did not raise")
+    except VMError:
+        print(f"Test {test} passed")
+
+    # Integer results that leave int64 raise instead of wrapping, while
+    # those right at its limits are still exact
+    test += 1
+    try:
+        compile_vectorized("a * a * a").evaluate({'a': [2, 3000000]})
+        print(f"Test {test} failed: int64 overflow was not detected")
+    except VMError:
+        print(f"Test {test} passed")
+
+    test += 1
+    limit = np.array([2 ** 62 - 1, -2 ** 62], dtype=np.int64)
+    result = compile_vectorized("a * 2 + 1 - a").evaluate({'a': limit})
+    if result.tolist() == [2 ** 62, -2 ** 62 + 1]:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: got {result}")
+
+    test += 1
+    failures = 0
+    for source in ('print(1)', '"s" + x', 'let a = 1'):
+        try:
+            compile_vectorized(source)
+            failures += 1
+        except ValueError:
+            pass
+    if not failures:
+        print(f"Test {test} passed")
+    else:
+        print(f"Test {test} failed: {failures} non-arithmetic expressions were accepted")
+
+
+if __name__ == "__main__":
+    run_vectorize_tests()
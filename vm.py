@@ -0,0 +1,179 @@
+from quadruple import Quadruple
+from symbols import LABEL, NO_OPERAND, VARIABLE, EncodedProgram, index_of, kind_of
+
+# Opcodes, in the order the dispatch loop tests them
+(OP_PLUS, OP_MINUS, OP_MUL, OP_DIV, OP_ASSIGN, OP_IF_FALSE, OP_GOTO, OP_NEG, OP_PRINT,
+ OP_IF_NOT_LT, OP_IF_NOT_GT, OP_IF_NOT_LTE, OP_IF_NOT_GTE, OP_IF_NOT_EE, OP_IF_NOT_NE,
+ OP_LT, OP_GT, OP_LTE, OP_GTE, OP_EE, OP_NE) = range(21)
+
+OPCODES = {
+    'PLUS': OP_PLUS,
+    'MINUS': OP_MINUS,
+    'MUL': OP_MUL,
+    'DIV': OP_DIV,
+    '=': OP_ASSIGN,
+    'IF_FALSE': OP_IF_FALSE,
+    'GOTO': OP_GOTO,
+    'NEG': OP_NEG,
+    'PRINT': OP_PRINT,
+    'LT': OP_LT,
+    'GT': OP_GT,
+    'LTE': OP_LTE,
+    'GTE': OP_GTE,
+    'EE': OP_EE,
+    'NE': OP_NE,
+    'IF_NOT_LT': OP_IF_NOT_LT,
+    'IF_NOT_GT': OP_IF_NOT_GT,
+    'IF_NOT_LTE': OP_IF_NOT_LTE,
+    'IF_NOT_GTE': OP_IF_NOT_GTE,
+    'IF_NOT_EE': OP_IF_NOT_EE,
+    'IF_NOT_NE': OP_IF_NOT_NE,
+}
+
+# Opcodes whose result field is a jump target
+JUMP_OPCODES = {OP_GOTO, OP_IF_FALSE, OP_IF_NOT_LT, OP_IF_NOT_GT, OP_IF_NOT_LTE, OP_IF_NOT_GTE, OP_IF_NOT_EE, OP_IF_NOT_NE}
+
+
+class VMError(Exception):
+    pass
+
+
+class VirtualMachine:
+    """
+    Executes the quadruples produced by IntermediateCodeGenerator.
+
+    Loading encodes the quadruples as a symbols.EncodedProgram, resolves
+    every label to an instruction index once and lays constants, variables
+    and temporaries out in one flat register list by kind and id (variables
+    by their slot in this program, not their id in a shared table), so
+    instructions are (opcode, a, b, result) tuples of plain integers and
+    running them needs no name lookups. LABEL quadruples are dropped.
+    quadruples may also be an EncodedProgram already; symbols is the
+    SymbolTable new programs number their variables in.
+    """
+    def __init__(self, quadruples, output=print, symbols=None):
+        self.output = output
+        self.program = quadruples if isinstance(quadruples, EncodedProgram) else EncodedProgram(quadruples, symbols)
+        self.bases = []
+        self.initial = []
+        self.code = []
+        # Index into program.code of each instruction, for error messages
+        self.lines = []
+        self.registers = []
+        self.executed = 0
+        self.load(self.program)
+
+    def load(self, program):
+        bases = self.bases = program.bases()
+        self.initial = list(program.constants.values) + [None] * (bases[LABEL] - bases[VARIABLE])
+
+        targets = [None] * len(program.labels)
+        pc = 0
+        for op, a, b, r in program.code:
+            if op == 'LABEL':
+                targets[index_of(r)] = pc
+            else:
+                pc += 1
+
+        slots = program.slots
+
+        def slot(code):
+            if code == NO_OPERAND:
+                return -1
+            kind, index = kind_of(code), index_of(code)
+            return bases[kind] + (slots[index] if kind == VARIABLE else index)
+
+        for i, (op, a, b, r) in enumerate(program.code):
+            if op == 'LABEL':
+                continue
+            opcode = OPCODES.get(op)
+            if opcode is None:
+                raise VMError(f"Unknown operator in {self.source(i)}")
+
+            if opcode in JUMP_OPCODES:
+                target = targets[index_of(r)]
+                if target is None:
+                    raise VMError(f"Undefined label in {self.source(i)}")
+                instruction = (opcode, slot(a), slot(b), target)
+            else:
+                instruction = (opcode, slot(a), slot(b), slot(r))
+            self.code.append(instruction)
+            self.lines.append(i)
+
+    def source(self, i):
+        op, a, b, r = self.program.code[i]
+        decode = self.program.decode
+        return Quadruple(op, decode(a), decode(b), decode(r))
+
+    def run(self):
+        code = self.code
+        end = len(code)
+        output = self.output
+        regs = self.registers = list(self.initial)
+        pc = 0
+        executed = 0
+
+        try:
+            while pc < end:
+                op, a, b, r = code[pc]
+                pc += 1
+                executed += 1
+                if op == OP_PLUS:
+                    regs[r] = regs[a] + regs[b]
+                elif op == OP_MINUS:
+                    regs[r] = regs[a] - regs[b]
+                elif op == OP_MUL:
+                    regs[r] = regs[a] * regs[b]
+                elif op == OP_DIV:
+                    regs[r] = regs[a] / regs[b]
+                elif op == OP_ASSIGN:
+                    regs[r] = regs[a]
+                elif op == OP_IF_FALSE:
+                    if not regs[a]:
+                        pc = r
+                elif op == OP_GOTO:
+                    pc = r
+                elif op == OP_NEG:
+                    regs[r] = -regs[a]
+                elif op == OP_PRINT:
+                    output(regs[a])
+                elif op == OP_IF_NOT_LT:
+                    if not regs[a] < regs[b]:
+                        pc = r
+                elif op == OP_IF_NOT_GT:
+                    if not regs[a] > regs[b]:
+                        pc = r
+                elif op == OP_IF_NOT_LTE:
+                    if not regs[a] <= regs[b]:
+                        pc = r
+                elif op == OP_IF_NOT_GTE:
+                    if not regs[a] >= regs[b]:
+                        pc = r
+                elif op == OP_IF_NOT_EE:
+                    if not regs[a] == regs[b]:
+                        pc = r
+                elif op == OP_IF_NOT_NE:
+                    if not regs[a] != regs[b]:
+                        pc = r
+                elif op == OP_LT:
+                    regs[r] = 1 if regs[a] < regs[b] else 0
+                elif op == OP_GT:
+                    regs[r] = 1 if regs[a] > regs[b] else 0
+                elif op == OP_LTE:
+                    regs[r] = 1 if regs[a] <= regs[b] else 0
+                elif op == OP_GTE:
+                    regs[r] = 1 if regs[a] >= regs[b] else 0
+                elif op == OP_EE:
+                    regs[r] = 1 if regs[a] == regs[b] else 0
+                elif op == OP_NE:
+                    regs[r] = 1 if regs[a] != regs[b] else 0
+        except (TypeError, ZeroDivisionError, OverflowError) as error:
+            raise VMError(f"{error} in {self.source(self.lines[pc - 1])}") from error
+        finally:
+            self.executed = executed
+        return self
+
+    def variables(self):
+        base = self.bases[VARIABLE]
+        names = self.program.symbols.names
+        return {names[index]: self.registers[base + slot] for slot, index in enumerate(self.program.variables)}
@@ -0,0 +1,38 @@
+import time
+
+from icg import IntermediateCodeGenerator
+from vm import VirtualMachine
+
+PROGRAMS = {
+    'countdown': "let n = {n}\nwhile n : let n = n - 1\n",
+    'arithmetic': "let n = {n}\nlet a = 3\nwhile n : let n = n - 1 + (a * a - 9) / 2\n",
+    'long body': "let n = {n}\nlet a = 2\nlet b = 5\nwhile n : let n = (n * a - a) / a + b * (b - b) - -0\n",
+    'comparison': "let n = {n}\nlet c = 0\nwhile n > 0 : let n = n - 1 + 0 * (c >= n)\n",
+}
+
+
+def compile_program(source):
+    quadruples, errors = IntermediateCodeGenerator().generate_program(source)
+    if errors:
+        raise ValueError(errors[0].as_string())
+    return quadruples
+
+
+def run_vm_bench(iterations=200_000, repeat=3):
+    for name, template in PROGRAMS.items():
+        quadruples = compile_program(template.format(n=iterations))
+        vm = VirtualMachine(quadruples)
+
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            vm.run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        print(f"{name:<12} {len(quadruples):>3} quadruples  {vm.executed:>9} executed  "
+              f"{best * 1000:8.1f} ms  {vm.executed / best / 1e6:6.2f} M quadruples/s")
+
+
+if __name__ == "__main__":
+    run_vm_bench()
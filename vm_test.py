@@ -0,0 +1,76 @@
+from icg import IntermediateCodeGenerator
+from quadruple import Quadruple
+from vm import VirtualMachine, VMError
+
+
+def run_program(source):
+    quadruples, errors = IntermediateCodeGenerator().generate_program(source)
+    if errors:
+        raise ValueError(errors[0].as_string())
+    printed = []
+    vm = VirtualMachine(quadruples, output=printed.append).run()
+    return vm.variables(), printed
+
+
+def run_vm_tests():
+    tests = [
+        ("let x = 1 + 2 * 3", {'x': 7}, []),
+        ("let x = 20 - 1 * (4 / 2)\nprint(x)", {'x': 18.0}, [18.0]),
+        ("let y = -(2 + 3)\nprint(-y)", {'y': -5}, [5]),
+        ('print("Hello")', {}, ['Hello']),
+        ("let n = 5\nlet s = 0\nwhile n : let n = n - 1\nprint(n)", {'n': 0, 's': 0}, [0]),
+        ("let a = 1\nexit\nlet a = 2", {'a': 1}, []),
+        ("let x = 10\nlet y = 20\nwhile (x < y) : let x = x + 1\nprint(x)", {'x': 20, 'y': 20}, [20]),
+        ("let a = 2 >= 2\nlet b = 1 == 1.0\nlet c = 3 != 3\nprint(\"a\" < \"b\")", {'a': 1, 'b': 1, 'c': 0}, [1]),
+    ]
+
+    for i, (source, expected_vars, expected_output) in enumerate(tests):
+        variables, printed = run_program(source)
+        if variables == expected_vars and printed == expected_output:
+            print(f"Test {i + 1} passed")
+        else:
+            print(f"Test {i + 1} failed: expected {expected_vars} {expected_output}, got {variables} {printed}")
+
+    try:
+        VirtualMachine([Quadruple('GOTO', None, None, 'L9')])
+        print(f"Test {len(tests) + 1} failed: undefined label was accepted")
+    except VMError:
+        print(f"Test {len(tests) + 1} passed")
+
+    try:
+        run_program("let x = 1 / 0")
+        print(f"Test {len(tests) + 2} failed: division by zero did not raise")
+    except VMError:
+        print(f"Test {len(tests) + 2} passed")
+
+    try:
+        run_program("let y = 3\nlet x = 1" + "0" * 400 + " / y")
+        print(f"Test {len(tests) + 3} failed: float overflow did not raise")
+    except VMError:
+        print(f"Test {len(tests) + 3} passed")
+
+
+def run_direct_emission_tests():
+    sources = [
+        "let x = 1 + 2 * 3\nprint(-x)",
+        "let n = 5\nwhile n : let n = n - 1\nprint(n)",
+        "let a = (1 + 2) * (3 + 4)\nlet b = a * -(a - 1) / 2",
+        # The failed lines must not leave temporaries or labels behind
+        "let a = 1 + 2\nwhile a - 1 : let = 3\nlet b = (a * 2\nlet c = a * 3",
+        # Comparisons in a loop condition become one compare-and-branch
+        "let x = 1\nwhile (x * 2 <= 10) : let x = x + 1\nwhile +(x != 0) : let x = x - 1\nlet y = x > 0",
+        "let a = 1\nwhile a < : let a = 2\nwhile a >= 2 : let a = a - 1",
+    ]
+    for i, source in enumerate(sources):
+        expected, expected_errors = IntermediateCodeGenerator().generate_program(source)
+        direct, errors = IntermediateCodeGenerator(direct=True).generate_program(source)
+        same_errors = [e.as_string() for e in errors] == [e.as_string() for e in expected_errors]
+        if repr(direct) == repr(expected) and same_errors:
+            print(f"Direct emission test {i + 1} passed")
+        else:
+            print(f"Direct emission test {i + 1} failed: expected {expected}, got {direct}")
+
+
+if __name__ == "__main__":
+    run_vm_tests()
+    run_direct_emission_tests()